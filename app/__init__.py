@@ -41,6 +41,14 @@ def create_app(config_name='production'):
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login' # Nombre de la ruta de login
 
+    # Market data cache backend
+    from app.services.market_service import MarketService
+    MarketService.init_app(app)
+
+    # Per-user portfolio cache
+    from app.services.portfolio_cache import PortfolioCache
+    PortfolioCache.init_app(app)
+
     with app.app_context():
         from app.models.user import User
     
@@ -55,6 +63,12 @@ def create_app(config_name='production'):
     from app.routes.auth import auth_bp
     app.register_blueprint(auth_bp)
     
+    # Background price warmer (in-process)
+    if app.config.get('PRICE_WARMER_ENABLED'):
+        from app.services.price_warmer import PriceWarmer
+        app.extensions['price_warmer'] = PriceWarmer(app)
+        app.extensions['price_warmer'].start()
+    
     # Register error handlers
     register_error_handlers(app)
     
@@ -2,5 +2,9 @@ from app.models.instrument import Instrument
 from app.models.transaction import Transaction
 from app.models.wallet import Wallet
 from app.models.user import User
+from app.models.symbol_metadata import SymbolMetadata
+from app.models.ledger import InstrumentLedger, OpenLot
+from app.models.position_snapshot import PositionSnapshot
 
-__all__ = ['Instrument', 'Transaction', 'Wallet', 'User']
\ No newline at end of file
+__all__ = ['Instrument', 'Transaction', 'Wallet', 'User', 'SymbolMetadata', 'InstrumentLedger', 'OpenLot',
+           'PositionSnapshot']
\ No newline at end of file
@@ -0,0 +1,56 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import Index
+
+
+class InstrumentLedger(db.Model):
+    """Acumulados FIFO de un instrumento (lo realizado y totales de la cola)."""
+
+    # Tabla
+    __tablename__ = 'instrument_ledgers'
+
+    # Atributos (columnas)
+    instrument_id = db.Column(db.Integer, db.ForeignKey('instruments.id', ondelete='CASCADE'), primary_key=True)
+    buy_count = db.Column(db.Integer, nullable=False, default=0)
+    sell_count = db.Column(db.Integer, nullable=False, default=0)
+    total_bought = db.Column(db.Numeric(32, 12), nullable=False, default=0)
+    total_sold_qty = db.Column(db.Numeric(32, 12), nullable=False, default=0)
+    buy_commissions = db.Column(db.Numeric(32, 2), nullable=False, default=0)
+    # Acumulados con comisiones proporcionales: se guardan con toda la
+    # precisión de Decimal para que el resultado no dependa del redondeo
+    total_sold = db.Column(db.Numeric(65, 30), nullable=False, default=0)
+    cost_basis_sold = db.Column(db.Numeric(65, 30), nullable=False, default=0)
+    commissions_paid = db.Column(db.Numeric(65, 30), nullable=False, default=0)
+    last_buy_date = db.Column(db.Date)
+    last_sell_date = db.Column(db.Date)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Representacion del objeto
+    def __repr__(self):
+        return f'<InstrumentLedger {self.instrument_id}>'
+
+
+class OpenLot(db.Model):
+    """Lote de compra con unidades aún sin vender (cola FIFO persistida)."""
+
+    # Tabla
+    __tablename__ = 'open_lots'
+
+    # Atributos (columnas)
+    id = db.Column(db.Integer, primary_key=True)
+    instrument_id = db.Column(db.Integer, db.ForeignKey('instruments.id', ondelete='CASCADE'), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id', ondelete='CASCADE'), nullable=False, unique=True)
+    transaction_date = db.Column(db.Date, nullable=False)
+    quantity = db.Column(db.Numeric(20, 12), nullable=False)            # unidades restantes
+    price = db.Column(db.Numeric(20, 8), nullable=False)
+    commission = db.Column(db.Numeric(65, 30), nullable=False)          # comisión restante
+    original_commission = db.Column(db.Numeric(20, 2), nullable=False)
+
+    # Orden de la cola: fecha y luego id de la compra
+    __table_args__ = (
+        Index('idx_open_lots_queue', 'instrument_id', 'transaction_date', 'transaction_id'),
+    )
+
+    # Representacion del objeto
+    def __repr__(self):
+        return f'<OpenLot {self.quantity} @ {self.price}>'
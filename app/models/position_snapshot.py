@@ -0,0 +1,73 @@
+from app import db
+from datetime import datetime
+
+
+class PositionSnapshot(db.Model):
+    """Métricas de un instrumento que no dependen del precio (read model)."""
+
+    # Tabla
+    __tablename__ = 'position_snapshots'
+
+    # Atributos (columnas)
+    instrument_id = db.Column(db.Integer, db.ForeignKey('instruments.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    buy_count = db.Column(db.Integer, nullable=False, default=0)
+    sell_count = db.Column(db.Integer, nullable=False, default=0)
+    # Posición abierta sin redondear (cantidad × precio de cada lote)
+    current_quantity = db.Column(db.Numeric(32, 12), nullable=False, default=0)
+    cost_basis = db.Column(db.Numeric(45, 20), nullable=False, default=0)
+    open_commissions = db.Column(db.Numeric(32, 2), nullable=False, default=0)
+    # Métricas realizadas ya redondeadas
+    realized_gain = db.Column(db.Numeric(20, 2), nullable=False, default=0)
+    realized_gain_percentage = db.Column(db.Numeric(20, 2), nullable=False, default=0)
+    total_sold = db.Column(db.Numeric(20, 2), nullable=False, default=0)
+    cost_basis_sold = db.Column(db.Numeric(20, 2), nullable=False, default=0)
+    realized_commissions = db.Column(db.Numeric(32, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Representacion del objeto
+    def __repr__(self):
+        return f'<PositionSnapshot {self.instrument_id}: {self.current_quantity}>'
+
+    def update_from(self, position):
+        """Copia una posición de FIFOService.position_from_state."""
+        realized = position['realized']
+        self.buy_count = position['buy_count']
+        self.sell_count = position['sell_count']
+        self.current_quantity = position['current_quantity']
+        self.cost_basis = position['cost_basis']
+        self.open_commissions = position['open_commissions']
+        self.realized_gain = realized['realized_gain']
+        self.realized_gain_percentage = realized['realized_gain_percentage']
+        self.total_sold = realized['total_sold']
+        self.cost_basis_sold = realized['cost_basis_sold']
+        self.realized_commissions = realized['commissions_paid']
+
+    def to_position(self):
+        """Posición en el formato de FIFOService.totals_from_position."""
+        if self.sell_count:
+            realized = {
+                'realized_gain': self.realized_gain,
+                'realized_gain_percentage': self.realized_gain_percentage,
+                'total_sold': self.total_sold,
+                'cost_basis_sold': self.cost_basis_sold,
+                'commissions_paid': self.realized_commissions
+            }
+        else:
+            # Sin ventas FIFOService devuelve ceros (float) y las comisiones de compra
+            realized = {
+                'realized_gain': 0.0,
+                'realized_gain_percentage': 0.0,
+                'total_sold': 0.0,
+                'cost_basis_sold': 0.0,
+                'commissions_paid': self.realized_commissions if self.buy_count else 0.0
+            }
+
+        return {
+            'buy_count': self.buy_count,
+            'sell_count': self.sell_count,
+            'current_quantity': self.current_quantity,
+            'cost_basis': self.cost_basis,
+            'open_commissions': self.open_commissions,
+            'realized': realized
+        }
@@ -0,0 +1,37 @@
+from app import db
+from datetime import datetime, timedelta
+
+
+class SymbolMetadata(db.Model):
+    """Metadatos de un símbolo verificado en Yahoo Finance."""
+
+    # Tabla
+    __tablename__ = 'symbol_metadata'
+
+    # Atributos (columnas)
+    symbol = db.Column(db.String(30), primary_key=True)  # símbolo formateado (ej. BTC-USD)
+    instrument_type = db.Column(db.Enum('stock', 'etf', 'crypto', name='instrument_type_enum'), nullable=False)
+    name = db.Column(db.String(255))
+    currency = db.Column(db.String(10))
+    exchange = db.Column(db.String(20))
+    last_verified_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # Representacion del objeto
+    def __repr__(self):
+        return f'<SymbolMetadata {self.symbol} ({self.instrument_type})>'
+
+    def is_fresh(self, ttl: timedelta) -> bool:
+        """Indica si la verificación sigue vigente."""
+        return datetime.utcnow() - self.last_verified_at < ttl
+
+    # Diccionario del objeto
+    def to_dict(self):
+        """Convierte los metadatos a un diccionario."""
+        return {
+            'symbol': self.symbol,
+            'instrument_type': self.instrument_type,
+            'name': self.name,
+            'currency': self.currency,
+            'exchange': self.exchange,
+            'last_verified_at': self.last_verified_at.isoformat() if self.last_verified_at else None,
+        }
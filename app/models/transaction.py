@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime
 from decimal import Decimal
+from sqlalchemy import Index
 
 
 class Transaction(db.Model):
@@ -20,6 +21,16 @@ class Transaction(db.Model):
     base_amount = db.Column(db.Numeric(20, 2), nullable=False)
     transaction_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Unidades en cartera después de esta transacción, en el orden de
+    # validación (fecha, compras antes que ventas, id). La mantiene
+    # LedgerService; NULL en filas anteriores a la columna
+    running_quantity = db.Column(db.Numeric(32, 12))
+
+    # Validación FIFO: rango por instrumento y fecha con la cantidad acumulada
+    __table_args__ = (
+        Index('idx_transactions_running', 'instrument_id', 'transaction_date',
+              'transaction_type', 'running_quantity'),
+    )
     
     # Representacion del objeto
     def __repr__(self):
@@ -12,6 +12,10 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(45), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
 
+    # Se incrementa con cada cambio de transacciones, instrumentos o
+    # billetera; invalida el caché del portafolio (PortfolioCache)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # Convierte la contraseña a hash
     def set_password(self, password):
         """Genera un hash seguro a partir de la contraseña."""
@@ -1,7 +1,7 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, make_response
 from app import db
 from app.models import Instrument, Transaction, Wallet
-from app.services import MarketService, PortfolioService, FIFOService
+from app.services import MarketService, PortfolioService, PortfolioSnapshot, PortfolioCache, LedgerService
 from app.utils import Validator
 from datetime import datetime
 from decimal import Decimal
@@ -17,33 +17,20 @@ bp = Blueprint('main', __name__)
 def index():
     """Dashboard home page."""
     try:
-        instruments = Instrument.query.filter_by(user_id=current_user.id).all()
-        wallet = Wallet.query.filter_by(user_id=current_user.id).first()
-
-        # print(wallet)
-
-        if not wallet:
-            wallet = PortfolioService.create_wallet_default(current_user)
-            db.session.add(wallet)
+        # Precios, posiciones y métricas FIFO una sola vez para toda la vista;
+        # lo que no depende del precio sale de PortfolioCache si no hubo cambios
+        snapshot = PortfolioSnapshot.for_user(current_user)
+        if db.session.info.pop('wallet_created', False):
+            # Guarda la wallet por defecto creada en esta carga
             db.session.commit()
 
-        portfolio_metrics = PortfolioService.calculate_portfolio_metrics(instruments, current_user.id)
-
-        instrument_data = []
-        for inst in instruments:
-            metrics = PortfolioService.calculate_instrument_metrics(inst)
-            instrument_data.append(metrics)
-
-        distribution = PortfolioService.get_portfolio_distribution(instruments)
-        usd_to_dop = MarketService.get_usd_to_dop_rate()
-
         return render_template(
             'dashboard.html',
-            portfolio=portfolio_metrics,
-            instruments=instrument_data,
-            distribution=distribution,
-            wallet=wallet,
-            usd_to_dop=f'{usd_to_dop:.2f}'
+            portfolio=snapshot.portfolio_metrics,
+            instruments=snapshot.instrument_rows,
+            distribution=snapshot.distribution,
+            wallet=snapshot.wallet,
+            usd_to_dop=f'{snapshot.usd_to_dop:.2f}'
         )
 
     except Exception as e:
@@ -89,6 +76,10 @@ def add_instrument():
 
         instrument = Instrument(symbol=symbol, instrument_type=instrument_type, user_id=current_user.id)
         db.session.add(instrument)
+        db.session.flush()
+        # Ledger y snapshot vacíos desde el inicio: las lecturas no escriben
+        LedgerService.rebuild(instrument, [])
+        PortfolioCache.bump(current_user.id)
         db.session.commit()
 
         return jsonify({
@@ -111,6 +102,7 @@ def delete_instrument(instrument_id):
         instrument = Instrument.query.filter_by(id=instrument_id,  user_id=current_user.id).first_or_404()
         
         db.session.delete(instrument)
+        PortfolioCache.bump(current_user.id)
         db.session.commit()
 
         return jsonify({
@@ -140,13 +132,10 @@ def delete_transaction(transaction_id):
         transaction = Transaction.query.filter_by(id=transaction_id, user_id=current_user.id).first_or_404()
         wallet = Wallet.query.filter_by(user_id=current_user.id).first()
         instrument = transaction.instrument
-        all_transactions = instrument.transactions.all()
 
         # ── Validación FIFO (solo aplica al eliminar compras) ──────────────
         if transaction.transaction_type == 'buy':
-            valid, error_msg = FIFOService._validate_fifo_integrity(
-                all_transactions, exclude_id=transaction_id
-            )
+            valid, error_msg = LedgerService.validate_removal(transaction)
             if not valid:
                 return jsonify({'success': False, 'message': error_msg}), 400
 
@@ -172,6 +161,9 @@ def delete_transaction(transaction_id):
 
         db.session.delete(transaction)
         db.session.add(wallet)
+        # Eliminar cambia la cola FIFO: reconstruir el ledger del instrumento
+        LedgerService.rebuild(instrument)
+        PortfolioCache.bump(current_user.id)
         db.session.commit()
         return jsonify({'success': True, 'message': 'Transacción eliminada exitosamente.'})
     except Exception as e:
@@ -240,23 +232,20 @@ def register_transaction(instrument_id):
         if isinstance(transaction_date, datetime):
             transaction_date = transaction_date.date()
 
-        all_transactions = instrument.transactions.all()
-
         # ── EDICIÓN de transacción existente ────────────────────────────────
         if edit_transaction_id:
             transaction = Transaction.query.filter_by(id=int(edit_transaction_id), user_id=current_user.id).first_or_404()
 
             # 1. Validar integridad FIFO con la nueva versión de la transacción
             #    antes de tocar nada en la base de datos.
-            valid, fifo_error = FIFOService._simulate_fifo_with_new(
-                all_transactions,
+            valid, fifo_error = LedgerService.validate_change(
+                instrument,
                 {
-                    'id': None,  # se trata como nueva dentro del simulador
                     'transaction_type': transaction_type,
                     'quantity': quantity,
                     'transaction_date': transaction_date,
                 },
-                replace_id=transaction.id
+                replace=transaction
             )
             if not valid:
                 flash(fifo_error, 'danger')
@@ -303,6 +292,9 @@ def register_transaction(instrument_id):
                 wallet.balance += Decimal(str(transaction.total_paid))
 
             db.session.add(wallet)
+            # La edición puede cambiar fecha, tipo o cantidad: reconstruir
+            LedgerService.rebuild(instrument)
+            PortfolioCache.bump(current_user.id)
             db.session.commit()
 
             flash('Transacción actualizada exitosamente.', 'success')
@@ -311,10 +303,9 @@ def register_transaction(instrument_id):
         # ── NUEVA transacción ───────────────────────────────────────────────
 
         # 1. Validar integridad FIFO incluyendo la nueva transacción
-        valid, fifo_error = FIFOService._simulate_fifo_with_new(
-            all_transactions,
+        valid, fifo_error = LedgerService.validate_change(
+            instrument,
             {
-                'id': None,
                 'transaction_type': transaction_type,
                 'quantity': quantity,
                 'transaction_date': transaction_date,
@@ -350,6 +341,10 @@ def register_transaction(instrument_id):
 
         db.session.add(transaction)
         db.session.add(wallet)
+        db.session.flush()
+        # Compras/ventas al día se aplican sobre la cola; las retroactivas la reconstruyen
+        LedgerService.record_transaction(transaction)
+        PortfolioCache.bump(current_user.id)
         db.session.commit()
 
         tipo_texto = 'compra' if transaction_type == 'buy' else 'venta'
@@ -365,14 +360,63 @@ def register_transaction(instrument_id):
 @bp.route('/api/refresh-prices', methods=['POST'])
 @login_required
 def refresh_prices():
-    """API endpoint to refresh all market prices."""
+    """API endpoint to refresh the current user's market prices."""
     try:
-        MarketService.clear_cache()
+        # Invalidar solo los símbolos del usuario, no el caché de todos
+        instruments = Instrument.query.filter_by(user_id=current_user.id).all()
+        for inst in instruments:
+            MarketService.invalidate(inst.symbol, inst.instrument_type)
+        MarketService.invalidate('DOP=X', 'fx')
         return jsonify({'success': True, 'message': 'Precios actualizados.'})
     except Exception as e:
         logger.error(f"Error refreshing prices: {str(e)}")
         return jsonify({'success': False, 'message': 'Error al actualizar precios.'}), 500
 
+@bp.route('/api/portfolio')
+@login_required
+def api_portfolio():
+    """
+    Portfolio, instrument and distribution data as JSON.
+
+    Lleva un ETag fuerte (versión de datos del usuario + cotizaciones de
+    sus símbolos); con If-None-Match igual responde 304 sin recalcular.
+    """
+    try:
+        base = PortfolioSnapshot.load_base(current_user)
+        if db.session.info.pop('wallet_created', False):
+            db.session.commit()
+        # Primero las cotizaciones: si alguna venció se descarga y cambia el ETag
+        quotes = PortfolioSnapshot.load_quotes(base['instruments'])
+        etag = PortfolioSnapshot.etag(current_user, quotes, MarketService.get_usd_to_dop_rate())
+
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            snapshot = PortfolioSnapshot.from_base(current_user.id, base, quotes)
+            response = jsonify({
+                'portfolio': snapshot.portfolio_metrics,
+                'instruments': snapshot.instrument_rows,
+                'distribution': snapshot.distribution,
+                'wallet': snapshot.wallet._asdict(),
+                'usd_to_dop': snapshot.usd_to_dop,
+                'data_version': current_user.data_version
+            })
+
+        response.set_etag(etag)
+        # El cliente siempre revalida; el 304 es lo que ahorra el cálculo
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    except Exception as e:
+        logger.error(f"Error loading portfolio API: {str(e)}")
+        return jsonify({'success': False, 'message': 'Error al cargar el portafolio.'}), 500
+
+@bp.route('/api/cache-stats')
+@login_required
+def cache_stats():
+    """API endpoint with quote cache hit/miss/eviction counters."""
+    return jsonify(MarketService.get_cache_stats())
+
 @bp.route('/glosario')
 @login_required
 def glosario_web():
@@ -399,6 +443,7 @@ def update_wallet():
             db.session.rollback()
             return jsonify({'success': False, 'message': 'Cantidad resultante negativa.'})
 
+        PortfolioCache.bump(current_user.id)
         db.session.commit()
         return jsonify({'success': True, 'message': 'Billetera actualizada correctamente.'})
 
@@ -4,6 +4,10 @@ Services package initialization
 
 from app.services.market_service import MarketService
 from app.services.portfolio_service import PortfolioService
+from app.services.portfolio_snapshot import PortfolioSnapshot
+from app.services.portfolio_cache import PortfolioCache
 from app.services.fifo import FIFOService
+from app.services.ledger_service import LedgerService
+from app.services.lot_matching import LotMatchingService
 
-__all__ = ['MarketService', 'PortfolioService', 'FIFOService']
\ No newline at end of file
+__all__ = ['MarketService', 'PortfolioService', 'PortfolioSnapshot', 'PortfolioCache', 'FIFOService', 'LedgerService', 'LotMatchingService']
\ No newline at end of file
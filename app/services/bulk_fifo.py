@@ -0,0 +1,365 @@
+"""
+Bulk FIFO - Recálculo masivo de posiciones
+Computes FIFO metrics for many instruments at once from columnar arrays,
+for nightly reconciliation and large portfolios
+"""
+
+from typing import Dict, List, Optional
+from decimal import Decimal
+from itertools import groupby
+import logging
+
+import numpy as np
+from sqlalchemy import select
+
+from app import db
+from app.models import Instrument, Transaction, PositionSnapshot
+from app.services.fifo import FIFOService, TxRecord
+from app.utils.fixed_point import (
+    QTY_PLACES, PRICE_PLACES, MONEY_PLACES, COST_PLACES, ACCUM_PLACES,
+    to_scaled, to_decimal, rescale, div_round
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BulkFIFOService:
+    """
+    Vectorized FIFO over many instruments.
+
+    FIFO consume las compras en orden como un prefijo: si un instrumento
+    vendió S unidades en total, cada lote con cantidad acumulada previa B
+    queda consumido en min(max(S - B, 0), q). Con eso las métricas de todos
+    los instrumentos salen de sumas acumuladas y sumas por grupo sobre
+    enteros escalados (exactos), sin recorrer venta por venta. La única
+    división es la comisión proporcional del lote parcial (a lo sumo uno
+    por instrumento), redondeada a ACCUM_PLACES como en FIFOService.
+    """
+
+    # Partes de 21 bits: el producto de dos partes ocupa 42 bits, así que
+    # se pueden sumar hasta 2**21 por instrumento sin salir de int64
+    _LIMB_BITS = 21
+    _LIMB_MASK = (1 << _LIMB_BITS) - 1
+    _MAX_GROUP_ROWS = 1 << _LIMB_BITS
+
+    @staticmethod
+    def load_columns(user_id: Optional[int] = None,
+                     instrument_ids: Optional[List[int]] = None) -> Dict[str, np.ndarray]:
+        """
+        Load transactions as columnar arrays with a single Core select.
+
+        Args:
+            user_id: Only this user's transactions (None = all users)
+            instrument_ids: Only these instruments
+
+        Returns:
+            dict: 'instrument_id', 'id', 'date' (ordinal), 'is_buy' and the
+                  scaled integer columns 'quantity', 'price', 'commission'
+        """
+        return BulkFIFOService.to_columns(BulkFIFOService._load_rows(user_id, instrument_ids))
+
+    @staticmethod
+    def _load_rows(user_id: Optional[int] = None, instrument_ids: Optional[List[int]] = None):
+        """Transaction rows ordered by instrument, date and id (see to_columns)."""
+        query = select(
+            Transaction.instrument_id, Transaction.id, Transaction.transaction_date,
+            Transaction.transaction_type, Transaction.quantity, Transaction.price,
+            Transaction.commission
+        ).order_by(Transaction.instrument_id, Transaction.transaction_date, Transaction.id)
+
+        if user_id is not None:
+            query = query.where(Transaction.user_id == user_id)
+        if instrument_ids is not None:
+            query = query.where(Transaction.instrument_id.in_(instrument_ids))
+
+        return db.session.execute(query).all()
+
+    @staticmethod
+    def to_columns(rows) -> Dict[str, np.ndarray]:
+        """
+        Build the columnar arrays from transaction rows.
+
+        Args:
+            rows: Iterable of (instrument_id, id, transaction_date,
+                  transaction_type, quantity, price, commission)
+
+        Returns:
+            dict: Columnar arrays (see load_columns)
+        """
+        rows = list(rows)
+
+        quantities = [to_scaled(r[4], QTY_PLACES) for r in rows]
+        prices = [to_scaled(r[5], PRICE_PLACES) for r in rows]
+        commissions = [to_scaled(r[6], MONEY_PLACES) for r in rows]
+
+        # int64 si los valores y las sumas por instrumento caben (los productos
+        # cantidad × precio se suman por partes, ver _sum_products); si no,
+        # enteros de Python (object) que siguen siendo exactos
+        sums = {}
+        for r, quantity, commission in zip(rows, quantities, commissions):
+            count, quantity_sum, commission_sum = sums.get(r[0], (0, 0, 0))
+            sums[r[0]] = (count + 1, quantity_sum + abs(quantity), commission_sum + abs(commission))
+        fits = max(map(abs, prices), default=0) < 2 ** 63 and all(
+            count < BulkFIFOService._MAX_GROUP_ROWS and quantity_sum < 2 ** 62 and commission_sum < 2 ** 62
+            for count, quantity_sum, commission_sum in sums.values()
+        )
+        dtype = np.int64 if fits else object
+
+        return {
+            'instrument_id': np.array([r[0] for r in rows], dtype=np.int64),
+            'id': np.array([r[1] or 0 for r in rows], dtype=np.int64),
+            'date': np.array([r[2].toordinal() for r in rows], dtype=np.int64),
+            'is_buy': np.array([r[3] == 'buy' for r in rows], dtype=bool),
+            'quantity': np.array(quantities, dtype=dtype),
+            'price': np.array(prices, dtype=dtype),
+            'commission': np.array(commissions, dtype=dtype),
+        }
+
+    @staticmethod
+    def compute_positions(columns: Dict[str, np.ndarray]) -> Dict[int, Dict]:
+        """
+        Price-independent position of every instrument in the columns.
+
+        Args:
+            columns: Columnar arrays (see load_columns)
+
+        Returns:
+            dict: instrument_id -> position usable with
+                  FIFOService.totals_from_position
+        """
+        buys = BulkFIFOService._sorted_side(columns, columns['is_buy'])
+        sells = BulkFIFOService._sorted_side(columns, ~columns['is_buy'])
+
+        sell_groups = BulkFIFOService._groups(sells['instrument_id'])
+        sell_totals = {}
+        if sell_groups is not None:
+            ids, starts, sizes = sell_groups
+            q, p, c = sells['quantity'], sells['price'], sells['commission']
+            for i, values in enumerate(zip(
+                np.add.reduceat(q, starts),
+                BulkFIFOService._sum_products(q, p, starts),
+                np.add.reduceat(c, starts)
+            )):
+                sell_totals[int(ids[i])] = (int(sizes[i]),) + tuple(int(v) for v in values)
+
+        buy_totals = {}
+        buy_groups = BulkFIFOService._groups(buys['instrument_id'])
+        if buy_groups is not None:
+            buy_totals = BulkFIFOService._consume_buys(buys, buy_groups, sell_totals)
+
+        positions = {}
+        for instrument_id in set(buy_totals) | set(sell_totals):
+            positions[instrument_id] = BulkFIFOService._position(
+                buy_totals.get(instrument_id), sell_totals.get(instrument_id)
+            )
+
+        return positions
+
+    @staticmethod
+    def compute_totals(columns: Dict[str, np.ndarray], prices: Dict[int, Decimal]) -> Dict[int, Dict]:
+        """
+        Full FIFO metrics of every instrument, as calculate_instrument_totals.
+
+        Args:
+            columns: Columnar arrays (see load_columns)
+            prices: instrument_id -> current price (missing = 0)
+
+        Returns:
+            dict: instrument_id -> metrics dict
+        """
+        return {
+            instrument_id: FIFOService.totals_from_position(position, prices.get(instrument_id, 0))
+            for instrument_id, position in BulkFIFOService.compute_positions(columns).items()
+        }
+
+    @staticmethod
+    def reconcile(user_id: Optional[int] = None) -> List[Dict]:
+        """
+        Check the bulk engine and the stored snapshots against the Decimal path.
+
+        Para cada instrumento compara, al centavo, las métricas del motor
+        masivo y las de position_snapshots con las de
+        FIFOService.calculate_instrument_totals.
+
+        Args:
+            user_id: Only this user's instruments (None = all users)
+
+        Returns:
+            list: One dict per mismatch ('instrument_id', 'source', 'field',
+                  'expected', 'actual')
+        """
+        rows = BulkFIFOService._load_rows(user_id)
+        bulk = BulkFIFOService.compute_positions(BulkFIFOService.to_columns(rows))
+
+        instruments = Instrument.query
+        if user_id is not None:
+            instruments = instruments.filter_by(user_id=user_id)
+        instrument_ids = [inst.id for inst in instruments.with_entities(Instrument.id)]
+
+        snapshots = {
+            snapshot.instrument_id: snapshot.to_position()
+            for snapshot in PositionSnapshot.query.filter(
+                PositionSnapshot.instrument_id.in_(instrument_ids)
+            )
+        } if instrument_ids else {}
+
+        # Mismas filas, como TxRecord para el camino de FIFOService
+        by_instrument = {
+            instrument_id: [TxRecord.from_row((r[1], r[3], r[2], r[4], r[5], r[6])) for r in group]
+            for instrument_id, group in groupby(rows, key=lambda r: r[0])
+        }
+
+        mismatches = []
+        for instrument_id in instrument_ids:
+            history = by_instrument.get(instrument_id, [])
+            if not history:
+                continue
+
+            # Con precio 0 el resultado depende solo de la posición
+            expected = FIFOService.calculate_instrument_totals(history, 0)
+
+            for source, position in (('bulk', bulk.get(instrument_id)),
+                                     ('snapshot', snapshots.get(instrument_id))):
+                if position is None:
+                    mismatches.append({
+                        'instrument_id': instrument_id, 'source': source,
+                        'field': None, 'expected': 'present', 'actual': None
+                    })
+                    continue
+
+                actual = FIFOService.totals_from_position(position, 0)
+                for field, value in expected.items():
+                    if Decimal(str(value)) != Decimal(str(actual[field])):
+                        mismatches.append({
+                            'instrument_id': instrument_id, 'source': source,
+                            'field': field, 'expected': value, 'actual': actual[field]
+                        })
+
+        return mismatches
+
+    @staticmethod
+    def _sorted_side(columns: Dict[str, np.ndarray], mask: np.ndarray) -> Dict[str, np.ndarray]:
+        """Rows of one side (buys or sells) in queue order: instrument, date, id."""
+        side = {name: values[mask] for name, values in columns.items()}
+        order = np.lexsort((side['id'], side['date'], side['instrument_id']))
+        return {name: values[order] for name, values in side.items()}
+
+    @staticmethod
+    def _groups(instrument_ids: np.ndarray):
+        """(unique ids, start offsets, sizes) of the runs of a sorted id array."""
+        if len(instrument_ids) == 0:
+            return None
+
+        starts = np.flatnonzero(np.r_[True, instrument_ids[1:] != instrument_ids[:-1]])
+        sizes = np.diff(np.r_[starts, len(instrument_ids)])
+        return instrument_ids[starts], starts, sizes
+
+    @staticmethod
+    def _consume_buys(buys: Dict[str, np.ndarray], groups, sell_totals: Dict) -> Dict[int, tuple]:
+        """Per-instrument sums of consumed and open buy lots."""
+        ids, starts, sizes = groups
+        q, p, c = buys['quantity'], buys['price'], buys['commission']
+
+        # Cantidad comprada acumulada antes de cada lote, dentro de su instrumento.
+        # En int64 la suma global puede dar la vuelta; las diferencias dentro
+        # de un instrumento siguen siendo exactas (módulo 2**64) porque su
+        # valor real cabe (ver to_columns)
+        cumulative = np.cumsum(q)
+        group_base = np.repeat(cumulative[starts] - q[starts], sizes)
+        bought_before = cumulative - group_base - q
+
+        sold = np.array(
+            [sell_totals.get(int(i), (0, 0))[1] for i in ids], dtype=q.dtype
+        )
+        sold_per_lot = np.repeat(sold, sizes)
+
+        consumed = np.minimum(np.maximum(sold_per_lot - bought_before, 0), q)
+        remaining = q - consumed
+        full = (consumed == q) & (sold_per_lot > bought_before)
+        zero = np.zeros_like(c)
+
+        sums = zip(
+            np.add.reduceat(q, starts),
+            np.add.reduceat(c, starts),
+            BulkFIFOService._sum_products(consumed, p, starts),
+            np.add.reduceat(np.where(full, c, zero), starts),
+            BulkFIFOService._sum_products(remaining, p, starts),
+            np.add.reduceat(np.where(full, zero, c), starts),
+        )
+        totals = {
+            int(ids[i]): [int(sizes[i])] + [int(v) for v in values] + [0]
+            for i, values in enumerate(sums)
+        }
+
+        # Comisión proporcional del lote parcial (uno por instrumento como máximo)
+        partial = np.flatnonzero((consumed > 0) & ~full)
+        lot_group = np.searchsorted(starts, partial, side='right') - 1
+        for row, group in zip(partial, lot_group):
+            portion = div_round(
+                int(consumed[row]) * rescale(int(c[row]), MONEY_PLACES, ACCUM_PLACES), int(q[row])
+            )
+            totals[int(ids[group])][-1] += portion
+
+        return {instrument_id: tuple(values) for instrument_id, values in totals.items()}
+
+    @staticmethod
+    def _sum_products(a: np.ndarray, b: np.ndarray, starts: np.ndarray) -> List[int]:
+        """
+        Exact per-group sums of a × b (non-negative scaled integers).
+
+        Con int64 el producto de una cantidad (12 decimales) por un precio
+        (8 decimales) no cabe en 64 bits, así que cada factor se parte en
+        tres partes de _LIMB_BITS bits; los nueve productos parciales se
+        suman por grupo en int64 y se recombinan como enteros de Python.
+
+        Args:
+            a, b: Columns of the same dtype
+            starts: Group start offsets (see _groups)
+
+        Returns:
+            list: One int per group
+        """
+        if a.dtype == object:
+            return [int(v) for v in np.add.reduceat(a * b, starts)]
+
+        bits, mask = BulkFIFOService._LIMB_BITS, BulkFIFOService._LIMB_MASK
+        a_limbs = [(a >> (bits * k)) & mask for k in range(3)]
+        b_limbs = [(b >> (bits * k)) & mask for k in range(3)]
+
+        totals = [0] * len(starts)
+        for i, a_limb in enumerate(a_limbs):
+            for j, b_limb in enumerate(b_limbs):
+                shift = bits * (i + j)
+                for group, value in enumerate(np.add.reduceat(a_limb * b_limb, starts).tolist()):
+                    totals[group] += value << shift
+        return totals
+
+    @staticmethod
+    def _position(buy_totals: Optional[tuple], sell_totals: Optional[tuple]) -> Dict:
+        """Position dict of one instrument from its scaled sums."""
+        (buy_count, bought, buy_commissions, consumed_cost,
+         consumed_commissions, open_cost, open_commissions, partial_commission) = \
+            buy_totals or (0, 0, 0, 0, 0, 0, 0, 0)
+        sell_count, sold, proceeds, sell_commissions = sell_totals or (0, 0, 0, 0)
+
+        # Mismo estado en enteros escalados que FIFOService._new_state
+        lot_commissions = rescale(consumed_commissions, MONEY_PLACES, ACCUM_PLACES) + partial_commission
+        sell_commissions = rescale(sell_commissions, MONEY_PLACES, ACCUM_PLACES)
+
+        state = {
+            'buy_count': buy_count,
+            'sell_count': sell_count,
+            'buy_commissions': buy_commissions,
+            'total_sold': rescale(proceeds, COST_PLACES, ACCUM_PLACES) - sell_commissions,
+            'cost_basis_sold': rescale(consumed_cost, COST_PLACES, ACCUM_PLACES) + lot_commissions,
+            'commissions_paid': sell_commissions + lot_commissions,
+        }
+
+        return {
+            'buy_count': buy_count,
+            'sell_count': sell_count,
+            'current_quantity': to_decimal(bought - sold, QTY_PLACES),
+            'cost_basis': to_decimal(open_cost, COST_PLACES),
+            'open_commissions': to_decimal(open_commissions, MONEY_PLACES),
+            'realized': FIFOService._realized_from(state)
+        }
@@ -0,0 +1,410 @@
+"""
+Cache backends for MarketService quotes.
+
+El backend por defecto es un diccionario en memoria (uno por proceso).
+Para despliegues con varios workers de gunicorn se puede usar el backend
+SQLite: un archivo local en modo WAL que todos los procesos del nodo leen
+y que sobrevive a reinicios y despliegues.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import fields
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Optional
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from app.services.quote_snapshot import QuoteSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Interface for quote cache backends (key -> {data, timestamp})."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cache entry for ``key`` or None."""
+
+    @abstractmethod
+    def set(self, key: str, entry: Dict):
+        """Store a cache entry for ``key``."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove ``key`` if present."""
+
+    @abstractmethod
+    def clear(self):
+        """Remove every entry."""
+
+    def stats(self) -> Dict:
+        """Entry count, size and eviction counters for monitoring."""
+        return {}
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU cache (default), bounded by entry count and/or bytes.
+
+    Al superar un límite primero descarta las entradas vencidas (más allá
+    del margen ``stale_grace`` en que aún pueden servirse como stale) y
+    luego las menos usadas recientemente. Sin llegar al límite, las
+    escrituras también descartan las vencidas cada ``purge_interval``
+    segundos, para no retener cotizaciones que ya no se pueden servir. El
+    tamaño de cada entrada se estima con sys.getsizeof (sin serializar) y
+    solo si hay ``max_bytes``.
+    """
+
+    # Segundos entre limpiezas de vencidas cuando no se supera ningún límite
+    purge_interval = 60
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 stale_grace: timedelta = timedelta(0)):
+        """
+        Args:
+            max_entries: Maximum number of entries (None = unbounded)
+            max_bytes: Approximate memory budget in bytes (None or 0 = unbounded,
+                       and entries are not sized)
+            stale_grace: How long past 'expires_at' an entry is still useful
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes or None
+        self.stale_grace = stale_grace
+        self._data: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._evictions = 0
+        self._expired_evictions = 0
+        self._last_purge = time.time()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict):
+        size = self._entry_size(entry) if self.max_bytes is not None else 0
+
+        with self._lock:
+            self._remove(key)
+            self._data[key] = entry
+            self._sizes[key] = size
+            self._bytes += size
+            self._enforce_limits()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'evictions': self._evictions,
+                'expired_evictions': self._expired_evictions,
+            }
+
+    def purge_expired(self) -> int:
+        """Drop every entry past its expiry plus the stale grace."""
+        with self._lock:
+            return self._purge_expired()
+
+    def _enforce_limits(self):
+        """Evict expired entries (over a limit or every purge_interval), then least recently used ones."""
+        now = time.time()
+        if not self._over_limit() and now - self._last_purge < self.purge_interval:
+            return
+
+        self._last_purge = now
+        self._purge_expired()
+
+        while self._data and self._over_limit():
+            key = next(iter(self._data))
+            self._remove(key)
+            self._evictions += 1
+
+    def _over_limit(self) -> bool:
+        return (
+            (self.max_entries is not None and len(self._data) > self.max_entries) or
+            (self.max_bytes is not None and self._bytes > self.max_bytes)
+        )
+
+    def _purge_expired(self) -> int:
+        cutoff = datetime.now() - self.stale_grace
+        expired = [
+            key for key, entry in self._data.items()
+            if entry.get('expires_at') is not None and entry['expires_at'] < cutoff
+        ]
+
+        for key in expired:
+            self._remove(key)
+
+        self._expired_evictions += len(expired)
+        return len(expired)
+
+    def _remove(self, key: str):
+        if key in self._data:
+            del self._data[key]
+            self._bytes -= self._sizes.pop(key, 0)
+
+    @staticmethod
+    def _entry_size(entry: Dict) -> int:
+        """Rough size: the entry, its values and their attributes (two levels)."""
+        size = sys.getsizeof(entry)
+        for value in entry.values():
+            size += sys.getsizeof(value)
+            inner = value if isinstance(value, dict) else getattr(value, '__dict__', None)
+            if inner:
+                size += sum(sys.getsizeof(item) for item in inner.values())
+        return size
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    File-backed cache shared by every worker on the node.
+
+    Usa SQLite en modo WAL: los lectores no bloquean al escritor. Las
+    entradas se guardan como JSON (ver _encode_value) y ``expires_at`` va
+    en su propia columna, así las escrituras pueden borrar las vencidas
+    (más allá de ``stale_grace``) y recortar la tabla a ``max_entries``
+    filas.
+
+    El recorte es por orden de escritura (``updated_at``), no LRU: las
+    lecturas no escriben, porque registrar cada acceso convertiría cada
+    get en una escritura que compite por el lock entre workers. Como las
+    cotizaciones que se leen se vuelven a escribir al refrescarlas (o al
+    revalidarlas como stale), las que se dejan de leer son las que primero
+    quedan atrás.
+    """
+
+    # Segundos entre limpiezas; la limpieza la hace el proceso que escribe
+    purge_interval = 60
+
+    def __init__(self, path: str, timeout: float = 5.0, max_entries: Optional[int] = None,
+                 stale_grace: timedelta = timedelta(0)):
+        """
+        Args:
+            path: Database file
+            timeout: Seconds to wait for the write lock
+            max_entries: Row cap (None = unbounded)
+            stale_grace: How long past 'expires_at' an entry is still useful
+        """
+        self.path = path
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.stale_grace = stale_grace
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._evictions = 0
+        self._expired_evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(quote_cache)')]
+        if columns and 'expires_at' not in columns:
+            # Archivo del formato anterior (pickle, sin expires_at): es solo caché
+            conn.execute('DROP TABLE quote_cache')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS quote_cache ('
+            'key TEXT PRIMARY KEY, '
+            'entry TEXT NOT NULL, '
+            'expires_at REAL, '
+            'updated_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_quote_cache_expires ON quote_cache (expires_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_quote_cache_updated ON quote_cache (updated_at)')
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread and process (safe after fork)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            row = self._connection().execute(
+                'SELECT entry FROM quote_cache WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading quote cache ({key}): {str(e)}")
+            return None
+
+        if row is None:
+            return None
+
+        try:
+            return json.loads(row[0], object_hook=_decode_value)
+        except Exception as e:
+            logger.error(f"Corrupt quote cache entry ({key}): {str(e)}")
+            self.delete(key)
+            return None
+
+    def set(self, key: str, entry: Dict):
+        expires_at = entry.get('expires_at')
+        now = time.time()
+
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO quote_cache (key, entry, expires_at, updated_at) '
+                'VALUES (?, ?, ?, ?)',
+                (key, json.dumps(entry, default=_encode_value),
+                 expires_at.timestamp() if expires_at is not None else None, now)
+            )
+            if now - self._last_purge >= self.purge_interval:
+                self._last_purge = now
+                self._purge(conn, now)
+            conn.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"Error writing quote cache ({key}): {str(e)}")
+
+    def delete(self, key: str):
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM quote_cache WHERE key = ?', (key,))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting quote cache ({key}): {str(e)}")
+
+    def clear(self):
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM quote_cache')
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error clearing quote cache: {str(e)}")
+
+    def stats(self) -> Dict:
+        try:
+            entries, size = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(LENGTH(entry)), 0) FROM quote_cache'
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading quote cache stats: {str(e)}")
+            return {}
+
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_entries': self.max_entries,
+            'evictions': self._evictions,
+            'expired_evictions': self._expired_evictions,
+            'path': self.path,
+        }
+
+    def purge_expired(self) -> int:
+        """Drop expired rows and trim the table to max_entries."""
+        try:
+            conn = self._connection()
+            removed = self._purge(conn, time.time())
+            conn.commit()
+            return removed
+        except sqlite3.Error as e:
+            logger.error(f"Error purging quote cache: {str(e)}")
+            return 0
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> int:
+        """Delete rows past expiry plus the stale grace, then the least recently written over the cap."""
+        expired = conn.execute(
+            'DELETE FROM quote_cache WHERE expires_at < ?',
+            (now - self.stale_grace.total_seconds(),)
+        ).rowcount
+        self._expired_evictions += expired
+
+        evicted = 0
+        if self.max_entries is not None:
+            evicted = conn.execute(
+                'DELETE FROM quote_cache WHERE key NOT IN ('
+                'SELECT key FROM quote_cache ORDER BY updated_at DESC, rowid DESC LIMIT ?)',
+                (self.max_entries,)
+            ).rowcount
+            self._evictions += evicted
+
+        return expired + evicted
+
+
+# Serialización JSON del backend SQLite. Las entradas de MarketService son
+# {'data': QuoteSnapshot | {'rate': Decimal}, 'timestamp': datetime,
+#  'expires_at': datetime}; los tipos que JSON no tiene van marcados.
+
+def _encode_value(value):
+    """json.dumps ``default``: tagged form of datetime, Decimal and QuoteSnapshot."""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, QuoteSnapshot):
+        return {'__quote__': {field.name: getattr(value, field.name) for field in fields(value)}}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _decode_value(obj: Dict):
+    """json.loads ``object_hook``: inverse of _encode_value."""
+    if len(obj) == 1:
+        if '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        if '__decimal__' in obj:
+            return Decimal(obj['__decimal__'])
+        if '__quote__' in obj:
+            return QuoteSnapshot(**obj['__quote__'])
+    return obj
+
+
+def create_cache_backend(name: str, path: Optional[str] = None,
+                         max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                         stale_grace: timedelta = timedelta(0)) -> CacheBackend:
+    """
+    Build a cache backend from its configuration name.
+
+    Args:
+        name: 'memory' or 'sqlite'
+        path: Database file for the sqlite backend
+        max_entries: Entry limit (memory LRU, sqlite row cap)
+        max_bytes: Byte budget for the memory backend
+        stale_grace: How long expired entries stay useful
+
+    Returns:
+        CacheBackend: The configured backend
+    """
+    name = (name or 'memory').lower()
+
+    if name == 'memory':
+        return MemoryCacheBackend(max_entries, max_bytes, stale_grace)
+
+    if name == 'sqlite':
+        if not path:
+            raise ValueError("MARKET_CACHE_PATH is required for the sqlite cache backend")
+        return SQLiteCacheBackend(path, max_entries=max_entries, stale_grace=stale_grace)
+
+    raise ValueError(f"Unknown market cache backend: {name}")
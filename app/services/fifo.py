@@ -3,101 +3,318 @@ FIFO Service - Cálculo de Ganancias Realizadas
 First In, First Out method for calculating realized gains/losses
 """
 
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, date
+from operator import attrgetter
 from decimal import Decimal, ROUND_HALF_UP
 import logging
 from decimal import Decimal
 
+from app.utils.fixed_point import (
+    QTY_PLACES, PRICE_PLACES, MONEY_PLACES, COST_PLACES, ACCUM_PLACES,
+    to_scaled, to_decimal, div_round
+)
+
 logger = logging.getLogger(__name__)
 
+# Factores para llevar cantidad × precio y comisiones a la escala de los acumulados
+_COST_TO_ACCUM = 10 ** (ACCUM_PLACES - COST_PLACES)
+_MONEY_TO_ACCUM = 10 ** (ACCUM_PLACES - MONEY_PLACES)
+
+
+def _to_date(d):
+    return d.date() if isinstance(d, datetime) else d
+
+
+class TxRecord(NamedTuple):
+    """
+    Transacción compacta e inmutable: la entrada de todas las funciones FIFO.
+
+    Los montos son enteros escalados (app.utils.fixed_point) con las escalas
+    de las columnas: cantidad a 12 decimales, precio a 8 y comisión a 2.
+    """
+
+    id: Optional[int]
+    transaction_type: str
+    transaction_date: date
+    quantity: int
+    price: int
+    commission: int
+
+    @classmethod
+    def from_row(cls, row) -> 'TxRecord':
+        """
+        Record from a (id, transaction_type, transaction_date, quantity,
+        price, commission) row, e.g. a Core select of those columns.
+        """
+        tx_id, tx_type, tx_date, quantity, price, commission = row
+        return cls(
+            tx_id, tx_type, _to_date(tx_date),
+            to_scaled(quantity, QTY_PLACES),
+            to_scaled(price, PRICE_PLACES),
+            to_scaled(commission or 0, MONEY_PLACES)
+        )
+
+    @classmethod
+    def from_transaction(cls, transaction) -> 'TxRecord':
+        """Record from a Transaction (or any object with the same attributes)."""
+        return cls.from_row((
+            getattr(transaction, 'id', None), transaction.transaction_type,
+            transaction.transaction_date, transaction.quantity,
+            getattr(transaction, 'price', 0), getattr(transaction, 'commission', 0)
+        ))
+
+
+class _Lot(NamedTuple):
+    """
+    Lote de compra abierto en la cola FIFO (inmutable; una venta parcial
+    reemplaza el lote de la cabeza).
+
+    Cantidad a 12 decimales, precio a 8, comisión restante a 30 y comisión
+    original (la que usa lo no realizado) a 2.
+    """
+
+    quantity: int
+    price: int
+    commission: int
+    original_commission: int
+    transaction_id: Optional[int]
+    transaction_date: Optional[date]
+
+
+class _LotStore(ABC):
+    """
+    Lotes abiertos de un instrumento; cada subclase decide en qué orden se
+    venden. Montos en enteros escalados como en FIFOService.
+    """
+
+    @abstractmethod
+    def push(self, lot: _Lot) -> None:
+        """Add a bought lot."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of open lots (0 when nothing is left to sell)."""
+
+    @abstractmethod
+    def consume(self, quantity: int) -> Tuple[int, int]:
+        """
+        Consume ``quantity`` units in the store's order.
+
+        Args:
+            quantity: Units to sell (QTY_PLACES)
+
+        Returns:
+            tuple: (cost basis, purchase commissions) of the consumed units,
+                   both at ACCUM_PLACES
+        """
+
+
+class _OrderedLotStore(_LotStore):
+    """Lotes individuales que se venden uno a uno en el orden de peek."""
+
+    @abstractmethod
+    def peek(self) -> _Lot:
+        """Next lot to sell."""
+
+    @abstractmethod
+    def pop(self) -> None:
+        """Drop the next lot after selling it entirely."""
+
+    @abstractmethod
+    def replace_top(self, lot: _Lot) -> None:
+        """Replace the next lot (same priority) after a partial sell."""
+
+    def consume(self, quantity: int) -> Tuple[int, int]:
+        """
+        Consume ``quantity`` units lot by lot (see _LotStore.consume).
+
+        Lote completo con su comisión restante, lote parcial con comisión
+        proporcional. FIFOService._apply_sell vende a través de _FIFOStore.
+        """
+        cost_basis = 0
+        commissions = 0
+
+        while quantity > 0 and len(self):
+            lot = self.peek()
+
+            if lot.quantity <= quantity:
+                cost_basis += lot.quantity * lot.price * _COST_TO_ACCUM + lot.commission
+                commissions += lot.commission
+                quantity -= lot.quantity
+                self.pop()
+            else:
+                portion = div_round(quantity * lot.commission, lot.quantity)
+                cost_basis += quantity * lot.price * _COST_TO_ACCUM + portion
+                commissions += portion
+                self.replace_top(lot._replace(
+                    quantity=lot.quantity - quantity,
+                    commission=lot.commission - portion
+                ))
+                quantity = 0
+
+        return cost_basis, commissions
+
+
+class _FIFOStore(_OrderedLotStore):
+    """Cola: el lote más antiguo primero."""
+
+    def __init__(self, lots: Optional[deque] = None):
+        # Sin copiar: FIFOService envuelve la cola de lotes de su estado
+        self._lots = deque() if lots is None else lots
+
+    def push(self, lot):
+        self._lots.append(lot)
+
+    def peek(self):
+        return self._lots[0]
+
+    def pop(self):
+        self._lots.popleft()
+
+    def replace_top(self, lot):
+        self._lots[0] = lot
+
+    def __len__(self):
+        return len(self._lots)
+
 
 class FIFOService:
     """Service for calculating realized gains using FIFO method."""
     
     @staticmethod
-    def calculate_realized_gain(transactions: List) -> Dict:
+    def to_records(transactions) -> List[TxRecord]:
         """
-        Calcula la ganancia realizada usando FIFO, incluyendo comisiones 
-        en el costo base para obtener la ganancia neta real.
+        Convert transactions to TxRecord (records pass through unchanged).
+
+        Args:
+            transactions: Iterable of TxRecord, Transaction or similar objects
+
+        Returns:
+            list: TxRecord list
         """
-        def _to_date(d):
-            from datetime import datetime
-            return d.date() if isinstance(d, datetime) else d
-
-        # Separar y ordenar transacciones
-        buys = sorted([t for t in transactions if t.transaction_type == 'buy'], 
-                      key=lambda x: _to_date(x.transaction_date))
-        sells = sorted([t for t in transactions if t.transaction_type == 'sell'], 
-                       key=lambda x: _to_date(x.transaction_date))
-        
-        if not sells:
+        return [
+            t if type(t) is TxRecord else TxRecord.from_transaction(t)
+            for t in transactions
+        ]
+
+    @staticmethod
+    def _new_state() -> Dict:
+        """
+        Estado FIFO vacío (acumulados y cola de lotes abiertos).
+
+        Todo se acumula en enteros escalados, exactos; se pasa a Decimal
+        solo al armar los resultados (_realized_from, _open_position).
+        """
+        return {
+            'buy_count': 0,
+            'sell_count': 0,
+            'total_bought': 0,          # QTY_PLACES
+            'total_sold_qty': 0,        # QTY_PLACES
+            'buy_commissions': 0,       # MONEY_PLACES
+            'total_sold': 0,            # ACCUM_PLACES: (Precio * Q) - Comisión de venta
+            'cost_basis_sold': 0,       # ACCUM_PLACES: (Precio * Q) + Comisión de compra proporcional
+            'commissions_paid': 0,      # ACCUM_PLACES
+            'last_buy_date': None,
+            'last_sell_date': None,
+            # Cola de compras; deque para consumir el lote más antiguo en O(1)
+            'open_lots': deque()
+        }
+
+    @staticmethod
+    def _apply_buy(state: Dict, buy: TxRecord) -> None:
+        """Agrega una compra al final de la cola de lotes."""
+        commission = buy.commission
+        state['buy_count'] += 1
+        state['total_bought'] += buy.quantity
+        state['buy_commissions'] += commission
+        state['last_buy_date'] = buy.transaction_date
+        state['open_lots'].append(_Lot(
+            buy.quantity, buy.price, commission * _MONEY_TO_ACCUM, commission,
+            buy.id, buy.transaction_date
+        ))
+
+    @staticmethod
+    def _apply_sell(state: Dict, sell: TxRecord) -> None:
+        """Consume los lotes más antiguos con una venta y acumula lo realizado."""
+        quantity_to_sell = sell.quantity
+        sell_commission = sell.commission * _MONEY_TO_ACCUM
+
+        state['sell_count'] += 1
+        state['total_sold_qty'] += quantity_to_sell
+        state['last_sell_date'] = sell.transaction_date
+
+        # Dinero que realmente entra al bolsillo
+        state['total_sold'] += quantity_to_sell * sell.price * _COST_TO_ACCUM - sell_commission
+
+        # Costo = (Precio * Q) + comisión de compra (proporcional en lotes parciales)
+        cost_basis, commissions = _FIFOStore(state['open_lots']).consume(quantity_to_sell)
+
+        state['cost_basis_sold'] += cost_basis
+        state['commissions_paid'] += sell_commission + commissions
+
+    @staticmethod
+    def _replay(transactions: List) -> Dict:
+        """
+        Recorre el historial una sola vez aplicando FIFO.
+
+        Filtra y ordena compras y ventas, consume los lotes con cada venta
+        y deja en la cola los lotes abiertos. Es la base común de
+        calculate_realized_gain, calculate_unrealized_gain y
+        calculate_instrument_totals.
+
+        Args:
+            transactions: Lista de transacciones del instrumento
+                          (TxRecord u objetos convertibles con to_records)
+
+        Returns:
+            dict: Acumulados de lo vendido y la cola de lotes abiertos
+                  (cada lote conserva su comisión original para lo no realizado)
+        """
+        buys = []
+        sells = []
+        for t in FIFOService.to_records(transactions):
+            if t.transaction_type == 'buy':
+                buys.append(t)
+            elif t.transaction_type == 'sell':
+                sells.append(t)
+
+        by_date = attrgetter('transaction_date')
+        buys.sort(key=by_date)
+        sells.sort(key=by_date)
+
+        state = FIFOService._new_state()
+        for buy in buys:
+            FIFOService._apply_buy(state, buy)
+        for sell in sells:
+            FIFOService._apply_sell(state, sell)
+
+        return state
+
+    @staticmethod
+    def _realized_from(replay: Dict) -> Dict:
+        """Métricas realizadas a partir del resultado de _replay."""
+        if not replay['sell_count']:
             # No hay ventas, retornar ceros
-            total_buy_commissions = sum(Decimal(t.commission) for t in buys) if buys else 0.0
             return {
                 'realized_gain': 0.0,
                 'realized_gain_percentage': 0.0,
                 'total_sold': 0.0,
                 'cost_basis_sold': 0.0,
-                'commissions_paid': total_buy_commissions  # ✅ CLAVE CORRECTA
+                'commissions_paid': (
+                    to_decimal(replay['buy_commissions'], MONEY_PLACES) if replay['buy_count'] else 0.0
+                )  # ✅ CLAVE CORRECTA
             }
 
-        # Cola de compras con Decimal para precisión
-        buy_queue = []
-        for buy in buys:
-            buy_queue.append({
-                'quantity': Decimal(str(buy.quantity)),
-                'price': Decimal(str(buy.price)),
-                'commission': Decimal(str(buy.commission))
-            })
-
-        total_sold_neto = Decimal('0.0')   # (Precio * Q) - Comisión de venta
-        cost_basis_total = Decimal('0.0')  # (Precio * Q) + Comisión de compra proporcional
-        total_commissions = Decimal('0.0')
-
-        for sell in sells:
-            quantity_to_sell = Decimal(str(sell.quantity))
-            sell_price = Decimal(str(sell.price))
-            sell_commission = Decimal(str(sell.commission))
-
-            # Dinero que realmente entra al bolsillo
-            total_sold_neto += (quantity_to_sell * sell_price) - sell_commission
-            total_commissions += sell_commission
-            
-            remaining_to_sell = quantity_to_sell
-            
-            while remaining_to_sell > 0 and buy_queue:
-                oldest_buy = buy_queue[0]
-                
-                if oldest_buy['quantity'] <= remaining_to_sell:
-                    # Caso: Venta completa del lote
-                    actual_qty = oldest_buy['quantity']
-                    # Costo = (Precio * Q) + Su comisión total
-                    cost = (actual_qty * oldest_buy['price']) + oldest_buy['commission']
-                    
-                    cost_basis_total += cost
-                    total_commissions += oldest_buy['commission']
-                    remaining_to_sell -= actual_qty
-                    buy_queue.pop(0)
-                else:
-                    # Caso: Venta parcial del lote
-                    actual_qty = remaining_to_sell
-                    # Proporción de la comisión de compra
-                    commission_portion = (actual_qty / oldest_buy['quantity']) * oldest_buy['commission']
-                    
-                    # Costo = (Precio * Q_parcial) + Comisión_proporcional
-                    cost = (actual_qty * oldest_buy['price']) + commission_portion
-                    
-                    cost_basis_total += cost
-                    total_commissions += commission_portion
-                    
-                    # Actualizar el lote para la siguiente venta
-                    oldest_buy['quantity'] -= actual_qty
-                    oldest_buy['commission'] -= commission_portion
-                    remaining_to_sell = Decimal('0')
+        total_sold_neto = to_decimal(replay['total_sold'], ACCUM_PLACES)
+        cost_basis_total = to_decimal(replay['cost_basis_sold'], ACCUM_PLACES)
+        total_commissions = to_decimal(replay['commissions_paid'], ACCUM_PLACES)
 
         # Ganancia realizada neta (ya incluye todas las comisiones)
-        realized_gain = total_sold_neto - cost_basis_total
-        
+        realized_gain = to_decimal(replay['total_sold'] - replay['cost_basis_sold'], ACCUM_PLACES)
+
         # Porcentaje de ganancia sobre el costo total (incluyendo comisiones)
         gain_pct = (realized_gain / cost_basis_total * 100) if cost_basis_total > 0 else Decimal('0')
 
@@ -108,30 +325,35 @@ class FIFOService:
             'cost_basis_sold': Decimal(cost_basis_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
             'commissions_paid': Decimal(total_commissions.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))  # ✅ CLAVE CORRECTA
         }
-    
+
     @staticmethod
-    def calculate_unrealized_gain(
-        transactions: List,
-        current_price: Decimal
-    ) -> Dict:
-        """
-        Calcula la ganancia no realizada de la posición actual.
-        
-        Args:
-            transactions: Lista de transacciones ordenadas por fecha
-            current_price: Precio actual del instrumento
-            
-        Returns:
-            dict: Métricas de la posición actual
-        """
-        buys = [t for t in transactions if t.transaction_type == 'buy']
-        sells = [t for t in transactions if t.transaction_type == 'sell']
-        
+    def _open_position(replay: Dict) -> Dict:
+        """Cantidad, costo base y comisiones de los lotes abiertos (sin redondear)."""
+        # Costo base de lo que queda; el lote parcial conserva su comisión completa
+        cost_basis = 0
+        total_commissions = 0
+
+        for lot in replay['open_lots']:
+            cost_basis += lot.quantity * lot.price
+            total_commissions += lot.original_commission
+
+        return {
+            'current_quantity': to_decimal(replay['total_bought'] - replay['total_sold_qty'], QTY_PLACES),
+            'cost_basis': to_decimal(cost_basis, COST_PLACES),
+            'open_commissions': to_decimal(total_commissions, MONEY_PLACES)
+        }
+
+    @staticmethod
+    def _unrealized_from(replay: Dict, current_price: Decimal) -> Dict:
+        """Métricas de la posición actual a partir del resultado de _replay."""
+        return FIFOService._unrealized_metrics(FIFOService._open_position(replay), current_price)
+
+    @staticmethod
+    def _unrealized_metrics(position: Dict, current_price: Decimal) -> Dict:
+        """Métricas no realizadas de una posición abierta al precio actual."""
         # Calcular cantidad actual
-        total_bought = sum(Decimal(t.quantity) for t in buys)
-        total_sold = sum(Decimal(t.quantity) for t in sells)
-        current_quantity = total_bought - total_sold
-        
+        current_quantity = position['current_quantity']
+
         if current_quantity <= 0:
             return {
                 'unrealized_gain': 0.0,
@@ -142,54 +364,25 @@ class FIFOService:
                 'average_price': 0.0,
                 'commissions_paid': 0.0  # ✅ CLAVE CORRECTA
             }
-        
-        def _to_date(d):
-            from datetime import datetime
-            return d.date() if isinstance(d, datetime) else d
 
-        # Calcular costo base de lo que aún se tiene (usando FIFO)
-        buys_sorted = sorted(buys, key=lambda x: _to_date(x.transaction_date))
-        
-        buy_queue = []
-        for buy in buys_sorted:
-            buy_queue.append({
-                'quantity': Decimal(buy.quantity),
-                'price': Decimal(buy.price),
-                'commission': Decimal(buy.commission)
-            })
-        
-        # Remover lo vendido (FIFO)
-        quantity_to_remove = total_sold
-        while quantity_to_remove > 0 and buy_queue:
-            oldest_buy = buy_queue[0]
-            
-            if oldest_buy['quantity'] <= quantity_to_remove:
-                quantity_to_remove -= oldest_buy['quantity']
-                buy_queue.pop(0)
-            else:
-                oldest_buy['quantity'] -= quantity_to_remove
-                quantity_to_remove = 0
-        
-        # Calcular costo base de lo que queda
-        cost_basis = Decimal('0.0')
-        total_commissions = Decimal('0.0')
-        
-        for buy in buy_queue:
-            cost_basis += buy['quantity'] * buy['price']
-            total_commissions += buy['commission']
-        
+        # El + redondea al contexto Decimal (28 dígitos) como la suma del
+        # cálculo anterior; solo cambia posiciones de más de 28 dígitos, donde
+        # el costo exacto menos current_value (redondeado) daba -0.00
+        cost_basis = +position['cost_basis']
+        total_commissions = position['open_commissions']
+
         # Precio promedio (sin comisiones)
         average_price = cost_basis / current_quantity if current_quantity > 0 else 0.0
-        
+
         # Valor actual
         current_value = current_quantity * Decimal(current_price)
-        
+
         # Ganancia no realizada (sin considerar comisiones en el %)
         unrealized_gain = current_value - cost_basis
         unrealized_gain_percentage = (
             (unrealized_gain / cost_basis * 100) if cost_basis > 0 else 0.0
         )
-        
+
         return {
             'unrealized_gain': round(unrealized_gain, 2),
             'unrealized_gain_percentage': round(unrealized_gain_percentage, 2),
@@ -199,6 +392,31 @@ class FIFOService:
             'average_price': round(average_price, 2),
             'commissions_paid': round(total_commissions, 2)  # ✅ CLAVE CORRECTA
         }
+
+    @staticmethod
+    def calculate_realized_gain(transactions: List) -> Dict:
+        """
+        Calcula la ganancia realizada usando FIFO, incluyendo comisiones 
+        en el costo base para obtener la ganancia neta real.
+        """
+        return FIFOService._realized_from(FIFOService._replay(transactions))
+    
+    @staticmethod
+    def calculate_unrealized_gain(
+        transactions: List,
+        current_price: Decimal
+    ) -> Dict:
+        """
+        Calcula la ganancia no realizada de la posición actual.
+        
+        Args:
+            transactions: Lista de transacciones ordenadas por fecha
+            current_price: Precio actual del instrumento
+            
+        Returns:
+            dict: Métricas de la posición actual
+        """
+        return FIFOService._unrealized_from(FIFOService._replay(transactions), current_price)
     
     @staticmethod
     def calculate_instrument_totals(
@@ -215,10 +433,68 @@ class FIFOService:
         Returns:
             dict: Todas las métricas combinadas
         """
-        # Calcular ganancias realizadas y no realizadas
-        realized = FIFOService.calculate_realized_gain(transactions)
-        unrealized = FIFOService.calculate_unrealized_gain(transactions, current_price)
-        
+        # Una sola pasada FIFO para lo realizado y lo no realizado
+        return FIFOService.totals_from_state(FIFOService._replay(transactions), current_price)
+
+    @staticmethod
+    def totals_from_state(state: Dict, current_price: Decimal) -> Dict:
+        """
+        Métricas del instrumento a partir de un estado FIFO ya calculado
+        (de _replay o del ledger persistido), sin recorrer el historial.
+
+        Args:
+            state: Estado FIFO (acumulados y lotes abiertos)
+            current_price: Precio actual
+
+        Returns:
+            dict: Las mismas métricas que calculate_instrument_totals
+        """
+        return FIFOService._combine(
+            FIFOService._realized_from(state),
+            FIFOService._unrealized_from(state, current_price)
+        )
+
+    @staticmethod
+    def position_from_state(state: Dict) -> Dict:
+        """
+        Parte de las métricas que no depende del precio (para guardarla
+        en position_snapshots).
+
+        Args:
+            state: Estado FIFO (acumulados y lotes abiertos)
+
+        Returns:
+            dict: Conteos, posición abierta sin redondear y métricas realizadas
+        """
+        position = FIFOService._open_position(state)
+        position.update({
+            'buy_count': state['buy_count'],
+            'sell_count': state['sell_count'],
+            'realized': FIFOService._realized_from(state)
+        })
+        return position
+
+    @staticmethod
+    def totals_from_position(position: Dict, current_price: Decimal) -> Dict:
+        """
+        Métricas del instrumento a partir de una posición precalculada:
+        solo se calculan las columnas que dependen del precio.
+
+        Args:
+            position: Resultado de position_from_state
+            current_price: Precio actual
+
+        Returns:
+            dict: Las mismas métricas que calculate_instrument_totals
+        """
+        return FIFOService._combine(
+            position['realized'],
+            FIFOService._unrealized_metrics(position, current_price)
+        )
+
+    @staticmethod
+    def _combine(realized: Dict, unrealized: Dict) -> Dict:
+        """Une las métricas realizadas y no realizadas en el resultado final."""
         # Ganancia total = Realizada + No Realizada
         total_gain = Decimal(realized['realized_gain']) + Decimal(unrealized['unrealized_gain'])
         
@@ -266,28 +542,23 @@ class FIFOService:
         se vendan más unidades de las disponibles en ese momento.
 
         Args:
-            all_transactions: iterable de objetos Transaction del instrumento.
+            all_transactions: iterable de TxRecord (o Transaction) del instrumento.
             exclude_id: id de la transacción a ignorar (usada al eliminar/editar).
 
         Returns:
             (True, None)              → FIFO válido
             (False, "mensaje error")  → FIFO roto, con descripción del problema
         """
-        def _to_date(d):
-            from datetime import datetime
-            return d.date() if isinstance(d, datetime) else d
+        txs = [t for t in FIFOService.to_records(all_transactions) if t.id != exclude_id]
+        txs_sorted = sorted(txs, key=lambda t: (t.transaction_date, 0 if t.transaction_type == 'buy' else 1, t.id))
 
-        txs = [t for t in all_transactions if t.id != exclude_id]
-        txs_sorted = sorted(txs, key=lambda t: (_to_date(t.transaction_date), 0 if t.transaction_type == 'buy' else 1, t.id))
-
-        running_qty = Decimal('0')
+        running_qty = 0
         for tx in txs_sorted:
-            qty = Decimal(str(tx.quantity))
             if tx.transaction_type == 'buy':
-                running_qty += qty
+                running_qty += tx.quantity
             else:
-                running_qty -= qty
-                if running_qty < Decimal('0'):
+                running_qty -= tx.quantity
+                if running_qty < 0:
                     date_str = tx.transaction_date.strftime('%d/%m/%Y')
                     return False, (
                         f"La venta del {date_str} requiere más unidades "
@@ -309,33 +580,26 @@ class FIFOService:
         Returns:
             (True, None) o (False, "mensaje")
         """
-        class FakeTx:
-            def __init__(self, d):
-                self.id = d.get('id')
-                self.transaction_type = d['transaction_type']
-                self.quantity = d['quantity']
-                self.transaction_date = _to_date(d['transaction_date'])
-
-        def _to_date(d):
-            from datetime import datetime
-            return d.date() if isinstance(d, datetime) else d
+        new_tx = TxRecord.from_row((
+            new_tx_data.get('id'), new_tx_data['transaction_type'],
+            new_tx_data['transaction_date'], new_tx_data['quantity'], 0, 0
+        ))
 
         # Filtrar la que se reemplaza (edición)
-        txs = [t for t in all_transactions if t.id != replace_id]
-        txs.append(FakeTx(new_tx_data))
-        txs_sorted = sorted(txs, key=lambda t: (_to_date(t.transaction_date), 0 if t.transaction_type == 'buy' else 1, t.id or 0))
+        txs = [t for t in FIFOService.to_records(all_transactions) if t.id != replace_id]
+        txs.append(new_tx)
+        txs_sorted = sorted(txs, key=lambda t: (t.transaction_date, 0 if t.transaction_type == 'buy' else 1, t.id or 0))
 
-        running_qty = Decimal('0')
+        running_qty = 0
         for tx in txs_sorted:
-            qty = Decimal(str(tx.quantity))
             if tx.transaction_type == 'buy':
-                running_qty += qty
+                running_qty += tx.quantity
             else:
-                running_qty -= qty
-                if running_qty < Decimal('0'):
+                running_qty -= tx.quantity
+                if running_qty < 0:
                     date_str = tx.transaction_date.strftime('%d/%m/%Y')
                     return False, (
                         f"La venta del {date_str} requiere más unidades "
                         f"de las disponibles en esa fecha."
                     )
-        return True, None
\ No newline at end of file
+        return True, None
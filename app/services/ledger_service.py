@@ -0,0 +1,601 @@
+"""
+Ledger Service - Cola FIFO persistida por instrumento
+Keeps open lots, cumulative realized totals and the price-independent
+position snapshot in the database so metrics are not recomputed from every
+transaction on each request
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import deque
+from itertools import groupby
+from decimal import Decimal
+import logging
+
+from sqlalchemy import select, update, and_, or_, not_, case
+
+from app import db
+from app.models import Instrument, Transaction, InstrumentLedger, OpenLot, PositionSnapshot
+from app.services.fifo import FIFOService, TxRecord, _Lot, _to_date
+from app.utils.fixed_point import (
+    QTY_PLACES, PRICE_PLACES, MONEY_PLACES, ACCUM_PLACES, to_scaled, to_decimal
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerService:
+    """Service for the persisted FIFO ledger (open_lots, instrument_ledgers, position_snapshots)."""
+
+    # Campos que se copian tal cual entre el estado FIFO y el ledger
+    _LEDGER_FIELDS = ('buy_count', 'sell_count', 'last_buy_date', 'last_sell_date')
+
+    # Acumulados: entero escalado en el estado FIFO, Decimal en la columna
+    _SCALED_FIELDS = (
+        ('total_bought', QTY_PLACES),
+        ('total_sold_qty', QTY_PLACES),
+        ('buy_commissions', MONEY_PLACES),
+        ('total_sold', ACCUM_PLACES),
+        ('cost_basis_sold', ACCUM_PLACES),
+        ('commissions_paid', ACCUM_PLACES)
+    )
+
+    # Media unidad de la escala de cantidad: "< -epsilon" equivale a "< 0"
+    # con DECIMAL exacto y evita falsos negativos con el REAL de SQLite
+    _QTY_EPSILON = Decimal('0.0000000000005')
+
+    # Marca de "sin running_quantity": hay que simular con el historial
+    _UNKNOWN = object()
+
+    @staticmethod
+    def get_state(instrument: Instrument) -> Dict:
+        """
+        FIFO state of an instrument, read from the ledger.
+
+        Si el instrumento aún no tiene ledger (datos anteriores a esta
+        tabla) se calcula en memoria desde el historial, sin guardarlo.
+
+        Args:
+            instrument: Instrument object
+
+        Returns:
+            dict: FIFO state usable with FIFOService.totals_from_state
+        """
+        state = LedgerService.load_state(instrument.id)
+        if state is not None:
+            return state
+
+        return LedgerService._replay_missing([instrument], LedgerService.load_histories([instrument.id]))[0]
+
+    @staticmethod
+    def get_position(instrument: Instrument) -> Dict:
+        """
+        Price-independent position of an instrument (one indexed read).
+
+        Args:
+            instrument: Instrument object
+
+        Returns:
+            dict: Position usable with FIFOService.totals_from_position
+        """
+        snapshot = db.session.get(PositionSnapshot, instrument.id)
+        if snapshot is not None:
+            return snapshot.to_position()
+
+        states = LedgerService._replay_missing([instrument], LedgerService.load_histories([instrument.id]))
+        return FIFOService.position_from_state(states[0])
+
+    @staticmethod
+    def get_positions(instruments, histories: Optional[Dict[int, List[TxRecord]]] = None) -> Dict[int, Dict]:
+        """
+        Positions of several instruments with a single query.
+
+        Los instrumentos sin snapshot (datos anteriores al ledger) se
+        calculan en memoria con sus historiales cargados en una sola
+        consulta agrupada.
+
+        Args:
+            instruments: List of Instrument objects
+            histories: Pre-grouped histories (see load_histories), if the
+                       caller already has them
+
+        Returns:
+            dict: instrument_id -> position
+        """
+        if not instruments:
+            return {}
+
+        snapshots = PositionSnapshot.query.filter(
+            PositionSnapshot.instrument_id.in_([inst.id for inst in instruments])
+        ).all()
+        positions = {snapshot.instrument_id: snapshot.to_position() for snapshot in snapshots}
+
+        missing = [inst for inst in instruments if inst.id not in positions]
+        if missing:
+            if histories is None:
+                histories = LedgerService.load_histories([inst.id for inst in missing])
+            for inst, state in zip(missing, LedgerService._replay_missing(missing, histories)):
+                positions[inst.id] = FIFOService.position_from_state(state)
+
+        return positions
+
+    @staticmethod
+    def load_histories(instrument_ids: Optional[List[int]] = None,
+                       user_id: Optional[int] = None) -> Dict[int, List[TxRecord]]:
+        """
+        Transaction histories of many instruments with a single query.
+
+        Una consulta ordenada por (instrument_id, transaction_date, id) y
+        una sola pasada que agrupa las filas por instrumento; cada lista
+        queda en el orden de la cola FIFO.
+
+        Args:
+            instrument_ids: Only these instruments (every requested id gets
+                            a list, empty if it has no transactions)
+            user_id: Only this user's transactions
+
+        Returns:
+            dict: instrument_id -> list of TxRecord
+        """
+        histories = {instrument_id: [] for instrument_id in instrument_ids or ()}
+        if instrument_ids is not None and not instrument_ids:
+            return histories
+
+        query = select(Transaction.instrument_id, *LedgerService._RECORD_COLUMNS).order_by(
+            Transaction.instrument_id, Transaction.transaction_date, Transaction.id
+        )
+        if instrument_ids is not None:
+            query = query.where(Transaction.instrument_id.in_(instrument_ids))
+        if user_id is not None:
+            query = query.where(Transaction.user_id == user_id)
+
+        histories.update(LedgerService.group_records(db.session.execute(query)))
+        return histories
+
+    @staticmethod
+    def group_records(rows: Iterable) -> Dict[int, List[TxRecord]]:
+        """
+        Group rows of (instrument_id, *TxRecord columns) already ordered by
+        instrument, without materializing the full result first.
+        """
+        return {
+            instrument_id: [TxRecord.from_row(row[1:]) for row in group]
+            for instrument_id, group in groupby(rows, key=lambda row: row[0])
+        }
+
+    @staticmethod
+    def _replay_missing(instruments: List[Instrument], histories: Dict[int, List[TxRecord]]) -> List[Dict]:
+        """
+        FIFO states of instruments that have no ledger yet, replayed in
+        memory. Read paths never write: the ledger is persisted by the
+        write routes (rebuild, record_transaction) or `flask rebuild-ledgers`.
+        """
+        return [FIFOService._replay(histories.get(inst.id, [])) for inst in instruments]
+
+    @staticmethod
+    def load_state(instrument_id: int) -> Optional[Dict]:
+        """
+        Load the persisted FIFO state (O(open lots)).
+
+        Args:
+            instrument_id: Instrument id
+
+        Returns:
+            dict: FIFO state, or None if the instrument has no ledger yet
+        """
+        ledger = db.session.get(InstrumentLedger, instrument_id)
+        if ledger is None:
+            return None
+
+        state = FIFOService._new_state()
+        for field in LedgerService._LEDGER_FIELDS:
+            state[field] = getattr(ledger, field)
+        for field, places in LedgerService._SCALED_FIELDS:
+            state[field] = to_scaled(getattr(ledger, field), places)
+
+        lots = OpenLot.query.filter_by(instrument_id=instrument_id).order_by(
+            OpenLot.transaction_date, OpenLot.transaction_id
+        ).all()
+        state['open_lots'] = deque(
+            _Lot(to_scaled(lot.quantity, QTY_PLACES), to_scaled(lot.price, PRICE_PLACES),
+                 to_scaled(lot.commission, ACCUM_PLACES), to_scaled(lot.original_commission, MONEY_PLACES),
+                 lot.transaction_id, lot.transaction_date)
+            for lot in lots
+        )
+
+        return state
+
+    @staticmethod
+    def rebuild(instrument: Instrument, records: Optional[List[TxRecord]] = None) -> Dict:
+        """
+        Replay the instrument's history and overwrite its ledger and
+        position snapshot. Does not commit; the caller owns the transaction.
+
+        Límite deliberado: siempre reproduce desde la primera transacción,
+        no desde la fecha afectada. La cola de lotes en una fecha intermedia
+        no se persiste, así que partir de esa fecha exigiría reproducir de
+        todos modos el historial anterior para reconstruirla. Solo se llega
+        aquí con ediciones, bajas y altas con fecha anterior (ver
+        record_transaction); el alta en orden cronológico es incremental.
+
+        Args:
+            instrument: Instrument object
+            records: The instrument's history in queue order (see
+                     load_histories); loaded here if not given
+
+        Returns:
+            dict: The new FIFO state
+        """
+        db.session.flush()
+
+        if records is None:
+            records = LedgerService._ordered_records(instrument.id)
+        LedgerService._refresh_running(instrument.id, records)
+        state = FIFOService._replay(records)
+
+        OpenLot.query.filter_by(instrument_id=instrument.id).delete(synchronize_session=False)
+        db.session.bulk_save_objects([
+            LedgerService._lot_row(instrument.id, lot) for lot in state['open_lots']
+        ])
+        LedgerService._save_totals(instrument, state)
+
+        return state
+
+    @staticmethod
+    def record_transaction(transaction: Transaction) -> Dict:
+        """
+        Update the ledger after inserting a new transaction.
+
+        Una compra con fecha igual o posterior a la última compra se agrega
+        al final de la cola, y una venta con fecha igual o posterior a la
+        última venta consume los lotes abiertos. Cualquier otro caso
+        (transacción con fecha anterior) reconstruye el ledger del
+        instrumento completo, desde la primera transacción (ver el límite
+        documentado en rebuild). Does not commit.
+
+        Args:
+            transaction: The new (flushed) transaction
+
+        Returns:
+            dict: The updated FIFO state
+        """
+        instrument = transaction.instrument
+        state = LedgerService.load_state(instrument.id)
+        if state is None or not LedgerService._insert_running(transaction):
+            return LedgerService.rebuild(instrument)
+
+        record = TxRecord.from_transaction(transaction)
+        tx_date = record.transaction_date
+
+        if transaction.transaction_type == 'buy':
+            # Con ventas sin cubrir la compra se consumiría de inmediato
+            in_order = state['last_buy_date'] is None or tx_date >= state['last_buy_date']
+            if not in_order or state['total_sold_qty'] > state['total_bought']:
+                return LedgerService.rebuild(instrument)
+
+            FIFOService._apply_buy(state, record)
+            db.session.add(LedgerService._lot_row(instrument.id, state['open_lots'][-1]))
+
+        else:
+            if state['last_sell_date'] is not None and tx_date < state['last_sell_date']:
+                return LedgerService.rebuild(instrument)
+
+            queued_ids = [lot.transaction_id for lot in state['open_lots']]
+            FIFOService._apply_sell(state, record)
+            LedgerService._save_consumed_lots(queued_ids, state)
+
+        LedgerService._save_totals(instrument, state)
+        return state
+
+    @staticmethod
+    def validate_removal(transaction: Transaction) -> Tuple[bool, Optional[str]]:
+        """
+        Check that deleting a transaction never leaves a later sell without units.
+
+        Una sola consulta sobre running_quantity: la primera venta posterior
+        cuya cantidad acumulada quede negativa sin esta transacción. Con
+        filas sin running_quantity se recurre a la simulación completa.
+
+        Args:
+            transaction: Transaction to delete
+
+        Returns:
+            (True, None) or (False, "mensaje error")
+        """
+        changes = [(LedgerService._key(transaction), -LedgerService._signed(transaction))]
+        first_broken = LedgerService._first_broken_sell(
+            transaction.instrument_id, changes, exclude_id=transaction.id
+        )
+
+        if first_broken is LedgerService._UNKNOWN:
+            return FIFOService._validate_fifo_integrity(
+                LedgerService._ordered_records(transaction.instrument_id), exclude_id=transaction.id
+            )
+        if first_broken is not None:
+            date_str = first_broken.strftime('%d/%m/%Y')
+            return False, (
+                f"La venta del {date_str} requiere más unidades "
+                f"de las disponibles en esa fecha. "
+                f"Ajusta o elimina primero las transacciones posteriores."
+            )
+        return True, None
+
+    @staticmethod
+    def validate_change(instrument: Instrument, new_tx_data: Dict,
+                        replace: Optional[Transaction] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Check a new (or edited) transaction against the running quantity
+        without saving it.
+
+        Args:
+            instrument: Instrument of the transaction
+            new_tx_data: dict with keys transaction_type, quantity, transaction_date
+            replace: Transaction being edited, if any
+
+        Returns:
+            (True, None) or (False, "mensaje")
+        """
+        tx_type = new_tx_data['transaction_type']
+        quantity = Decimal(str(new_tx_data['quantity']))
+        new_key = (_to_date(new_tx_data['transaction_date']), tx_type, None)
+        new_signed = quantity if tx_type == 'buy' else -quantity
+
+        changes = []
+        exclude_id = None
+        if replace is not None:
+            exclude_id = replace.id
+            changes.append((LedgerService._key(replace), -LedgerService._signed(replace)))
+        changes.append((new_key, new_signed))
+
+        first_broken = LedgerService._first_broken_sell(instrument.id, changes, exclude_id)
+        broken_dates = [first_broken] if first_broken is not None else []
+
+        # La venta nueva va al final de su fecha: sus unidades son las
+        # acumuladas hasta ese punto menos las que vende
+        if tx_type == 'sell' and first_broken is not LedgerService._UNKNOWN:
+            before = LedgerService._running_before(
+                instrument.id, new_key, exclude_id, removed=changes[0] if replace is not None else None
+            )
+            if before is None:
+                first_broken = LedgerService._UNKNOWN
+            elif before + new_signed < -LedgerService._QTY_EPSILON:
+                broken_dates.append(new_key[0])
+
+        if first_broken is LedgerService._UNKNOWN:
+            return FIFOService._simulate_fifo_with_new(
+                LedgerService._ordered_records(instrument.id),
+                dict(new_tx_data, id=None),
+                replace_id=exclude_id
+            )
+        if broken_dates:
+            date_str = min(broken_dates).strftime('%d/%m/%Y')
+            return False, (
+                f"La venta del {date_str} requiere más unidades "
+                f"de las disponibles en esa fecha."
+            )
+        return True, None
+
+    @staticmethod
+    def _first_broken_sell(instrument_id: int, changes, exclude_id: Optional[int] = None):
+        """
+        Date of the first sell whose running quantity goes negative after
+        applying the changes, None if none does, or _UNKNOWN if a row in
+        the range has no running_quantity yet.
+
+        Costo: una consulta que recorre el rango (instrument_id,
+        transaction_date) de idx_transactions_running, que cubre todas las
+        columnas del filtro; el predicado sobre running_quantity + delta se
+        evalúa en cada venta del rango, así que es lineal en las ventas
+        posteriores al cambio (ninguna al registrar en la última fecha, el
+        caso común), sin leer la tabla ni reproducir el FIFO. No es
+        O(log n) a propósito: un mínimo de sufijo persistido tendría que
+        reescribirse en cada escritura con fecha anterior (como el
+        desplazamiento de _insert_running, ya lineal) y no da el mínimo del
+        tramo entre las dos posiciones de una edición.
+
+        Args:
+            instrument_id: Instrument id
+            changes: List of (key, delta); every row after key moves by delta
+            exclude_id: Transaction left out (deleted or edited)
+        """
+        running = Transaction.running_quantity
+        for key, delta in changes:
+            running = running + case((LedgerService._after(key), delta), else_=0)
+
+        first_key = min((key for key, _ in changes), key=LedgerService._sort_key)
+        query = db.session.query(
+            Transaction.transaction_date, Transaction.running_quantity
+        ).filter(
+            Transaction.instrument_id == instrument_id,
+            Transaction.transaction_type == 'sell',
+            LedgerService._after(first_key),
+            or_(Transaction.running_quantity.is_(None), running < -LedgerService._QTY_EPSILON)
+        )
+        if exclude_id is not None:
+            query = query.filter(Transaction.id != exclude_id)
+
+        row = query.order_by(Transaction.transaction_date, Transaction.id).first()
+        if row is None:
+            return None
+        if row.running_quantity is None:
+            return LedgerService._UNKNOWN
+        return row.transaction_date
+
+    @staticmethod
+    def _running_before(instrument_id: int, key, exclude_id: Optional[int] = None,
+                        removed=None) -> Optional[Decimal]:
+        """
+        Running quantity just before key: 0 if nothing precedes it, None if
+        unknown. removed=(key, delta) discounts a row left out of the query
+        whose change is still included in the stored running quantities.
+        """
+        query = db.session.query(
+            Transaction.transaction_date, Transaction.transaction_type,
+            Transaction.id, Transaction.running_quantity
+        ).filter(
+            Transaction.instrument_id == instrument_id,
+            not_(LedgerService._after(key))
+        )
+        if key[2] is not None:
+            query = query.filter(Transaction.id != key[2])
+        if exclude_id is not None:
+            query = query.filter(Transaction.id != exclude_id)
+
+        row = query.order_by(
+            Transaction.transaction_date.desc(), Transaction.transaction_type.desc(), Transaction.id.desc()
+        ).first()
+        if row is None:
+            return Decimal('0')
+        if row.running_quantity is None:
+            return None
+
+        running = row.running_quantity
+        if removed is not None and LedgerService._precedes(removed[0], tuple(row[:3])):
+            running += removed[1]
+        return running
+
+    @staticmethod
+    def _insert_running(transaction: Transaction) -> bool:
+        """
+        Set the running quantity of a new (flushed) transaction and shift
+        the rows after it. Returns False if the instrument has rows without
+        running_quantity (the caller rebuilds).
+
+        El UPDATE es lineal en las filas posteriores: ninguna al registrar
+        en la última fecha, todas las siguientes en una fecha anterior.
+        """
+        key = LedgerService._key(transaction)
+        before = LedgerService._running_before(transaction.instrument_id, key)
+        if before is None:
+            return False
+
+        delta = LedgerService._signed(transaction)
+        transaction.running_quantity = before + delta
+        Transaction.query.filter(
+            Transaction.instrument_id == transaction.instrument_id,
+            LedgerService._after(key)
+        ).update(
+            {'running_quantity': Transaction.running_quantity + delta},
+            synchronize_session=False
+        )
+        return True
+
+    @staticmethod
+    def _refresh_running(instrument_id: int, records):
+        """Recompute running_quantity over an instrument's full history (only changed rows are written)."""
+        stored = dict(db.session.execute(
+            select(Transaction.id, Transaction.running_quantity).where(
+                Transaction.instrument_id == instrument_id
+            )
+        ).all())
+
+        changed = []
+        running = 0
+        for record in sorted(records, key=lambda r: (r.transaction_date, r.transaction_type, r.id)):
+            running += record.quantity if record.transaction_type == 'buy' else -record.quantity
+            value = to_decimal(running, QTY_PLACES)
+            current = stored.get(record.id)
+            if current is None or Decimal(str(current)) != value:
+                changed.append({'id': record.id, 'running_quantity': value})
+
+        if changed:
+            db.session.execute(update(Transaction), changed)
+
+    @staticmethod
+    def _key(transaction: Transaction) -> tuple:
+        """Validation order key: (date, type, id); 'buy' sorts before 'sell'."""
+        return (_to_date(transaction.transaction_date), transaction.transaction_type, transaction.id)
+
+    @staticmethod
+    def _sort_key(key) -> tuple:
+        """Python sort key for _key tuples; id None means the end of its date and type."""
+        tx_date, tx_type, tx_id = key
+        return (tx_date, tx_type, float('inf') if tx_id is None else tx_id)
+
+    @staticmethod
+    def _precedes(key, other) -> bool:
+        return LedgerService._sort_key(key) < LedgerService._sort_key(other)
+
+    @staticmethod
+    def _after(key):
+        """SQL condition: the row sorts after key in validation order."""
+        tx_date, tx_type, tx_id = key
+        # 'buy' < 'sell' tanto en el ENUM de MySQL como en texto (SQLite)
+        clauses = [
+            Transaction.transaction_date > tx_date,
+            and_(Transaction.transaction_date == tx_date, Transaction.transaction_type > tx_type)
+        ]
+        if tx_id is not None:
+            clauses.append(and_(
+                Transaction.transaction_date == tx_date,
+                Transaction.transaction_type == tx_type,
+                Transaction.id > tx_id
+            ))
+        return or_(*clauses)
+
+    @staticmethod
+    def _signed(transaction: Transaction) -> Decimal:
+        quantity = Decimal(str(transaction.quantity))
+        return quantity if transaction.transaction_type == 'buy' else -quantity
+
+    @staticmethod
+    def _save_consumed_lots(queued_ids, state: Dict):
+        """Persist the lots consumed by a sell: drop the emptied ones, update the head."""
+        remaining = state['open_lots']
+        consumed_ids = queued_ids[:len(queued_ids) - len(remaining)]
+
+        if consumed_ids:
+            OpenLot.query.filter(OpenLot.transaction_id.in_(consumed_ids)).delete(
+                synchronize_session=False
+            )
+
+        # El lote en la cabeza pudo quedar parcialmente vendido
+        if remaining:
+            head = remaining[0]
+            OpenLot.query.filter_by(transaction_id=head.transaction_id).update(
+                {'quantity': to_decimal(head.quantity, QTY_PLACES),
+                 'commission': to_decimal(head.commission, ACCUM_PLACES)},
+                synchronize_session=False
+            )
+
+    @staticmethod
+    def _save_totals(instrument: Instrument, state: Dict):
+        """Upsert the instrument_ledgers and position_snapshots rows from a FIFO state."""
+        ledger = db.session.get(InstrumentLedger, instrument.id)
+        if ledger is None:
+            ledger = InstrumentLedger(instrument_id=instrument.id)
+            db.session.add(ledger)
+
+        for field in LedgerService._LEDGER_FIELDS:
+            setattr(ledger, field, state[field])
+        for field, places in LedgerService._SCALED_FIELDS:
+            setattr(ledger, field, to_decimal(state[field], places))
+
+        snapshot = db.session.get(PositionSnapshot, instrument.id)
+        if snapshot is None:
+            snapshot = PositionSnapshot(instrument_id=instrument.id, user_id=instrument.user_id)
+            db.session.add(snapshot)
+
+        snapshot.update_from(FIFOService.position_from_state(state))
+
+    @staticmethod
+    def _lot_row(instrument_id: int, lot: _Lot) -> OpenLot:
+        return OpenLot(
+            instrument_id=instrument_id,
+            transaction_id=lot.transaction_id,
+            transaction_date=lot.transaction_date,
+            quantity=to_decimal(lot.quantity, QTY_PLACES),
+            price=to_decimal(lot.price, PRICE_PLACES),
+            commission=to_decimal(lot.commission, ACCUM_PLACES),
+            original_commission=to_decimal(lot.original_commission, MONEY_PLACES)
+        )
+
+    # Columnas de TxRecord, en su orden
+    _RECORD_COLUMNS = (
+        Transaction.id, Transaction.transaction_type, Transaction.transaction_date,
+        Transaction.quantity, Transaction.price, Transaction.commission
+    )
+
+    @staticmethod
+    def _ordered_records(instrument_id: int):
+        """TxRecords in queue order (date, then id), from a Core select without ORM entities."""
+        return LedgerService.load_histories([instrument_id])[instrument_id]
@@ -0,0 +1,187 @@
+"""
+Lot Matching Service - Asignación de lotes por método
+Realized gains with FIFO, LIFO, HIFO or average cost over one shared lot
+store, for tax planning comparisons
+"""
+
+from typing import Dict, List, Optional
+from operator import attrgetter
+import heapq
+import logging
+
+from app.services.fifo import (
+    FIFOService, TxRecord, _Lot, _LotStore, _OrderedLotStore, _FIFOStore,
+    _COST_TO_ACCUM, _MONEY_TO_ACCUM
+)
+from app.utils.fixed_point import div_round
+
+logger = logging.getLogger(__name__)
+
+
+class _LIFOStore(_OrderedLotStore):
+    """Pila: el lote más reciente primero."""
+
+    def __init__(self):
+        self._lots = []
+
+    def push(self, lot):
+        self._lots.append(lot)
+
+    def peek(self):
+        return self._lots[-1]
+
+    def pop(self):
+        self._lots.pop()
+
+    def replace_top(self, lot):
+        self._lots[-1] = lot
+
+    def __len__(self):
+        return len(self._lots)
+
+
+class _HIFOStore(_OrderedLotStore):
+    """Heap por precio: el lote más caro primero (el más antiguo si empatan)."""
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = 0
+
+    def push(self, lot):
+        heapq.heappush(self._heap, (-lot.price, self._sequence, lot))
+        self._sequence += 1
+
+    def peek(self):
+        return self._heap[0][2]
+
+    def pop(self):
+        heapq.heappop(self._heap)
+
+    def replace_top(self, lot):
+        # Mismo precio y secuencia: el heap sigue ordenado
+        price, sequence, _ = self._heap[0]
+        self._heap[0] = (price, sequence, lot)
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class _AverageCostStore(_LotStore):
+    """Costo promedio: acumulados del conjunto, sin lotes individuales."""
+
+    def __init__(self):
+        self._quantity = 0
+        self._value = 0          # cantidad × precio, a ACCUM_PLACES
+        self._commission = 0     # ACCUM_PLACES
+
+    def push(self, lot):
+        self._quantity += lot.quantity
+        self._value += lot.quantity * lot.price * _COST_TO_ACCUM
+        self._commission += lot.commission
+
+    def __len__(self):
+        return 1 if self._quantity > 0 else 0
+
+    def consume(self, quantity):
+        if self._quantity <= 0:
+            return 0, 0
+
+        if quantity >= self._quantity:
+            value, commission = self._value, self._commission
+            self._quantity = self._value = self._commission = 0
+        else:
+            value = div_round(quantity * self._value, self._quantity)
+            commission = div_round(quantity * self._commission, self._quantity)
+            self._quantity -= quantity
+            self._value -= value
+            self._commission -= commission
+
+        return value + commission, commission
+
+
+class LotMatchingService:
+    """Service for realized gains with a selectable lot matching method."""
+
+    STORES = {
+        'fifo': _FIFOStore,
+        'lifo': _LIFOStore,
+        'hifo': _HIFOStore,
+        'average': _AverageCostStore,
+    }
+    METHODS = tuple(STORES)
+
+    @staticmethod
+    def calculate_realized_gain(transactions: List, method: str = 'fifo') -> Dict:
+        """
+        Realized gain with the chosen lot matching method.
+
+        Con 'fifo' el resultado es idéntico al de
+        FIFOService.calculate_realized_gain. LIFO, HIFO y costo promedio
+        procesan el historial en orden cronológico (compras antes que
+        ventas en la misma fecha), así que cada venta solo usa lotes
+        comprados hasta su fecha.
+
+        Args:
+            transactions: Transactions of one instrument (TxRecord or similar)
+            method: 'fifo', 'lifo', 'hifo' or 'average'
+
+        Returns:
+            dict: Same keys as FIFOService.calculate_realized_gain
+        """
+        store_class = LotMatchingService.STORES.get(method)
+        if store_class is None:
+            raise ValueError(f"Método de asignación no soportado: {method}")
+
+        state = FIFOService._new_state()
+        store = store_class()
+
+        for tx in LotMatchingService._events(FIFOService.to_records(transactions), method):
+            if tx.transaction_type == 'buy':
+                state['buy_count'] += 1
+                state['buy_commissions'] += tx.commission
+                store.push(_Lot(
+                    tx.quantity, tx.price, tx.commission * _MONEY_TO_ACCUM, tx.commission,
+                    tx.id, tx.transaction_date
+                ))
+            else:
+                sell_commission = tx.commission * _MONEY_TO_ACCUM
+                cost_basis, commissions = store.consume(tx.quantity)
+
+                state['sell_count'] += 1
+                state['total_sold'] += tx.quantity * tx.price * _COST_TO_ACCUM - sell_commission
+                state['cost_basis_sold'] += cost_basis
+                state['commissions_paid'] += sell_commission + commissions
+
+        return FIFOService._realized_from(state)
+
+    @staticmethod
+    def compare_methods(transactions: List, methods: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Realized gain of one history under several methods.
+
+        Args:
+            transactions: Transactions of one instrument
+            methods: Methods to compare (default: all)
+
+        Returns:
+            dict: method -> realized metrics
+        """
+        records = FIFOService.to_records(transactions)
+        return {
+            method: LotMatchingService.calculate_realized_gain(records, method)
+            for method in (methods or LotMatchingService.METHODS)
+        }
+
+    @staticmethod
+    def _events(records: List[TxRecord], method: str) -> List[TxRecord]:
+        """Buys and sells in the order the method applies them."""
+        by_date = attrgetter('transaction_date')
+        buys = sorted((t for t in records if t.transaction_type == 'buy'), key=by_date)
+        sells = sorted((t for t in records if t.transaction_type == 'sell'), key=by_date)
+
+        if method == 'fifo':
+            # Igual que FIFOService._replay: todas las compras, luego las ventas
+            return buys + sells
+
+        # sorted es estable: en la misma fecha las compras quedan antes
+        return sorted(buys + sells, key=by_date)
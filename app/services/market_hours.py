@@ -0,0 +1,146 @@
+"""
+Market Hours - Políticas de caché según sesión de mercado
+Decides how long a quote stays cached based on instrument type and exchange hours
+"""
+
+from datetime import datetime, time, timedelta
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+
+# Sesiones regulares por código de bolsa de Yahoo Finance:
+# (zona horaria, apertura, cierre). No contempla feriados.
+_US_SESSION = ('America/New_York', time(9, 30), time(16, 0))
+
+EXCHANGE_SESSIONS = {
+    # Estados Unidos
+    'NMS': _US_SESSION, 'NGM': _US_SESSION, 'NCM': _US_SESSION,
+    'NAS': _US_SESSION, 'NYQ': _US_SESSION, 'NYS': _US_SESSION,
+    'ASE': _US_SESSION, 'PCX': _US_SESSION, 'BTS': _US_SESSION,
+    'PNK': _US_SESSION, 'OQB': _US_SESSION, 'OQX': _US_SESSION,
+    # Canadá
+    'TOR': ('America/Toronto', time(9, 30), time(16, 0)),
+    'VAN': ('America/Toronto', time(9, 30), time(16, 0)),
+    # Europa
+    'LSE': ('Europe/London', time(8, 0), time(16, 30)),
+    'GER': ('Europe/Berlin', time(9, 0), time(17, 30)),
+    'PAR': ('Europe/Paris', time(9, 0), time(17, 30)),
+    'AMS': ('Europe/Amsterdam', time(9, 0), time(17, 30)),
+    'MCE': ('Europe/Madrid', time(9, 0), time(17, 30)),
+    'MIL': ('Europe/Rome', time(9, 0), time(17, 30)),
+    # Asia
+    'JPX': ('Asia/Tokyo', time(9, 0), time(15, 0)),
+    'HKG': ('Asia/Hong_Kong', time(9, 30), time(16, 0)),
+}
+
+# Forex (ej. DOP=X) opera de domingo 17:00 a viernes 17:00 hora de Nueva York
+_FX_TZ = 'America/New_York'
+_FX_WEEK_CLOSE = (4, time(17, 0))   # viernes
+_FX_WEEK_OPEN = (6, time(17, 0))    # domingo
+
+
+class MarketHoursPolicy:
+    """TTL policy for quotes keyed on instrument type and exchange session."""
+
+    def __init__(self,
+                 open_ttl: timedelta = timedelta(minutes=5),
+                 crypto_ttl: timedelta = timedelta(minutes=2),
+                 settle_time: timedelta = timedelta(minutes=20)):
+        """
+        Args:
+            open_ttl: Rolling TTL while a stock/ETF/FX market is open
+            crypto_ttl: Rolling TTL for crypto (trades 24/7)
+            settle_time: Time after the close during which quotes keep the
+                         rolling TTL (late prints, closing auction)
+        """
+        self.open_ttl = open_ttl
+        self.crypto_ttl = crypto_ttl
+        self.settle_time = settle_time
+
+    def expires_at(self, instrument_type: str, exchange: Optional[str] = None,
+                   now: Optional[datetime] = None) -> datetime:
+        """
+        When a quote fetched at ``now`` should expire.
+
+        Args:
+            instrument_type: 'stock', 'etf', 'crypto' or 'fx'
+            exchange: Yahoo exchange code (defaults to US hours)
+            now: Fetch time (naive local time, like the cache timestamps)
+
+        Returns:
+            datetime: Naive local expiry time
+        """
+        now = now or datetime.now()
+
+        if instrument_type == 'crypto':
+            return now + self.crypto_ttl
+
+        if instrument_type == 'fx':
+            next_open = self._fx_next_open(now)
+        else:
+            next_open = self._session_next_open(exchange, now)
+
+        # Mercado abierto (o recién cerrado): TTL corto
+        if next_open is None:
+            return now + self.open_ttl
+
+        # Mercado cerrado: el precio no cambia hasta la próxima apertura
+        return max(next_open, now + self.open_ttl)
+
+    def _session_next_open(self, exchange: Optional[str], now: datetime) -> Optional[datetime]:
+        """Next session open for a stock exchange, or None if it is open now."""
+        tz_name, open_time, close_time = EXCHANGE_SESSIONS.get(exchange or '', _US_SESSION)
+        tz = ZoneInfo(tz_name)
+        local_now = now.astimezone().astimezone(tz)
+
+        opened, closed = self._session_bounds(local_now, open_time, close_time, tz)
+        if local_now.weekday() < 5 and opened <= local_now < closed + self.settle_time:
+            return None
+
+        # Buscar el siguiente día hábil con apertura posterior a ahora
+        day = local_now
+        for _ in range(8):
+            opened, _closed = self._session_bounds(day, open_time, close_time, tz)
+            if day.weekday() < 5 and opened > local_now:
+                return self._to_local_naive(opened)
+            day = day + timedelta(days=1)
+
+        return None
+
+    def _fx_next_open(self, now: datetime) -> Optional[datetime]:
+        """Next forex week open, or None if forex is trading now."""
+        tz = ZoneInfo(_FX_TZ)
+        local_now = now.astimezone().astimezone(tz)
+        weekday = local_now.weekday()
+        current = local_now.time()
+
+        close_day, close_time = _FX_WEEK_CLOSE
+        open_day, open_time = _FX_WEEK_OPEN
+
+        closed = (
+            (weekday == close_day and current >= close_time) or
+            weekday == 5 or
+            (weekday == open_day and current < open_time)
+        )
+        if not closed:
+            return None
+
+        days_ahead = (open_day - weekday) % 7
+        opening = datetime.combine(
+            (local_now + timedelta(days=days_ahead)).date(), open_time, tzinfo=tz
+        )
+        return self._to_local_naive(opening)
+
+    @staticmethod
+    def _session_bounds(day: datetime, open_time: time, close_time: time,
+                        tz: ZoneInfo) -> Tuple[datetime, datetime]:
+        """Open and close datetimes of the session on ``day``'s date."""
+        return (
+            datetime.combine(day.date(), open_time, tzinfo=tz),
+            datetime.combine(day.date(), close_time, tzinfo=tz),
+        )
+
+    @staticmethod
+    def _to_local_naive(moment: datetime) -> datetime:
+        """Convert an aware datetime to naive local time."""
+        return moment.astimezone().replace(tzinfo=None)
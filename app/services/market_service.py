@@ -1,19 +1,142 @@
-import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Callable, Tuple
 from decimal import Decimal
 import logging
+import os
+import threading
+from app.services.cache_backends import CacheBackend, MemoryCacheBackend, create_cache_backend
+from app.services.quote_snapshot import QuoteSnapshot
+from app.services.market_hours import MarketHoursPolicy
+from app.services.providers import MarketDataProvider, create_provider
+from app import db
+from app.models.symbol_metadata import SymbolMetadata
 
 logger = logging.getLogger(__name__)
 
 
+class _Flight:
+    """Petición en curso hacia Yahoo Finance compartida por varios llamadores."""
+    
+    __slots__ = ('event', 'result')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
 class MarketService:
-    """Service for fetching market data from Yahoo Finance."""
+    """Service for fetching market data (Yahoo Finance by default)."""
+    
+    # Fuente de datos (MARKET_DATA_PROVIDER); yfinance si no se configura
+    _provider: Optional[MarketDataProvider] = None
     
-    # Cache for market data (symbol: {data, timestamp})
-    _cache = {}
+    # Cache for market data (symbol: {data, timestamp}); data es un
+    # QuoteSnapshot para los símbolos y {'rate': Decimal} para la tasa.
+    # Backend configurable con MARKET_CACHE_BACKEND (ver init_app).
+    _cache: CacheBackend = MemoryCacheBackend(stale_grace=timedelta(minutes=30))
     _cache_duration = timedelta(minutes=5)
     
+    # TTL según tipo de instrumento y horario de la bolsa: con el mercado
+    # cerrado, stocks/ETFs quedan en caché hasta la próxima apertura
+    _ttl_policy = MarketHoursPolicy()
+    
+    # Máximo de hilos para consultas individuales en paralelo
+    _max_fetch_workers = 8
+    
+    # Single-flight: peticiones en curso por clave (ej. 'quote:AAPL')
+    _inflight: Dict[str, _Flight] = {}
+    _inflight_lock = threading.Lock()
+    _flight_timeout = 30  # segundos que un seguidor espera al líder
+    _flight_stats = {'fetches': 0, 'coalesced': 0}
+    
+    # Aciertos/fallos de caché (hits = frescos, stale_hits = vencidos servidos)
+    _lookup_stats = {'hits': 0, 'stale_hits': 0, 'misses': 0}
+    _lookup_lock = threading.Lock()
+    
+    # Stale-while-revalidate: al expirar el TTL se sirve el último valor
+    # conocido y se refresca en segundo plano, hasta un máximo de tiempo
+    # después del vencimiento
+    _stale_while_revalidate = True
+    _max_staleness = timedelta(minutes=30)
+    _revalidate_executor: Optional[ThreadPoolExecutor] = None
+    _revalidate_lock = threading.Lock()
+    
+    # Metadatos de símbolos persistidos en DB (symbol_metadata): la
+    # verificación y la info se sirven desde ahí mientras no venzan
+    _metadata_ttl = timedelta(days=30)
+    # Bolsa conocida por símbolo formateado, para la política de TTL de
+    # snapshots que no traen metadatos (descarga masiva)
+    _known_exchanges: Dict[str, str] = {}
+    
+    # Cambio intradía sin datos (símbolo no disponible o sin cierre anterior)
+    UNAVAILABLE_CHANGE = {
+        'current_price': None,
+        'previous_close': None,
+        'change': None,
+        'change_percent': None,
+        'available': False
+    }
+    
+    @classmethod
+    def init_app(cls, app):
+        """
+        Configure the data provider and quote cache from the Flask app config.
+        
+        Config keys:
+            MARKET_CACHE_BACKEND: 'memory' (default) or 'sqlite'
+            MARKET_CACHE_PATH: SQLite file shared by the node's workers
+            MARKET_CACHE_MAX_ENTRIES: Entry limit of the memory cache (LRU)
+            MARKET_CACHE_MAX_BYTES: Approximate byte budget of the memory cache
+            MARKET_CACHE_MINUTES: Quote TTL while the market is open
+            MARKET_CRYPTO_CACHE_MINUTES: Rolling quote TTL for crypto
+            MARKET_STALE_WHILE_REVALIDATE: Serve expired quotes while refreshing
+            MARKET_MAX_STALENESS_MINUTES: Hard limit past expiry for serving
+                                          an expired quote
+            SYMBOL_METADATA_TTL_DAYS: How long a verified symbol stays valid
+            MARKET_DATA_PROVIDER: 'yfinance' (default) or 'synthetic'
+            MARKET_DATA_SEED: Seed for the synthetic provider
+            MARKET_DATA_LATENCY_MS: Simulated latency for the synthetic provider
+        """
+        cls._provider = create_provider(
+            app.config.get('MARKET_DATA_PROVIDER', 'yfinance'),
+            seed=app.config.get('MARKET_DATA_SEED', 0),
+            latency=app.config.get('MARKET_DATA_LATENCY_MS', 0) / 1000
+        )
+        
+        backend = app.config.get('MARKET_CACHE_BACKEND', 'memory')
+        path = app.config.get('MARKET_CACHE_PATH') or \
+            os.path.join(app.instance_path, 'market_cache.sqlite3')
+        
+        cls._cache_duration = timedelta(
+            minutes=app.config.get('MARKET_CACHE_MINUTES', 5)
+        )
+        cls._ttl_policy = MarketHoursPolicy(
+            open_ttl=cls._cache_duration,
+            crypto_ttl=timedelta(minutes=app.config.get('MARKET_CRYPTO_CACHE_MINUTES', 2))
+        )
+        cls._metadata_ttl = timedelta(days=app.config.get('SYMBOL_METADATA_TTL_DAYS', 30))
+        cls._stale_while_revalidate = app.config.get('MARKET_STALE_WHILE_REVALIDATE', True)
+        cls._max_staleness = timedelta(
+            minutes=app.config.get('MARKET_MAX_STALENESS_MINUTES', 30)
+        )
+        
+        # Las entradas vencidas solo sirven mientras se puedan servir como stale
+        cls._cache = create_cache_backend(
+            backend,
+            path,
+            max_entries=app.config.get('MARKET_CACHE_MAX_ENTRIES') or None,
+            max_bytes=app.config.get('MARKET_CACHE_MAX_BYTES') or None,
+            stale_grace=cls._max_staleness if cls._stale_while_revalidate else timedelta(0)
+        )
+    
+    @classmethod
+    def get_provider(cls) -> MarketDataProvider:
+        """Configured market data provider (yfinance unless init_app said otherwise)."""
+        if cls._provider is None:
+            cls._provider = create_provider('yfinance')
+        return cls._provider
+    
     @classmethod
     def verify_symbol(cls, symbol: str, instrument_type: str) -> bool:
         """
@@ -26,24 +149,22 @@ class MarketService:
         Returns:
             bool: True if symbol exists, False otherwise
         """
-        try:
-            # Format symbol for crypto
-            formatted_symbol = cls._format_symbol(symbol, instrument_type)
-            
-            # Try to fetch data
-            ticker = yf.Ticker(formatted_symbol)
-            info = ticker.info
-            
-            # Verify the ticker has valid data
-            if not info or 'symbol' not in info:
-                logger.warning(f"Symbol {formatted_symbol} not found or invalid")
-                return False
-            
+        # Format symbol for crypto
+        formatted_symbol = cls._format_symbol(symbol, instrument_type)
+        
+        # Símbolo ya verificado: no hace falta consultar Yahoo
+        if cls._get_symbol_metadata(formatted_symbol) is not None:
             return True
-            
-        except Exception as e:
-            logger.error(f"Error verifying symbol {symbol}: {str(e)}")
+        
+        # Sin metadatos el proveedor no reconoció el símbolo (ej. info sin
+        # 'symbol'), aunque haya encontrado un precio en el histórico
+        snapshot = cls.get_quote(formatted_symbol, instrument_type, require_metadata=True)
+        if snapshot is None or not snapshot.has_metadata:
+            logger.warning(f"Symbol {formatted_symbol} not found or invalid")
             return False
+        
+        cls._save_symbol_metadata(snapshot, instrument_type)
+        return True
     
     @classmethod
     def get_current_price(cls, symbol: str, instrument_type: str) -> Optional[float]:
@@ -57,46 +178,13 @@ class MarketService:
         Returns:
             float: Current price or None if not available
         """
-        try:
-            formatted_symbol = cls._format_symbol(symbol, instrument_type)
-            
-            # Check cache
-            if cls._is_cached(formatted_symbol):
-                return cls._cache[formatted_symbol]['data']['current_price']
-            
-            # Fetch new data
-            ticker = yf.Ticker(formatted_symbol)
-            
-            # Try different price sources
-            current_price = None
-            
-            # Try current price
-            if hasattr(ticker, 'info') and ticker.info:
-                current_price = ticker.info.get('currentPrice') or \
-                               ticker.info.get('regularMarketPrice') or \
-                               ticker.info.get('previousClose')
-            
-            # If info doesn't work, try history
-            if current_price is None:
-                hist = ticker.history(period='1d')
-                if not hist.empty:
-                    current_price = hist['Close'].iloc[-1]
-            
-            if current_price is None:
-                logger.warning(f"Could not fetch price for {formatted_symbol}")
-                return None
-            
-            # Cache the result
-            cls._cache_data(formatted_symbol, {
-                'current_price': float(current_price),
-                'symbol': formatted_symbol
-            })
-            
-            return float(current_price)
-            
-        except Exception as e:
-            logger.error(f"Error fetching price for {symbol}: {str(e)}")
+        formatted_symbol = cls._format_symbol(symbol, instrument_type)
+        snapshot = cls.get_quote(formatted_symbol, instrument_type)
+        
+        if snapshot is None or snapshot.price is None:
             return None
+        
+        return snapshot.price
     
     @classmethod
     def get_instrument_info(cls, symbol: str, instrument_type: str) -> Optional[Dict]:
@@ -110,25 +198,170 @@ class MarketService:
         Returns:
             dict: Instrument information or None
         """
-        try:
-            formatted_symbol = cls._format_symbol(symbol, instrument_type)
-            ticker = yf.Ticker(formatted_symbol)
+        formatted_symbol = cls._format_symbol(symbol, instrument_type)
+        metadata = cls._get_symbol_metadata(formatted_symbol)
+        
+        if metadata is None:
+            snapshot = cls.get_quote(formatted_symbol, instrument_type, require_metadata=True)
             
-            info = ticker.info
-            if not info:
+            if snapshot is None or not snapshot.has_metadata:
                 return None
             
-            return {
-                'symbol': symbol,
-                'name': info.get('longName') or info.get('shortName', symbol),
-                'currency': info.get('currency', 'USD'),
-                'exchange': info.get('exchange', 'N/A'),
-                'type': instrument_type
+            metadata = cls._save_symbol_metadata(snapshot, instrument_type)
+            if metadata is None:
+                return None
+        
+        return {
+            'symbol': symbol,
+            'name': metadata.name or symbol,
+            'currency': metadata.currency or 'USD',
+            'exchange': metadata.exchange or 'N/A',
+            'type': instrument_type
+        }
+    
+    @classmethod
+    def refresh_symbol_metadata(cls, symbols_data: Optional[List[Dict]] = None) -> int:
+        """
+        Re-verify symbols against Yahoo Finance and update symbol_metadata.
+        Does not commit.
+        
+        Args:
+            symbols_data: List of dicts with 'symbol' and 'instrument_type';
+                          defaults to every row already in symbol_metadata
+            
+        Returns:
+            int: Number of symbols refreshed
+        """
+        if symbols_data is None:
+            targets = {
+                row.symbol: row.instrument_type
+                for row in SymbolMetadata.query.all()
             }
+        else:
+            targets = {
+                cls._format_symbol(item['symbol'], item['instrument_type']): item['instrument_type']
+                for item in symbols_data
+            }
+        
+        if not targets:
+            return 0
+        
+        # La descarga masiva no trae nombre/moneda/bolsa: consultar cada
+        # símbolo con el pool de hilos acotado
+        formatted_symbols = list(targets)
+        workers = min(cls._max_fetch_workers, len(formatted_symbols))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            snapshots = list(executor.map(cls._fetch_snapshot, formatted_symbols))
+        
+        refreshed = 0
+        for formatted_symbol, snapshot in zip(formatted_symbols, snapshots):
+            if snapshot is None:
+                logger.warning(f"Symbol {formatted_symbol} could not be re-verified")
+                continue
             
+            cls._cache_data(formatted_symbol, snapshot, targets[formatted_symbol], snapshot.exchange)
+            if cls._save_symbol_metadata(snapshot, targets[formatted_symbol]):
+                refreshed += 1
+        
+        return refreshed
+    
+    @classmethod
+    def _get_symbol_metadata(cls, formatted_symbol: str) -> Optional[SymbolMetadata]:
+        """Verified metadata for a formatted symbol, or None if unknown/expired."""
+        try:
+            metadata = db.session.get(SymbolMetadata, formatted_symbol)
+        except Exception as e:
+            logger.error(f"Error reading symbol metadata for {formatted_symbol}: {str(e)}")
+            return None
+        
+        if metadata is None or not metadata.is_fresh(cls._metadata_ttl):
+            return None
+        
+        if metadata.exchange:
+            cls._known_exchanges[formatted_symbol] = metadata.exchange
+        
+        return metadata
+    
+    @classmethod
+    def _save_symbol_metadata(cls, snapshot: QuoteSnapshot, instrument_type: str) -> Optional[SymbolMetadata]:
+        """
+        Insert or update the symbol_metadata row for a snapshot.
+        
+        Solo hace flush dentro de un savepoint: la ruta o el comando que
+        llama es dueño de la transacción y hace el commit, y un error aquí
+        no deshace lo que ya tenía pendiente en la sesión.
+        """
+        try:
+            with db.session.begin_nested():
+                metadata = db.session.merge(SymbolMetadata(
+                    symbol=snapshot.symbol,
+                    instrument_type=instrument_type,
+                    name=snapshot.name,
+                    currency=snapshot.currency,
+                    exchange=snapshot.exchange,
+                    last_verified_at=datetime.utcnow()
+                ))
         except Exception as e:
-            logger.error(f"Error fetching info for {symbol}: {str(e)}")
+            logger.error(f"Error saving symbol metadata for {snapshot.symbol}: {str(e)}")
             return None
+        
+        if snapshot.exchange:
+            cls._known_exchanges[snapshot.symbol] = snapshot.exchange
+        
+        return metadata
+    
+    @classmethod
+    def get_quote(cls, formatted_symbol: str, instrument_type: str,
+                  require_metadata: bool = False) -> Optional[QuoteSnapshot]:
+        """
+        Get the QuoteSnapshot for a formatted symbol.
+        
+        Todas las consultas (precio, cambio, verificación, info) se sirven
+        desde este snapshot: una sola petición a Yahoo por símbolo y TTL.
+        
+        Args:
+            formatted_symbol: Symbol already formatted for Yahoo Finance
+            instrument_type: Type of instrument (decides the cache TTL)
+            require_metadata: Re-fetch if the cached snapshot lacks name,
+                              currency and exchange (e.g. from a bulk download)
+            
+        Returns:
+            QuoteSnapshot: The snapshot or None if the symbol is unavailable
+        """
+        cached, status = cls._lookup(formatted_symbol)
+        if cached is not None and (cached.has_metadata or not require_metadata):
+            if status == 'stale':
+                cls._revalidate(
+                    f'quote:{formatted_symbol}',
+                    lambda: cls._fetch_and_cache_snapshot(formatted_symbol, instrument_type)
+                )
+            return cached
+        
+        # Una sola petición por símbolo aunque haya varios llamadores
+        # concurrentes
+        return cls._single_flight(
+            f'quote:{formatted_symbol}',
+            lambda: cls._fetch_and_cache_snapshot(formatted_symbol, instrument_type, require_metadata)
+        )
+    
+    @classmethod
+    def _fetch_and_cache_snapshot(cls, formatted_symbol: str, instrument_type: str,
+                                  require_metadata: bool = False) -> Optional[QuoteSnapshot]:
+        """Fetch one snapshot and cache it (re-checking the cache first)."""
+        # Otro líder pudo haberlo guardado mientras esperábamos el turno
+        cached = cls._get_cached(formatted_symbol)
+        if cached is not None and (cached.has_metadata or not require_metadata):
+            return cached
+        
+        snapshot = cls._fetch_snapshot(formatted_symbol)
+        
+        if snapshot is None:
+            return None
+        
+        # Cache the result
+        cls._cache_data(formatted_symbol, snapshot, instrument_type, snapshot.exchange)
+        
+        return snapshot
     
     @classmethod
     def get_batch_prices(cls, symbols_data: List[Dict]) -> Dict[str, float]:
@@ -141,17 +374,199 @@ class MarketService:
         Returns:
             dict: Dictionary mapping symbols to prices
         """
-        prices = {}
+        return {
+            symbol: snapshot.price
+            for symbol, (snapshot, _) in cls.get_batch_quotes(symbols_data).items()
+            if snapshot.price is not None
+        }
+    
+    @classmethod
+    def get_batch_quotes(cls, symbols_data: List[Dict]) -> Dict[str, Tuple[QuoteSnapshot, str]]:
+        """
+        Get the quote snapshots (price and intraday change) of multiple
+        symbols at once.
+        
+        Los símbolos que ya están en caché se sirven directamente; el resto
+        se descarga en una sola petición masiva (yf.download). Los que no
+        vengan en la descarga masiva se consultan en paralelo con un pool
+        de hilos acotado, de modo que la latencia depende del símbolo más
+        lento y no de la suma de todos.
+        
+        Args:
+            symbols_data: List of dicts with 'symbol' and 'instrument_type'
+            
+        Returns:
+            dict: symbol -> (QuoteSnapshot, 'fresh' | 'stale'); symbols
+                  that could not be obtained are left out
+        """
+        quotes = {}
+        missing = {}  # formatted_symbol -> [symbol, ...]
+        stale = []
+        types = {}    # formatted_symbol -> instrument_type
         
         for item in symbols_data:
             symbol = item['symbol']
-            instrument_type = item['instrument_type']
+            formatted_symbol = cls._format_symbol(symbol, item['instrument_type'])
+            types[formatted_symbol] = item['instrument_type']
+            
+            cached, status = cls._lookup(formatted_symbol)
+            if cached is not None:
+                quotes[symbol] = (cached, status)
+                if status == 'stale':
+                    stale.append(formatted_symbol)
+            else:
+                missing.setdefault(formatted_symbol, []).append(symbol)
+        
+        if stale:
+            cls._revalidate_batch({s: types[s] for s in stale})
+        
+        if not missing:
+            return quotes
+        
+        fetched = cls._fetch_and_cache_batch({s: types[s] for s in missing})
+        
+        for formatted_symbol, snapshot in fetched.items():
+            for symbol in missing[formatted_symbol]:
+                quotes[symbol] = (snapshot, 'fresh')
+        
+        return quotes
+    
+    @classmethod
+    def get_batch_changes(cls, symbols_data: List[Dict]) -> Dict[str, Dict]:
+        """
+        Get the intraday change of multiple symbols at once.
+        
+        Args:
+            symbols_data: List of dicts with 'symbol' and 'instrument_type'
+            
+        Returns:
+            dict: symbol -> change dict (see get_intraday_change); every
+                  requested symbol is present, UNAVAILABLE_CHANGE if unknown
+        """
+        quotes = cls.get_batch_quotes(symbols_data)
+        return {
+            item['symbol']: cls._change_of(
+                quotes.get(item['symbol'], (None, None))[0],
+                cls._format_symbol(item['symbol'], item['instrument_type'])
+            )
+            for item in symbols_data
+        }
+    
+    @classmethod
+    def refresh_prices(cls, symbols_data: List[Dict]) -> Dict[str, float]:
+        """
+        Re-fetch prices for the given symbols ignoring the cache.
+        
+        Usado por el pre-calentador de precios para renovar el caché antes
+        de que expire, de modo que las peticiones no esperen a Yahoo.
+        
+        Args:
+            symbols_data: List of dicts with 'symbol' and 'instrument_type'
+            
+        Returns:
+            dict: formatted symbol -> price for the symbols refreshed
+        """
+        types = {
+            cls._format_symbol(item['symbol'], item['instrument_type']): item['instrument_type']
+            for item in symbols_data
+        }
+        
+        if not types:
+            return {}
+        
+        fetched = cls._fetch_and_cache_batch(types)
+        
+        return {
+            formatted_symbol: snapshot.price
+            for formatted_symbol, snapshot in fetched.items()
+            if snapshot.price is not None
+        }
+    
+    @classmethod
+    def _fetch_and_cache_batch(cls, types: Dict[str, str]) -> Dict[str, QuoteSnapshot]:
+        """
+        Fetch several formatted symbols (bulk + thread pool) and cache them.
+        
+        Args:
+            types: Formatted symbol -> instrument_type (decides the cache TTL)
+            
+        Returns:
+            dict: formatted symbol -> QuoteSnapshot (only the symbols obtained)
+        """
+        # Los símbolos que otro hilo ya está descargando se esperan en vez
+        # de pedirlos de nuevo
+        led, joined = cls._claim_flights(
+            {f'quote:{s}': s for s in types}
+        )
+        
+        fetched = {}
+        try:
+            to_fetch = list(led.values())
+            if to_fetch:
+                fetched = cls._fetch_bulk_snapshots(to_fetch)
             
-            price = cls.get_current_price(symbol, instrument_type)
-            if price is not None:
-                prices[symbol] = price
+            # Fallback: consultar en paralelo los que la descarga masiva no trajo
+            pending = [s for s in to_fetch if s not in fetched]
+            if pending:
+                workers = min(cls._max_fetch_workers, len(pending))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = executor.map(cls._fetch_snapshot, pending)
+                    for formatted_symbol, snapshot in zip(pending, results):
+                        if snapshot is not None:
+                            fetched[formatted_symbol] = snapshot
+            
+            for formatted_symbol, snapshot in fetched.items():
+                cls._cache_data(formatted_symbol, snapshot, types[formatted_symbol], snapshot.exchange)
+        finally:
+            for key, formatted_symbol in led.items():
+                cls._complete_flight(key, fetched.get(formatted_symbol))
+        
+        for key, flight in joined.items():
+            flight.event.wait(cls._flight_timeout)
+            if flight.result is not None:
+                fetched[key.split(':', 1)[1]] = flight.result
         
-        return prices
+        return fetched
+    
+    @classmethod
+    def _fetch_bulk_snapshots(cls, formatted_symbols: List[str]) -> Dict[str, QuoteSnapshot]:
+        """
+        Fetch several symbols from the provider in one batch call.
+        
+        Args:
+            formatted_symbols: Symbols already formatted for Yahoo Finance
+            
+        Returns:
+            dict: formatted symbol -> QuoteSnapshot (only the symbols that came back)
+        """
+        try:
+            return cls.get_provider().get_quotes(formatted_symbols)
+        except Exception as e:
+            logger.error(f"Error in bulk quote fetch: {str(e)}")
+            return {}
+    
+    @classmethod
+    def _fetch_snapshot(cls, formatted_symbol: str) -> Optional[QuoteSnapshot]:
+        """
+        Fetch the full quote of one formatted symbol, bypassing the cache.
+        
+        Args:
+            formatted_symbol: Symbol already formatted for Yahoo Finance
+            
+        Returns:
+            QuoteSnapshot: The snapshot or None if the symbol is unavailable
+        """
+        try:
+            snapshot = cls.get_provider().get_quote(formatted_symbol)
+            
+            if snapshot is not None and snapshot.price is None:
+                logger.warning(f"Could not fetch price for {formatted_symbol}")
+            
+            return snapshot
+            
+        except Exception as e:
+            logger.error(f"Error fetching quote for {formatted_symbol}: {str(e)}")
+            return None
     
     @classmethod
     def _format_symbol(cls, symbol: str, instrument_type: str) -> str:
@@ -176,102 +591,71 @@ class MarketService:
         return symbol
 
     @classmethod
-    def get_intraday_change(cls, symbol: str, instrument_type: str) -> Optional[Dict]:
+    def get_intraday_change(cls, symbol: str, instrument_type: str) -> Dict:
         """
         Get change since previous close (intraday change).
-        ✅ CORREGIDO - Ahora calcula correctamente vs cierre anterior
         
         Para stocks/ETFs: Cambio desde cierre de ayer
         Para crypto: Cambio desde cierre del período anterior (crypto opera 24/7)
         
+        Se sirve del mismo QuoteSnapshot en caché que el precio (mismo TTL
+        y revalidación).
+        
         Returns:
             dict: {
                 'current_price': float,
                 'previous_close': float,
                 'change': float,
-                'change_percent': float
+                'change_percent': float,
+                'available': bool
             }
+            Sin datos suficientes devuelve UNAVAILABLE_CHANGE ('available'
+            False y el resto en None), nunca None.
         """
-        try:
-            formatted_symbol = cls._format_symbol(symbol, instrument_type)
-            ticker = yf.Ticker(formatted_symbol)
-
-            # Estrategia 1: Intentar obtener de ticker.info (más confiable)
-            if hasattr(ticker, 'info') and ticker.info:
-                info = ticker.info
-                
-                # Obtener precio actual
-                current_price = (
-                    info.get('currentPrice') or 
-                    info.get('regularMarketPrice') or
-                    info.get('price')
-                )
-                
-                # Obtener cierre anterior
-                previous_close = (
-                    info.get('previousClose') or
-                    info.get('regularMarketPreviousClose')
-                )
-                
-                if current_price and previous_close:
-                    change = current_price - previous_close
-                    change_percent = (change / previous_close) * 100
-                    
-                    return {
-                        'current_price': float(current_price),
-                        'previous_close': float(previous_close),
-                        'change': round(float(change), 4),
-                        'change_percent': round(float(change_percent), 4)
-                    }
-            
-            # Estrategia 2: Usar histórico diario (fallback)
-            hist = ticker.history(period="5d")
-            
-            if len(hist) < 2:
-                logger.warning(f"Not enough historical data for {symbol}")
-                return None
-            
-            # ✅ CORRECTO: Comparar con cierre anterior
-            previous_close = float(hist["Close"].iloc[-2])  # Cierre de ayer
-            current_price = float(hist["Close"].iloc[-1])   # Precio actual/último
-            
-            change = current_price - previous_close
-            change_percent = (change / previous_close) * 100
-
-            return {
-                'current_price': round(current_price, 2),
-                'previous_close': round(previous_close, 2),
-                'change': round(change, 4),
-                'change_percent': round(change_percent, 4)
-            }
-
-        except Exception as e:
-            logger.error(f"Error fetching intraday change for {symbol}: {str(e)}")
-            return None
+        formatted_symbol = cls._format_symbol(symbol, instrument_type)
+        return cls._change_of(cls.get_quote(formatted_symbol, instrument_type), formatted_symbol)
+    
+    @classmethod
+    def _change_of(cls, snapshot: Optional[QuoteSnapshot], formatted_symbol: str) -> Dict:
+        """Change dict of a snapshot, or a copy of UNAVAILABLE_CHANGE."""
+        if snapshot is None or not snapshot.has_change:
+            logger.warning(f"Not enough data for intraday change of {formatted_symbol}")
+            return dict(cls.UNAVAILABLE_CHANGE)
+        
+        return snapshot.to_change_dict()
         
     @classmethod
     def get_usd_to_dop_rate(cls) -> Optional[Decimal]:
-        try:
-            symbol = "DOP=X"
+        symbol = "DOP=X"
 
-            # Cache
-            if cls._is_cached(symbol):
-                return cls._cache[symbol]['data']['rate']
+        # Cache
+        cached, status = cls._lookup(symbol)
+        if cached is not None:
+            if status == 'stale':
+                cls._revalidate(f'rate:{symbol}', cls._fetch_usd_to_dop_rate)
+            return cached['rate']
 
-            ticker = yf.Ticker(symbol)
+        return cls._single_flight(f'rate:{symbol}', cls._fetch_usd_to_dop_rate)
 
-            rate = None
+    @classmethod
+    def refresh_usd_to_dop_rate(cls) -> Optional[Decimal]:
+        """Re-fetch the USD/DOP rate ignoring the cache."""
+        return cls._single_flight(
+            'rate:DOP=X',
+            lambda: cls._fetch_usd_to_dop_rate(force=True)
+        )
 
-            # 1️⃣ Intentar con fast_info
-            fast = ticker.fast_info
-            if fast and fast.get("last_price"):
-                rate = Decimal(str(fast["last_price"]))
+    @classmethod
+    def _fetch_usd_to_dop_rate(cls, force: bool = False) -> Optional[Decimal]:
+        """Fetch the USD/DOP rate and cache it (re-checking the cache first)."""
+        try:
+            symbol = "DOP=X"
 
-            # 2️⃣ Fallback a history si fast_info falla
-            if rate is None:
-                hist = ticker.history(period="1d")
-                if not hist.empty:
-                    rate = Decimal(str(hist["Close"].iloc[-1]))
+            cached = None if force else cls._get_cached(symbol)
+            if cached is not None:
+                return cached['rate']
+
+            rate = cls.get_provider().get_fx_rate(symbol)
 
             if rate is None:
                 logger.warning("Could not fetch USD/DOP rate")
@@ -279,7 +663,7 @@ class MarketService:
 
             cls._cache_data(symbol, {
                 "rate": rate
-            })
+            }, 'fx')
 
             return rate
 
@@ -288,23 +672,240 @@ class MarketService:
             return None
     
     @classmethod
-    def _is_cached(cls, symbol: str) -> bool:
-        """Check if symbol data is cached and still valid."""
-        if symbol not in cls._cache:
-            return False
+    def _single_flight(cls, key: str, fetch: Callable):
+        """
+        Run ``fetch`` once per key even if many threads ask at the same time.
+        
+        El primer llamador (líder) ejecuta la consulta; los que lleguen
+        mientras está en curso esperan y reciben el mismo resultado.
+        
+        Args:
+            key: Flight key, e.g. 'quote:AAPL'
+            fetch: Callable that performs the upstream request
+            
+        Returns:
+            The result returned by ``fetch`` (None if it failed)
+        """
+        led, joined = cls._claim_flights({key: key})
+        
+        if joined:
+            flight = joined[key]
+            flight.event.wait(cls._flight_timeout)
+            return flight.result
+        
+        result = None
+        try:
+            result = fetch()
+        finally:
+            cls._complete_flight(key, result)
+        
+        return result
+    
+    @classmethod
+    def _claim_flights(cls, keys: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, _Flight]]:
+        """
+        Register this thread as leader for every key that is not in flight.
+        
+        Args:
+            keys: Mapping of flight key -> value to hand back for led keys
+            
+        Returns:
+            tuple: (led {key: value}, joined {key: flight already in progress})
+        """
+        led = {}
+        joined = {}
+        
+        with cls._inflight_lock:
+            for key, value in keys.items():
+                flight = cls._inflight.get(key)
+                if flight is None:
+                    cls._inflight[key] = _Flight()
+                    cls._flight_stats['fetches'] += 1
+                    led[key] = value
+                else:
+                    cls._flight_stats['coalesced'] += 1
+                    joined[key] = flight
+        
+        return led, joined
+    
+    @classmethod
+    def _complete_flight(cls, key: str, result):
+        """Publish the leader's result and wake up the waiting threads."""
+        with cls._inflight_lock:
+            flight = cls._inflight.pop(key, None)
         
-        cache_entry = cls._cache[symbol]
-        time_diff = datetime.now() - cache_entry['timestamp']
+        if flight is not None:
+            flight.result = result
+            flight.event.set()
+    
+    @classmethod
+    def get_flight_stats(cls) -> Dict[str, int]:
+        """
+        Single-flight counters.
         
-        return time_diff < cls._cache_duration
+        Returns:
+            dict: 'fetches' (upstream requests made) and 'coalesced'
+                  (requests saved by waiting on an in-flight fetch)
+        """
+        with cls._inflight_lock:
+            return dict(cls._flight_stats)
+    
+    @classmethod
+    def get_price_status(cls, symbol: str, instrument_type: str) -> Optional[str]:
+        """
+        Freshness of the cached price for a symbol.
+        
+        Returns:
+            str: 'fresh', 'stale' (served while revalidating) or None
+                 if there is no usable cached price
+        """
+        formatted_symbol = cls._format_symbol(symbol, instrument_type)
+        return cls._lookup(formatted_symbol)[1]
+    
+    @classmethod
+    def _lookup(cls, symbol: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Look up cached data for a symbol.
+        
+        Returns:
+            tuple: (data, 'fresh') before it expires, (data, 'stale') past
+                   expiry but within the maximum staleness when stale-while-
+                   revalidate is enabled, otherwise (None, None)
+        """
+        cache_entry = cls._cache.get(symbol)
+        if cache_entry is None:
+            cls._count_lookup('misses')
+            return None, None
+        
+        now = datetime.now()
+        expires_at = cache_entry.get('expires_at') or \
+            cache_entry['timestamp'] + cls._cache_duration
+        
+        if now < expires_at:
+            cls._count_lookup('hits')
+            return cache_entry['data'], 'fresh'
+        
+        if cls._stale_while_revalidate and now - expires_at < cls._max_staleness:
+            cls._count_lookup('stale_hits')
+            return cache_entry['data'], 'stale'
+        
+        # Vencida sin posibilidad de servirse: liberar la entrada
+        cls._cache.delete(symbol)
+        cls._count_lookup('misses')
+        return None, None
+    
+    @classmethod
+    def _count_lookup(cls, outcome: str):
+        with cls._lookup_lock:
+            cls._lookup_stats[outcome] += 1
+    
+    @classmethod
+    def _revalidate(cls, key: str, fetch: Callable):
+        """Refresh a stale entry in the background (once per key)."""
+        with cls._inflight_lock:
+            if key in cls._inflight:
+                return
+        
+        cls._get_revalidate_executor().submit(cls._single_flight, key, fetch)
+    
+    @classmethod
+    def _revalidate_batch(cls, types: Dict[str, str]):
+        """Refresh several stale quotes (formatted symbol -> instrument_type) in one background batch."""
+        with cls._inflight_lock:
+            pending = {s: t for s, t in types.items() if f'quote:{s}' not in cls._inflight}
+        
+        if pending:
+            cls._get_revalidate_executor().submit(cls._fetch_and_cache_batch, pending)
+    
+    @classmethod
+    def _get_revalidate_executor(cls) -> ThreadPoolExecutor:
+        """Shared pool for background revalidation (created lazily)."""
+        with cls._revalidate_lock:
+            if cls._revalidate_executor is None:
+                cls._revalidate_executor = ThreadPoolExecutor(
+                    max_workers=cls._max_fetch_workers,
+                    thread_name_prefix='market-revalidate'
+                )
+            return cls._revalidate_executor
+    
+    @classmethod
+    def _get_cached(cls, symbol: str) -> Optional[Dict]:
+        """Return cached data for a symbol if it is still fresh, else None."""
+        data, status = cls._lookup(symbol)
+        return data if status == 'fresh' else None
     
     @classmethod
-    def _cache_data(cls, symbol: str, data: Dict):
-        """Cache market data for a symbol."""
-        cls._cache[symbol] = {
+    def _cache_data(cls, symbol: str, data, instrument_type: str, exchange: Optional[str] = None):
+        """
+        Cache market data for a symbol.
+        
+        El vencimiento lo decide la política de horario de mercado según el
+        tipo de instrumento (el que pidió el llamador) y la bolsa.
+        """
+        now = datetime.now()
+        exchange = exchange or cls._known_exchanges.get(symbol)
+        
+        cls._cache.set(symbol, {
             'data': data,
-            'timestamp': datetime.now()
-        }
+            'timestamp': now,
+            'expires_at': cls._ttl_policy.expires_at(instrument_type, exchange, now)
+        })
+    
+    @classmethod
+    def expiring_symbols(cls, symbols_data: List[Dict], within: timedelta) -> List[Dict]:
+        """
+        Symbols whose cached quote is missing or expires within ``within``.
+        
+        Lo usa el pre-calentador para no refrescar precios de mercados
+        cerrados que no van a cambiar.
+        
+        Args:
+            symbols_data: List of dicts with 'symbol' and 'instrument_type'
+            within: Look-ahead window
+            
+        Returns:
+            list: The subset of ``symbols_data`` that needs a refresh
+        """
+        deadline = datetime.now() + within
+        expiring = []
+        
+        for item in symbols_data:
+            formatted_symbol = cls._format_symbol(item['symbol'], item['instrument_type'])
+            cache_entry = cls._cache.get(formatted_symbol)
+            
+            if cache_entry is None or cache_entry.get('expires_at') is None or \
+                    cache_entry['expires_at'] <= deadline:
+                expiring.append(item)
+        
+        return expiring
+    
+    @classmethod
+    def get_cache_stats(cls) -> Dict:
+        """
+        Quote cache counters for monitoring.
+        
+        Returns:
+            dict: Lookup counters ('hits', 'stale_hits', 'misses'), the
+                  backend's size/eviction counters and the single-flight
+                  counters under 'flights'
+        """
+        with cls._lookup_lock:
+            stats = dict(cls._lookup_stats)
+        
+        stats.update(cls._cache.stats())
+        stats['flights'] = cls.get_flight_stats()
+        return stats
+    
+    @classmethod
+    def invalidate(cls, symbol: str, instrument_type: str):
+        """
+        Drop the cached quote of one symbol so the next read refetches it.
+        
+        Args:
+            symbol: The instrument symbol
+            instrument_type: Type of instrument
+        """
+        cls._cache.delete(cls._format_symbol(symbol, instrument_type))
     
     @classmethod
     def clear_cache(cls):
@@ -0,0 +1,110 @@
+"""
+Portfolio Cache - Parte del portafolio que no depende del precio, por usuario
+Keeps each user's instruments, positions, wallet and realized totals between
+requests, keyed by users.data_version so every write invalidates it
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+import logging
+import threading
+
+from sqlalchemy import update
+
+from app import db
+from app.models import User
+from app.services.cache_backends import CacheBackend, MemoryCacheBackend
+
+logger = logging.getLogger(__name__)
+
+
+class PortfolioCache:
+    """
+    Per-user cache of the price-independent portfolio data.
+
+    Cada entrada guarda la data_version del usuario con la que se calculó.
+    Las rutas que escriben transacciones, instrumentos o la billetera
+    llaman a bump() dentro de la misma transacción de base de datos, así
+    que una entrada solo se sirve mientras la versión coincide, aunque
+    haya varios workers con su propio caché en memoria.
+    """
+
+    _cache: CacheBackend = MemoryCacheBackend(max_entries=1000)
+    _stats = {'hits': 0, 'misses': 0}
+    _stats_lock = threading.Lock()
+
+    @classmethod
+    def init_app(cls, app):
+        """
+        Configure the cache from the Flask app config.
+
+        Config keys:
+            PORTFOLIO_CACHE_MAX_ENTRIES: Users kept in memory (LRU); 0 = no limit
+        """
+        cls._cache = MemoryCacheBackend(
+            max_entries=app.config.get('PORTFOLIO_CACHE_MAX_ENTRIES', 1000) or None
+        )
+
+    @classmethod
+    def get(cls, user_id: int, version: int) -> Optional[Dict]:
+        """
+        Cached data of a user, if it was computed at ``version``.
+
+        Args:
+            user_id: User id
+            version: The user's current data_version
+
+        Returns:
+            dict: The cached data or None
+        """
+        entry = cls._cache.get(cls._key(user_id))
+        hit = entry is not None and entry['version'] == version
+        cls._count('hits' if hit else 'misses')
+        return entry['data'] if hit else None
+
+    @classmethod
+    def set(cls, user_id: int, version: int, data: Dict):
+        """Store a user's data computed at ``version``."""
+        cls._cache.set(cls._key(user_id), {
+            'data': data,
+            'version': version,
+            'timestamp': datetime.now()
+        })
+
+    @classmethod
+    def bump(cls, user_id: int):
+        """
+        Invalidate a user's cached portfolio.
+
+        Incrementa users.data_version en la sesión actual (se confirma con
+        el commit de la ruta que hizo el cambio). Does not commit.
+
+        Args:
+            user_id: User id
+        """
+        db.session.execute(
+            update(User).where(User.id == user_id).values(data_version=User.data_version + 1)
+        )
+        cls._cache.delete(cls._key(user_id))
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Hit/miss counters plus the backend's size counters."""
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+        stats.update(cls._cache.stats())
+        return stats
+
+    @classmethod
+    def clear(cls):
+        """Remove every entry."""
+        cls._cache.clear()
+
+    @classmethod
+    def _count(cls, outcome: str):
+        with cls._stats_lock:
+            cls._stats[outcome] += 1
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f'portfolio:{user_id}'
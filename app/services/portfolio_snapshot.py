@@ -0,0 +1,456 @@
+"""
+Portfolio Snapshot - Métricas del portafolio calculadas una vez por request
+One quote batch (prices and intraday changes), one position load and one
+metrics pass per instrument; the portfolio totals, the per-instrument rows
+and the distribution are all derived from it
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from decimal import Decimal
+import hashlib
+import logging
+
+from app import db
+from app.models import Instrument, User, Wallet
+from app.services.market_service import MarketService
+from app.services.fifo import FIFOService, TxRecord
+from app.services.quote_snapshot import QuoteSnapshot
+from app.services.ledger_service import LedgerService
+from app.services.portfolio_cache import PortfolioCache
+
+logger = logging.getLogger(__name__)
+
+
+class _InstrumentRef(NamedTuple):
+    """Campos de Instrument que usa el snapshot (sin sesión, cacheable)."""
+    id: int
+    symbol: str
+    instrument_type: str
+
+
+class _WalletRef(NamedTuple):
+    """Saldos de la billetera (sin sesión, cacheable)."""
+    balance: Decimal
+    commissions: Decimal
+    dividend: Decimal
+
+
+class PortfolioSnapshot:
+    """
+    Estado del portafolio de un usuario en un instante.
+
+    Se construye con build() (o for_user(), que reutiliza lo que no depende
+    del precio desde PortfolioCache) y sus propiedades (portfolio_metrics,
+    instrument_rows, distribution) se calculan a partir de lo ya cargado,
+    sin volver a consultar precios ni posiciones.
+    """
+
+    def __init__(self, instruments: List[Instrument], user_id: Optional[int],
+                 quotes: Dict[str, Tuple[QuoteSnapshot, str]], positions: Dict[int, Dict],
+                 wallet: Optional[Wallet] = None, realized: Optional[Tuple[Decimal, Decimal]] = None):
+        self.instruments = instruments
+        self.user_id = user_id
+        self.quotes = quotes
+        self.prices = {
+            symbol: quote.price for symbol, (quote, _) in quotes.items()
+            if quote.price is not None
+        }
+        self.positions = positions
+        self._wallet = wallet
+        self._realized = realized
+        self._usd_to_dop = None
+
+        # Métricas FIFO por instrumento al precio actual (una vez cada uno)
+        self.metrics = {}
+        for inst in instruments:
+            position = positions[inst.id]
+            if not position['buy_count'] and not position['sell_count']:
+                continue
+            self.metrics[inst.id] = FIFOService.totals_from_position(position, self.price_of(inst) or 0.0)
+
+    @classmethod
+    def build(cls, instruments: List[Instrument], user_id: Optional[int] = None,
+              wallet: Optional[Wallet] = None,
+              histories: Optional[Dict[int, List[TxRecord]]] = None) -> 'PortfolioSnapshot':
+        """
+        Load quotes and positions for a set of instruments.
+
+        Args:
+            instruments: List of Instrument objects
+            user_id: Owner (for the wallet adjustments of the totals)
+            wallet: Wallet already loaded by the caller, if any
+            histories: Pre-grouped transaction histories (see
+                       LedgerService.load_histories), if already loaded
+
+        Returns:
+            PortfolioSnapshot: The snapshot
+        """
+        return cls(instruments, user_id, cls.load_quotes(instruments),
+                   LedgerService.get_positions(instruments, histories), wallet)
+
+    @classmethod
+    def for_user(cls, user: User) -> 'PortfolioSnapshot':
+        """
+        Snapshot of a user's whole portfolio, reusing the cached
+        price-independent data while the user's data_version is unchanged.
+
+        En un acierto de caché solo se consultan los precios (del caché de
+        MarketService) y se multiplican por las posiciones; instrumentos,
+        posiciones, billetera y totales realizados no tocan la base de
+        datos. Crea la billetera del usuario si aún no tiene.
+
+        Args:
+            user: User object (its data_version is the cache key)
+
+        Returns:
+            PortfolioSnapshot: The snapshot; ``wallet`` holds the balances
+        """
+        return cls.from_base(user.id, cls.load_base(user))
+
+    @classmethod
+    def load_base(cls, user: User) -> Dict:
+        """
+        Price-independent data of a user's portfolio, from PortfolioCache
+        or loaded (and cached) at the user's current data_version.
+
+        Si el usuario no tiene wallet se crea una por defecto con flush y
+        se marca db.session.info['wallet_created']; el commit queda a cargo
+        de la ruta.
+
+        Args:
+            user: User object
+
+        Returns:
+            dict: 'instruments', 'positions', 'wallet' and 'realized'
+        """
+        base = PortfolioCache.get(user.id, user.data_version)
+
+        if base is None:
+            instruments = Instrument.query.filter_by(user_id=user.id).all()
+            wallet = Wallet.query.filter_by(user_id=user.id).first()
+            if not wallet:
+                from app.services.portfolio_service import PortfolioService
+                wallet = PortfolioService.create_wallet_default(user)
+                # Sin commit: la ruta que llama es dueña de la transacción
+                db.session.add(wallet)
+                db.session.flush()
+                db.session.info['wallet_created'] = True
+
+            positions = LedgerService.get_positions(instruments)
+            base = {
+                'instruments': [_InstrumentRef(i.id, i.symbol, i.instrument_type) for i in instruments],
+                'positions': positions,
+                'wallet': _WalletRef(wallet.balance, wallet.commissions, wallet.dividend),
+                'realized': cls._sum_realized(positions, wallet)
+            }
+            PortfolioCache.set(user.id, user.data_version, base)
+
+        return base
+
+    @classmethod
+    def from_base(cls, user_id: int, base: Dict,
+                  quotes: Optional[Dict[str, Tuple[QuoteSnapshot, str]]] = None) -> 'PortfolioSnapshot':
+        """
+        Snapshot from the data of load_base and the quotes of its instruments.
+
+        Args:
+            user_id: Owner
+            base: Result of load_base
+            quotes: Result of load_quotes for base['instruments'] (loaded if None)
+
+        Returns:
+            PortfolioSnapshot: The snapshot
+        """
+        if quotes is None:
+            quotes = cls.load_quotes(base['instruments'])
+
+        return cls(base['instruments'], user_id, quotes,
+                   base['positions'], base['wallet'], base['realized'])
+
+    @staticmethod
+    def etag(user: User, quotes: Dict[str, Tuple[QuoteSnapshot, str]], usd_to_dop) -> str:
+        """
+        Strong ETag of a user's portfolio.
+
+        Depende solo de lo que el usuario ve: su data_version, el precio,
+        cierre anterior y frescura de las cotizaciones de sus símbolos y la
+        tasa USD/DOP. Es determinista, así que coincide entre workers con
+        los mismos precios y no cambia cuando se refrescan símbolos ajenos.
+
+        Args:
+            user: User object
+            quotes: Result of load_quotes for the user's instruments
+            usd_to_dop: Current USD/DOP rate
+
+        Returns:
+            str: The ETag value (hex digest)
+        """
+        prices = sorted(
+            (symbol, quote.price, quote.previous_close, status)
+            for symbol, (quote, status) in quotes.items()
+        )
+        key = f'{user.id}:{user.data_version}:{prices!r}:{usd_to_dop}'
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    @staticmethod
+    def load_quotes(instruments) -> Dict[str, Tuple[QuoteSnapshot, str]]:
+        """Quote batch (see MarketService.get_batch_quotes) of a set of instruments."""
+        return MarketService.get_batch_quotes([
+            {'symbol': inst.symbol, 'instrument_type': inst.instrument_type}
+            for inst in instruments
+        ]) if instruments else {}
+
+    def price_of(self, instrument: Instrument):
+        """Current price of an instrument (None if unavailable)."""
+        return self.prices.get(instrument.symbol)
+
+    def change_of(self, instrument: Instrument) -> Dict:
+        """Intraday change of an instrument (MarketService.UNAVAILABLE_CHANGE if unknown)."""
+        quote, _ = self.quotes.get(instrument.symbol, (None, None))
+        return MarketService._change_of(
+            quote, MarketService._format_symbol(instrument.symbol, instrument.instrument_type)
+        )
+
+    def price_status_of(self, instrument: Instrument) -> Optional[str]:
+        """'fresh' | 'stale' | None, as of the quote batch."""
+        quote, status = self.quotes.get(instrument.symbol, (None, None))
+        return status if quote is not None else None
+
+    @property
+    def usd_to_dop(self):
+        if self._usd_to_dop is None:
+            self._usd_to_dop = MarketService.get_usd_to_dop_rate()
+        return self._usd_to_dop
+
+    @property
+    def wallet(self) -> Optional[Wallet]:
+        if self._wallet is None and self.user_id is not None:
+            self._wallet = Wallet.query.filter_by(user_id=self.user_id).first()
+        return self._wallet
+
+    @property
+    def realized_totals(self) -> Tuple[Decimal, Decimal]:
+        """
+        Price-independent totals: (realized gain adjusted by the wallet's
+        commissions and dividends, cost basis sold).
+        """
+        if self._realized is None:
+            self._realized = self._sum_realized(
+                {inst.id: self.positions[inst.id] for inst in self.instruments}, self.wallet
+            )
+        return self._realized
+
+    @staticmethod
+    def _sum_realized(positions: Dict[int, Dict], wallet) -> Tuple[Decimal, Decimal]:
+        """Realized totals of the positions with transactions, plus the wallet adjustments."""
+        total_realized_gain = Decimal('0.0')
+        total_cost_basis_sold = Decimal('0.0')
+
+        for position in positions.values():
+            if not position['buy_count'] and not position['sell_count']:
+                continue
+            total_realized_gain += Decimal(str(position['realized']['realized_gain']))
+            total_cost_basis_sold += Decimal(str(position['realized']['cost_basis_sold']))
+
+        try:
+            total_realized_gain -= Decimal(wallet.commissions)
+            total_realized_gain += Decimal(wallet.dividend)
+        except Exception as e:
+            logger.error(f"Error registering transaction: {e}")
+            total_realized_gain = 0
+
+        return total_realized_gain, total_cost_basis_sold
+
+    @property
+    def portfolio_metrics(self) -> Dict:
+        """Overall portfolio metrics (see PortfolioService.calculate_portfolio_metrics)."""
+        if not self.instruments:
+            return {
+                'current_investment': 0.0,  # Inversión actual (no total histórico)
+                'current_market_value': 0.0,
+                'current_market_value_dop': 0.0,
+                'unrealized_gain': 0.0,
+                'unrealized_gain_percentage': 0.0,
+                'realized_gain': 0.0,
+                'realized_gain_percentage': 0.0,
+                'total_gain': 0.0,
+                'total_gain_percentage': 0.0
+            }
+
+        # Acumuladores (lo realizado no depende del precio)
+        total_realized_gain, total_cost_basis_sold = self.realized_totals
+        current_investment = Decimal('0.0')
+        current_market_value = Decimal('0.0')
+        total_unrealized_gain = Decimal('0.0')
+
+        for metrics in self.metrics.values():
+            # current_investment = solo el costo de lo que AÚN tienes
+            current_investment += Decimal(str(metrics['cost_basis']))
+            current_market_value += Decimal(str(metrics['current_value']))
+            total_unrealized_gain += Decimal(str(metrics['unrealized_gain']))
+
+        current_market_value_dop = current_market_value * self.usd_to_dop
+
+        # Calcular porcentajes globales
+        total_gain = total_realized_gain + total_unrealized_gain
+
+        # % de ganancia no realizada sobre la inversión actual
+        unrealized_gain_percentage = (
+            (total_unrealized_gain / current_investment * 100)
+            if current_investment > 0 else 0.0
+        )
+
+        # % de ganancia realizada sobre lo vendido
+        realized_gain_percentage = (
+            (total_realized_gain / total_cost_basis_sold * 100)
+            if total_cost_basis_sold > 0 else 0.0
+        )
+
+        # % de ganancia total sobre inversión actual + lo vendido
+        total_investment_historical = current_investment + total_cost_basis_sold
+        total_gain_percentage = (
+            (total_gain / total_investment_historical * 100)
+            if total_investment_historical > 0 else 0.0
+        )
+
+        return {
+            'current_investment': round(current_investment, 2),  # ✅ NUEVO NOMBRE
+            'current_market_value': round(current_market_value, 2),
+            'current_market_value_dop': round(current_market_value_dop, 2),
+            'unrealized_gain': round(total_unrealized_gain, 2),
+            'unrealized_gain_percentage': round(unrealized_gain_percentage, 2),
+            'realized_gain': round(total_realized_gain, 2),
+            'realized_gain_percentage': round(realized_gain_percentage, 2),
+            'total_gain': round(total_gain, 2),
+            'total_gain_percentage': round(total_gain_percentage, 2)
+        }
+
+    @property
+    def instrument_rows(self) -> List[Dict]:
+        """Per-instrument rows for the dashboard table."""
+        return [self.instrument_row(inst) for inst in self.instruments]
+
+    def instrument_row(self, instrument: Instrument) -> Dict:
+        """Metrics of one instrument (see PortfolioService.calculate_instrument_metrics)."""
+        current_price = self.price_of(instrument) or 0.0
+        change_info = self.change_of(instrument)
+        price_status = self.price_status_of(instrument)
+
+        metrics = self.metrics.get(instrument.id)
+
+        if metrics is None:
+            return {
+                'symbol': instrument.symbol,
+                'type': instrument.instrument_type,
+                'current_quantity': 0.0,
+                'average_price': 0.0,
+                'current_price': current_price,
+                'current_value': 0.0,
+                'current_investment': 0.0,  # ✅ Inversión actual por instrumento
+                'unrealized_gain': 0.0,
+                'unrealized_gain_percentage': 0.0,
+                'realized_gain': 0.0,
+                'realized_gain_percentage': 0.0,
+                'total_gain': 0.0,
+                'total_gain_percentage': 0.0,
+                'change': change_info['change'],
+                'change_percentage': change_info['change_percent'],
+                'change_available': change_info['available'],
+                'price_status': price_status,
+                'instrument_id': instrument.id
+            }
+
+        return {
+            'symbol': instrument.symbol,
+            'type': instrument.instrument_type,
+            'current_quantity': metrics['current_quantity'],
+            'average_price': metrics['average_price'],
+            'current_price': current_price,
+            'current_value': metrics['current_value'],
+            'current_investment': metrics['cost_basis'],  # ✅ Solo lo que tienes ahora
+            'unrealized_gain': metrics['unrealized_gain'],
+            'unrealized_gain_percentage': metrics['unrealized_gain_percentage'],
+            'realized_gain': metrics['realized_gain'],
+            'realized_gain_percentage': metrics['realized_gain_percentage'],
+            'total_gain': metrics['total_gain'],
+            'total_gain_percentage': metrics.get('total_gain_percentage', 0.0),
+            'total_commissions': metrics['total_commissions'],
+            'change': change_info['change'],
+            'change_percentage': change_info['change_percent'],
+            'change_available': change_info['available'],
+            'price_status': price_status,  # 'fresh' | 'stale' | None
+            'instrument_id': instrument.id
+        }
+
+    @property
+    def distribution(self) -> Dict:
+        """Distribution by type, risk and instrument (see PortfolioService.get_portfolio_distribution)."""
+        if not self.instruments:
+            return {
+                'by_type': [],
+                'by_risk': [],
+                'by_instrument': []
+            }
+
+        type_distribution = {'stock': 0, 'etf': 0, 'crypto': 0}
+        risk_distribution = {'medium': 0, 'high': 0}
+        instrument_values = []
+        total_value = Decimal(str('0.0'))
+
+        for inst in self.instruments:
+            metrics = self.metrics.get(inst.id)
+            if not self.price_of(inst) or metrics is None:
+                continue
+
+            current_value = Decimal(metrics['current_value'])
+            total_value += current_value
+
+            # By type
+            type_distribution[inst.instrument_type] += current_value
+
+            # By risk (ETF = medium, Stock and Crypto = high)
+            risk_level = 'medium' if inst.instrument_type == 'etf' else 'high'
+            risk_distribution[risk_level] += current_value
+
+            # By instrument
+            instrument_values.append({
+                'symbol': inst.symbol,
+                'value': current_value
+            })
+
+        # Convert to percentages and amounts
+        by_type = [
+            {
+                'label': key.upper(),
+                'value': value,
+                'percentage': float(round((value / total_value * 100) if total_value > 0 else 0, 2))
+            }
+            for key, value in type_distribution.items()
+            if value > 0
+        ]
+
+        by_risk = [
+            {
+                'label': 'Riesgo Medio (ETF)' if key == 'medium' else 'Riesgo Alto (Stock/Crypto)',
+                'value': value,
+                'percentage': float(round((value / total_value * 100) if total_value > 0 else 0, 2))
+            }
+            for key, value in risk_distribution.items()
+            if value > 0
+        ]
+
+        by_instrument = [
+            {
+                'label': item['symbol'],
+                'value': item['value'],
+                'percentage': float(round((item['value'] / total_value * 100) if total_value > 0 else 0, 2))
+            }
+            for item in sorted(instrument_values, key=lambda x: x['value'], reverse=True)
+            if item['value'] > 0
+        ]
+
+        return {
+            'by_type': by_type,
+            'by_risk': by_risk,
+            'by_instrument': by_instrument[:10]  # Top 10 instruments
+        }
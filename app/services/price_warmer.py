@@ -0,0 +1,145 @@
+"""
+Price Warmer - Pre-calentado de precios en segundo plano
+Refreshes the quotes of every held symbol before they expire from the cache
+"""
+
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import logging
+import threading
+
+from app import db
+from app.models import Instrument
+from app.services.market_service import MarketService
+
+logger = logging.getLogger(__name__)
+
+
+class PriceWarmer:
+    """Background scheduler that keeps MarketService's cache warm."""
+
+    # Intervalos por defecto (segundos); deben ser menores que el TTL del
+    # caché para renovar los precios antes de que expiren
+    DEFAULT_INTERVALS = {'stock': 240, 'etf': 240, 'crypto': 90, 'fx': 240}
+
+    def __init__(self, app, intervals: Optional[Dict[str, int]] = None, tick: int = 15):
+        """
+        Args:
+            app: Flask application (used for the app context)
+            intervals: Refresh interval in seconds per instrument type
+            tick: Seconds between scheduler checks
+        """
+        self.app = app
+        self.intervals = dict(self.DEFAULT_INTERVALS)
+        self.intervals.update(intervals or app.config.get('PRICE_REFRESH_INTERVALS') or {})
+        self.tick = tick
+        self._last_refresh: Dict[str, datetime] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def collect_symbols() -> Dict[str, List[Dict]]:
+        """
+        Distinct symbols held across all instruments, grouped by type.
+
+        Returns:
+            dict: instrument_type -> [{'symbol', 'instrument_type'}, ...]
+        """
+        rows = db.session.query(
+            Instrument.symbol, Instrument.instrument_type
+        ).distinct().all()
+
+        grouped = {}
+        for symbol, instrument_type in rows:
+            grouped.setdefault(instrument_type, []).append({
+                'symbol': symbol,
+                'instrument_type': instrument_type
+            })
+
+        return grouped
+
+    def run_once(self, force: bool = False) -> int:
+        """
+        Refresh every instrument type whose interval has elapsed.
+
+        Args:
+            force: Refresh all types regardless of their interval
+
+        Returns:
+            int: Number of symbols refreshed
+        """
+        now = datetime.now()
+        refreshed = 0
+
+        with self.app.app_context():
+            try:
+                grouped = self.collect_symbols()
+            finally:
+                db.session.remove()
+
+        for instrument_type, symbols_data in grouped.items():
+            interval = self.intervals.get(instrument_type, min(self.intervals.values()))
+            last = self._last_refresh.get(instrument_type)
+
+            if not force and last and (now - last).total_seconds() < interval:
+                continue
+
+            # Omitir los que siguen en caché más allá del próximo ciclo
+            # (ej. mercado cerrado hasta la próxima apertura)
+            if not force:
+                symbols_data = MarketService.expiring_symbols(
+                    symbols_data, timedelta(seconds=interval + self.tick)
+                )
+
+            self._last_refresh[instrument_type] = now
+            if not symbols_data:
+                continue
+
+            prices = MarketService.refresh_prices(symbols_data)
+            refreshed += len(prices)
+
+            if len(prices) < len(symbols_data):
+                logger.warning(
+                    f"Price warmer: {len(symbols_data) - len(prices)} "
+                    f"{instrument_type} symbols could not be refreshed"
+                )
+
+        # La tasa USD/DOP también se muestra en el dashboard
+        fx_interval = self.intervals.get('fx', min(self.intervals.values()))
+        last = self._last_refresh.get('fx')
+        if force or not last or (now - last).total_seconds() >= fx_interval:
+            self._last_refresh['fx'] = now
+            fx_symbols = [{'symbol': 'DOP=X', 'instrument_type': 'fx'}]
+            if force or MarketService.expiring_symbols(
+                fx_symbols, timedelta(seconds=fx_interval + self.tick)
+            ):
+                MarketService.refresh_usd_to_dop_rate()
+
+        return refreshed
+
+    def run_forever(self):
+        """Run the scheduler loop until stop() is called."""
+        logger.info(f"Price warmer started (intervals: {self.intervals})")
+
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Price warmer error: {str(e)}")
+
+            self._stop.wait(self.tick)
+
+    def start(self) -> threading.Thread:
+        """Start the scheduler in a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self.run_forever, name='price-warmer', daemon=True
+            )
+            self._thread.start()
+
+        return self._thread
+
+    def stop(self):
+        """Ask the scheduler loop to finish."""
+        self._stop.set()
@@ -0,0 +1,36 @@
+"""
+Market data providers
+"""
+
+from app.services.providers.base import MarketDataProvider
+from app.services.providers.synthetic_provider import SyntheticProvider
+
+
+def create_provider(name: str, **options) -> MarketDataProvider:
+    """
+    Build a market data provider from its configuration name.
+
+    Args:
+        name: 'yfinance' (default) or 'synthetic'
+        **options: seed and latency for the synthetic provider
+
+    Returns:
+        MarketDataProvider: The configured provider
+    """
+    name = (name or 'yfinance').lower()
+
+    if name == 'yfinance':
+        # Import diferido: el proveedor sintético no necesita yfinance
+        from app.services.providers.yfinance_provider import YFinanceProvider
+        return YFinanceProvider()
+
+    if name == 'synthetic':
+        return SyntheticProvider(
+            seed=options.get('seed', 0),
+            latency=options.get('latency', 0.0)
+        )
+
+    raise ValueError(f"Unknown market data provider: {name}")
+
+
+__all__ = ['MarketDataProvider', 'SyntheticProvider', 'create_provider']
@@ -0,0 +1,73 @@
+"""
+Market data provider interface
+"""
+
+from abc import ABC, abstractmethod
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from app.services.quote_snapshot import QuoteSnapshot
+
+
+class MarketDataProvider(ABC):
+    """Source of quotes, price history and FX rates for MarketService."""
+
+    name = 'base'
+
+    @abstractmethod
+    def get_quote(self, symbol: str) -> Optional[QuoteSnapshot]:
+        """
+        Full quote (price, previous close and metadata) for one symbol.
+
+        Args:
+            symbol: Formatted symbol (e.g. 'AAPL', 'BTC-USD')
+
+        Returns:
+            QuoteSnapshot: The quote, or None if the symbol does not exist
+        """
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, QuoteSnapshot]:
+        """
+        Quotes for several symbols in as few upstream calls as possible.
+
+        Puede omitir metadatos (has_metadata=False) y símbolos que no
+        encuentre; MarketService consulta los faltantes uno a uno.
+
+        Args:
+            symbols: Formatted symbols
+
+        Returns:
+            dict: symbol -> QuoteSnapshot (only the symbols obtained)
+        """
+        quotes = {}
+        for symbol in symbols:
+            quote = self.get_quote(symbol)
+            if quote is not None:
+                quotes[symbol] = quote
+        return quotes
+
+    @abstractmethod
+    def get_history(self, symbol: str, days: int = 5) -> List[Tuple[date, float]]:
+        """
+        Daily closes for the last ``days`` sessions.
+
+        Args:
+            symbol: Formatted symbol
+            days: Number of calendar days to look back
+
+        Returns:
+            list: (date, close) tuples, oldest first
+        """
+
+    @abstractmethod
+    def get_fx_rate(self, pair: str) -> Optional[Decimal]:
+        """
+        Exchange rate for a currency pair.
+
+        Args:
+            pair: Yahoo-style pair symbol (e.g. 'DOP=X' for USD/DOP)
+
+        Returns:
+            Decimal: The rate or None if not available
+        """
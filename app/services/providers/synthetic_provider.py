@@ -0,0 +1,127 @@
+"""
+Synthetic provider - precios deterministas para pruebas sin red
+Seeded random-walk prices for any symbol, for offline load tests and benchmarks
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from app.services.providers.base import MarketDataProvider
+from app.services.quote_snapshot import QuoteSnapshot
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Deterministic market data: one seeded daily random walk per symbol.
+
+    El mismo (seed, símbolo, fecha) produce siempre el mismo precio, en
+    cualquier proceso, de modo que los benchmarks son reproducibles.
+    """
+
+    name = 'synthetic'
+
+    # Día cero de todas las series
+    EPOCH = date(2020, 1, 1)
+
+    def __init__(self, seed: int = 0, latency: float = 0.0, unknown_prefix: str = 'INVALID'):
+        """
+        Args:
+            seed: Seed shared by every symbol's walk
+            latency: Simulated upstream latency in seconds per call
+            unknown_prefix: Symbols starting with it are reported as missing
+        """
+        self.seed = seed
+        self.latency = latency
+        self.unknown_prefix = unknown_prefix
+        self._walks: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def get_quote(self, symbol: str) -> Optional[QuoteSnapshot]:
+        self._sleep()
+        return self._quote(symbol, with_metadata=True)
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, QuoteSnapshot]:
+        self._sleep()
+        quotes = {}
+        for symbol in symbols:
+            quote = self._quote(symbol, with_metadata=False)
+            if quote is not None:
+                quotes[symbol] = quote
+        return quotes
+
+    def get_history(self, symbol: str, days: int = 5) -> List[Tuple[date, float]]:
+        self._sleep()
+        if self._is_unknown(symbol):
+            return []
+
+        today = date.today()
+        walk = self._walk(symbol, today)
+        start = max(len(walk) - days, 0)
+        return [
+            (self.EPOCH + timedelta(days=i), float(walk[i]))
+            for i in range(start, len(walk))
+        ]
+
+    def get_fx_rate(self, pair: str) -> Optional[Decimal]:
+        self._sleep()
+        if self._is_unknown(pair):
+            return None
+
+        walk = self._walk(pair, date.today())
+        return Decimal(str(float(walk[-1])))
+
+    def _quote(self, symbol: str, with_metadata: bool) -> Optional[QuoteSnapshot]:
+        """Snapshot for today's close and the previous day's close."""
+        if self._is_unknown(symbol):
+            return None
+
+        walk = self._walk(symbol, date.today())
+        metadata = {}
+        if with_metadata:
+            metadata = {
+                'currency': 'USD',
+                'name': f'{symbol} (synthetic)',
+                'exchange': 'CCC' if symbol.endswith('-USD') else 'NMS',
+                'has_metadata': True,
+            }
+
+        return QuoteSnapshot.build(symbol, float(walk[-1]), float(walk[-2]), **metadata)
+
+    def _walk(self, symbol: str, until: date) -> np.ndarray:
+        """Daily closes from EPOCH to ``until`` (inclusive), extended lazily."""
+        days = (until - self.EPOCH).days + 1
+
+        with self._lock:
+            walk = self._walks.get(symbol)
+            if walk is None or len(walk) < days:
+                walk = self._generate(symbol, days)
+                self._walks[symbol] = walk
+
+        return walk[:days]
+
+    def _generate(self, symbol: str, days: int) -> np.ndarray:
+        """Generate a geometric random walk seeded by (seed, symbol)."""
+        rng = np.random.default_rng(zlib.crc32(f'{self.seed}:{symbol}'.encode()))
+
+        if symbol.endswith('=X'):
+            price, volatility = rng.uniform(20, 120), 0.003
+        elif symbol.endswith('-USD'):
+            price, volatility = rng.uniform(0.5, 5000), 0.03
+        else:
+            price, volatility = rng.uniform(5, 500), 0.015
+
+        log_returns = rng.normal(0.0, volatility, days)
+        return np.round(price * np.exp(np.cumsum(log_returns)), 4)
+
+    def _is_unknown(self, symbol: str) -> bool:
+        return bool(self.unknown_prefix) and symbol.startswith(self.unknown_prefix)
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency)
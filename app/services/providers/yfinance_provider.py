@@ -0,0 +1,117 @@
+"""
+Yahoo Finance provider (yfinance)
+"""
+
+from dataclasses import replace
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import yfinance as yf
+
+from app.services.providers.base import MarketDataProvider
+from app.services.quote_snapshot import QuoteSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Market data from Yahoo Finance through the yfinance package."""
+
+    name = 'yfinance'
+
+    def get_quote(self, symbol: str) -> Optional[QuoteSnapshot]:
+        """
+        Una sola llamada a ``ticker.info``; el histórico diario solo se pide
+        si info no trae precio o cierre anterior.
+
+        Sin 'symbol' en info el snapshot sale sin metadatos (has_metadata
+        False) pero con el precio del histórico; solo verify_symbol trata
+        ese caso como símbolo inválido. None si tampoco hay histórico.
+        """
+        ticker = yf.Ticker(symbol)
+        info = ticker.info or {}
+        known = 'symbol' in info
+
+        snapshot = QuoteSnapshot.from_info(symbol, info)
+
+        # If info doesn't have prices, try history
+        if snapshot.price is None or not snapshot.has_change:
+            hist = ticker.history(period='5d')
+            if not hist.empty:
+                closes = [float(c) for c in hist['Close'].dropna()]
+                snapshot = QuoteSnapshot.from_info(symbol, info, closes)
+
+        if not known:
+            if snapshot.price is None:
+                logger.warning(f"Symbol {symbol} not found or invalid")
+                return None
+            snapshot = replace(snapshot, has_metadata=False)
+
+        return snapshot
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, QuoteSnapshot]:
+        """
+        Descarga masiva (yf.download) de los últimos cierres: trae precio y
+        cierre anterior, pero no nombre, moneda ni bolsa.
+        """
+        snapshots = {}
+
+        try:
+            data = yf.download(
+                tickers=symbols,
+                period='5d',
+                interval='1d',
+                group_by='ticker',
+                auto_adjust=False,
+                threads=True,
+                progress=False
+            )
+        except Exception as e:
+            logger.error(f"Error in bulk price download: {str(e)}")
+            return snapshots
+
+        if data is None or data.empty:
+            return snapshots
+
+        for symbol in symbols:
+            try:
+                closes = data[symbol]['Close'].dropna()
+            except KeyError:
+                continue
+
+            if closes.empty:
+                continue
+
+            previous_close = float(closes.iloc[-2]) if len(closes) >= 2 else None
+            snapshots[symbol] = QuoteSnapshot.build(
+                symbol,
+                float(closes.iloc[-1]),
+                previous_close
+            )
+
+        return snapshots
+
+    def get_history(self, symbol: str, days: int = 5) -> List[Tuple[date, float]]:
+        hist = yf.Ticker(symbol).history(period=f'{days}d')
+        if hist.empty:
+            return []
+
+        closes = hist['Close'].dropna()
+        return [(index.date(), float(close)) for index, close in closes.items()]
+
+    def get_fx_rate(self, pair: str) -> Optional[Decimal]:
+        ticker = yf.Ticker(pair)
+
+        # 1️⃣ Intentar con fast_info
+        fast = ticker.fast_info
+        if fast and fast.get("last_price"):
+            return Decimal(str(fast["last_price"]))
+
+        # 2️⃣ Fallback a history si fast_info falla
+        hist = ticker.history(period="1d")
+        if not hist.empty:
+            return Decimal(str(hist["Close"].iloc[-1]))
+
+        return None
@@ -0,0 +1,117 @@
+"""
+QuoteSnapshot - Cotización unificada por símbolo
+One record per formatted symbol, built from a single upstream fetch
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class QuoteSnapshot:
+    """Quote data for one formatted symbol, shared by every MarketService accessor."""
+
+    symbol: str
+    price: Optional[float]
+    previous_close: Optional[float] = None
+    change: Optional[float] = None
+    change_percent: Optional[float] = None
+    currency: Optional[str] = None
+    name: Optional[str] = None
+    exchange: Optional[str] = None
+    # False cuando la fuente no trae nombre/moneda/bolsa (ej. descarga masiva)
+    has_metadata: bool = False
+    fetched_at: Optional[datetime] = None
+
+    @classmethod
+    def build(cls, symbol: str, price, previous_close=None, **metadata) -> 'QuoteSnapshot':
+        """
+        Create a snapshot computing the change against the previous close.
+
+        Args:
+            symbol: Formatted symbol
+            price: Current (or last) price
+            previous_close: Previous session close
+            **metadata: currency, name, exchange, has_metadata
+
+        Returns:
+            QuoteSnapshot: The snapshot
+        """
+        change = None
+        change_percent = None
+
+        if price and previous_close:
+            change = round(float(price) - float(previous_close), 4)
+            change_percent = round((float(price) - float(previous_close)) / float(previous_close) * 100, 4)
+
+        return cls(
+            symbol=symbol,
+            price=float(price) if price is not None else None,
+            previous_close=float(previous_close) if previous_close is not None else None,
+            change=change,
+            change_percent=change_percent,
+            fetched_at=datetime.now(),
+            **metadata
+        )
+
+    @classmethod
+    def from_info(cls, symbol: str, info: Dict, closes: Optional[List[float]] = None) -> 'QuoteSnapshot':
+        """
+        Build a snapshot from a Yahoo Finance ``ticker.info`` payload.
+
+        Args:
+            symbol: Formatted symbol
+            info: ``ticker.info`` dict
+            closes: Optional daily closes (oldest first) used when info lacks prices
+
+        Returns:
+            QuoteSnapshot: The snapshot
+        """
+        price = (
+            info.get('currentPrice') or
+            info.get('regularMarketPrice') or
+            info.get('price')
+        )
+        previous_close = (
+            info.get('previousClose') or
+            info.get('regularMarketPreviousClose')
+        )
+
+        # Sin precio en vivo: usar el histórico diario
+        if closes and (price is None or previous_close is None):
+            if price is None:
+                price = float(closes[-1])
+                if len(closes) >= 2:
+                    previous_close = float(closes[-2])
+            elif len(closes) >= 2:
+                previous_close = float(closes[-2])
+
+        # Igual que antes: el cierre anterior sirve de precio si no hay otro
+        if price is None:
+            price = previous_close
+
+        return cls.build(
+            symbol,
+            price,
+            previous_close,
+            currency=info.get('currency'),
+            name=info.get('longName') or info.get('shortName'),
+            exchange=info.get('exchange'),
+            has_metadata=bool(info)
+        )
+
+    @property
+    def has_change(self) -> bool:
+        """True if the change since previous close is known."""
+        return self.change is not None
+
+    def to_change_dict(self) -> Dict:
+        """Change since previous close in the get_intraday_change format."""
+        return {
+            'current_price': self.price,
+            'previous_close': self.previous_close,
+            'change': self.change,
+            'change_percent': self.change_percent,
+            'available': True
+        }
@@ -0,0 +1,87 @@
+"""
+Fixed Point - Aritmética de enteros escalados
+Exact fixed-point helpers for quantities and money: values are Python ints
+scaled by 10**places, matching the Numeric columns of the models
+
+Equivalencia con el cálculo Decimal anterior (contexto por defecto, 28
+dígitos significativos): aquí las sumas y productos son exactos y la única
+división (comisión proporcional, div_round) redondea half-even a
+ACCUM_PLACES; antes cada operación redondeaba a 28 dígitos. Mientras
+cantidad × precio de cada lote quepa en 28 dígitos (costos menores a 10**8
+con los 20 decimales de COST_PLACES) las métricas al centavo son idénticas,
+lotes parciales repetidos incluidos. Por encima, el cálculo anterior perdía
+del orden de 10**-28 relativo por operación: solo puede cambiar el centavo
+en un empate exacto de redondeo o el signo de un cero (-0.00 frente a 0.00).
+Ver tests/test_fifo_equivalence.py.
+"""
+
+from decimal import Decimal, Context, ROUND_HALF_EVEN
+
+# Escalas de las columnas de transactions
+QTY_PLACES = 12      # Numeric(20, 12)
+PRICE_PLACES = 8     # Numeric(20, 8)
+MONEY_PLACES = 2     # Numeric(20, 2)
+
+# cantidad × precio
+COST_PLACES = QTY_PLACES + PRICE_PLACES
+# Comisiones proporcionales y acumulados de lo realizado; coincide con las
+# columnas Numeric(65, 30) del ledger, así que se guardan sin pérdida
+ACCUM_PLACES = 30
+
+# Contexto con precisión suficiente para convertir Numeric(65, 30) sin redondeo
+_EXACT = Context(prec=80, rounding=ROUND_HALF_EVEN)
+
+# Potencias de diez en Decimal para la conversión rápida
+_POWERS = [Decimal(10 ** places) for places in range(66)]
+
+
+def to_scaled(value, places: int) -> int:
+    """
+    Convert a Decimal (or number) to an integer scaled by 10**places.
+
+    Los valores que caben en 28 dígitos (todas las columnas Numeric(20, x))
+    se multiplican con el contexto por defecto, que es exacto a esa
+    precisión; los más largos (acumulados del ledger) usan _EXACT.
+
+    Args:
+        value: Decimal, int, float or numeric string
+        places: Decimal places of the scale
+
+    Returns:
+        int: value × 10**places (truncated past ``places``)
+    """
+    if type(value) is not Decimal:
+        value = Decimal(str(value))
+    if value.adjusted() + places < 27:
+        return int(value * _POWERS[places])
+    return int(_EXACT.scaleb(value, places))
+
+
+def to_decimal(value: int, places: int) -> Decimal:
+    """
+    Exact Decimal with exponent -places from a scaled integer.
+
+    Args:
+        value: Scaled integer
+        places: Decimal places of the scale
+
+    Returns:
+        Decimal: The value, e.g. to_decimal(150, 2) == Decimal('1.50')
+    """
+    return Decimal(f'{int(value)}E-{places}')
+
+
+def rescale(value: int, from_places: int, to_places: int) -> int:
+    """Move a scaled integer to a finer scale (to_places >= from_places)."""
+    return value * 10 ** (to_places - from_places)
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """Integer division rounded half-even, like Decimal's default context."""
+    quotient, remainder = divmod(numerator, denominator)
+    doubled = 2 * remainder
+    if denominator < 0:
+        doubled, denominator = -doubled, -denominator
+    if doubled > denominator or (doubled == denominator and quotient % 2):
+        quotient += 1
+    return quotient
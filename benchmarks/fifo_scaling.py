@@ -0,0 +1,98 @@
+"""
+FIFO Scaling Benchmark - Escalado de la cola de lotes
+Times FIFOService on DCA-style histories (many small buys, periodic sells)
+to show that lot consumption scales linearly with the number of lots.
+
+Uso:
+    python -m benchmarks.fifo_scaling
+    python -m benchmarks.fifo_scaling --sizes 1000 10000 100000 --repeat 3
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+import argparse
+import random
+import time
+
+from app.services.fifo import FIFOService
+
+
+def build_dca_history(lots: int, sell_every: int = 50, seed: int = 42):
+    """
+    Synthetic crypto DCA history: ``lots`` small buys and one sell every
+    ``sell_every`` buys that consumes most of what was bought since the
+    previous sell (so each sell eats many lots and leaves a partial one).
+
+    Args:
+        lots: Number of buy lots
+        sell_every: Buys between sells
+        seed: Random seed
+
+    Returns:
+        list: Transaction-like objects
+    """
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    transactions = []
+    pending = Decimal('0')
+
+    for i in range(lots):
+        quantity = Decimal(rng.randint(1000, 500000)).scaleb(-8)
+        transactions.append(SimpleNamespace(
+            id=len(transactions) + 1,
+            transaction_type='buy',
+            quantity=quantity,
+            price=Decimal(rng.randint(2000000, 6000000)).scaleb(-2),
+            commission=Decimal(rng.randint(0, 150)).scaleb(-2),
+            transaction_date=start + timedelta(days=i // 4)
+        ))
+        pending += quantity
+
+        if (i + 1) % sell_every == 0:
+            sold = (pending * Decimal('0.9')).quantize(Decimal('1e-8'))
+            transactions.append(SimpleNamespace(
+                id=len(transactions) + 1,
+                transaction_type='sell',
+                quantity=sold,
+                price=Decimal(rng.randint(2000000, 6000000)).scaleb(-2),
+                commission=Decimal('1.00'),
+                transaction_date=start + timedelta(days=i // 4)
+            ))
+            pending -= sold
+
+    return transactions
+
+
+def time_totals(transactions, repeat: int) -> float:
+    """Best wall time (seconds) of calculate_instrument_totals."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        FIFOService.calculate_instrument_totals(transactions, Decimal('45000'))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--sell-every', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'lots':>10} {'transactions':>13} {'seconds':>10} {'µs/lot':>9} {'vs first':>9}")
+    first_per_lot = None
+
+    for lots in args.sizes:
+        transactions = build_dca_history(lots, args.sell_every)
+        seconds = time_totals(transactions, args.repeat)
+        per_lot = seconds / lots * 1e6
+        first_per_lot = first_per_lot or per_lot
+        print(f"{lots:>10} {len(transactions):>13} {seconds:>10.3f} "
+              f"{per_lot:>9.2f} {per_lot / first_per_lot:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Synthetic Histories - Historiales de transacciones para benchmarks
+Seeded generator of valid transaction histories: buys and sells that leave
+partial lots, fractional crypto quantities and backdated edits
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_DOWN
+from types import SimpleNamespace
+from typing import Dict, List
+import random
+
+# Escalas de las columnas de transactions
+_QTY_UNIT = Decimal('1e-12')
+_CRYPTO_QTY_UNIT = Decimal('1e-8')
+
+
+def generate_history(transactions: int, seed: int = 0, crypto: bool = False,
+                     sell_ratio: float = 0.3, backdate_ratio: float = 0.05,
+                     first_id: int = 1, start: date = date(2010, 1, 1)) -> List[SimpleNamespace]:
+    """
+    Synthetic history of one instrument that never sells more than it holds.
+
+    Cada venta vende una fracción aleatoria de lo que hay en cartera, así
+    que consume varios lotes y suele dejar uno parcial. Una parte de las
+    compras se "edita" después moviendo su fecha hacia atrás (nunca rompe
+    el FIFO: adelanta unidades disponibles).
+
+    Args:
+        transactions: Number of transactions
+        seed: Random seed (same seed, same history)
+        crypto: Fractional quantities with 8 decimals and large prices
+        sell_ratio: Probability of a sell when there are units held
+        backdate_ratio: Fraction of buys whose date is moved back
+        first_id: Id of the first transaction
+        start: Date of the first transaction
+
+    Returns:
+        list: Transaction-like objects (id, transaction_type, quantity,
+              price, commission, transaction_date) in insertion order
+    """
+    rng = random.Random(seed)
+    history = []
+    held = Decimal('0')
+    day = 0
+
+    for i in range(transactions):
+        day += rng.randint(0, 2)
+        if held > 0 and rng.random() < sell_ratio:
+            unit = _CRYPTO_QTY_UNIT if crypto else _QTY_UNIT
+            quantity = (held * Decimal(rng.uniform(0.05, 1))).quantize(unit, rounding=ROUND_DOWN)
+            quantity = max(min(quantity, held), min(unit, held))
+            tx_type = 'sell'
+            held -= quantity
+        else:
+            if crypto:
+                quantity = Decimal(rng.randint(10 ** 4, 5 * 10 ** 7)).scaleb(-8)
+            else:
+                quantity = Decimal(rng.randint(1, 200))
+            tx_type = 'buy'
+            held += quantity
+
+        history.append(SimpleNamespace(
+            id=first_id + i,
+            transaction_type=tx_type,
+            quantity=quantity,
+            price=_price(rng, crypto),
+            commission=Decimal(rng.randint(0, 500)).scaleb(-2),
+            transaction_date=start + timedelta(days=day)
+        ))
+
+    # Ediciones retroactivas: compras que pasan a una fecha anterior
+    buys = [tx for tx in history if tx.transaction_type == 'buy']
+    for tx in rng.sample(buys, int(len(buys) * backdate_ratio)):
+        tx.transaction_date = max(start, tx.transaction_date - timedelta(days=rng.randint(1, 90)))
+
+    return history
+
+
+def generate_portfolio(instruments: int, transactions: int, seed: int = 0,
+                       crypto_ratio: float = 0.2, prefix: str = '') -> Dict[tuple, List[SimpleNamespace]]:
+    """
+    Histories for a user with several instruments (ids unique across them).
+
+    Args:
+        instruments: Number of instruments
+        transactions: Transactions per instrument
+        seed: Random seed
+        crypto_ratio: Fraction of crypto instruments
+        prefix: Symbol prefix (symbols are unique across users)
+
+    Returns:
+        dict: (symbol, instrument_type) -> history
+    """
+    rng = random.Random(seed)
+    portfolio = {}
+
+    for i in range(instruments):
+        crypto = rng.random() < crypto_ratio
+        key = (f'{prefix}C{i:04d}-USD', 'crypto') if crypto else (f'{prefix}S{i:04d}', 'stock')
+        portfolio[key] = generate_history(
+            transactions, seed=rng.randrange(2 ** 32), crypto=crypto,
+            first_id=i * transactions + 1
+        )
+
+    return portfolio
+
+
+def _price(rng: random.Random, crypto: bool) -> Decimal:
+    if crypto:
+        return Decimal(rng.randint(10 ** 10, 7 * 10 ** 12)).scaleb(-8)
+    return Decimal(rng.randint(500, 100000)).scaleb(-2)
@@ -0,0 +1,314 @@
+"""
+Benchmark Suite - Rendimiento de FIFOService y PortfolioService
+Times and peak memory of the FIFO calculations and validators over synthetic
+histories, of the portfolio views over users with many instruments and of the
+bulk FIFO engine over the same portfolios.
+Compares against a stored baseline and exits with status 1 on a regression.
+
+Uso:
+    python -m benchmarks.suite                      # preset quick
+    python -m benchmarks.suite --preset full        # hasta 10^6 transacciones y 1000 instrumentos
+    python -m benchmarks.suite --check              # falla si empeora respecto a baseline.json
+    python -m benchmarks.suite --save-baseline      # guarda los resultados como baseline
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import argparse
+import gc
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+from app.services.fifo import FIFOService
+from app.services.lot_matching import LotMatchingService
+
+from benchmarks.histories import generate_history, generate_portfolio
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+
+PRESETS = {
+    # Transacciones por instrumento (FIFO) e instrumentos por usuario (portafolio)
+    'quick': {'transactions': [100, 1000, 10000], 'instruments': [1, 10, 100]},
+    'full': {'transactions': [100, 1000, 10000, 100000, 1000000], 'instruments': [1, 10, 100, 1000]},
+}
+
+# Transacciones por instrumento en los casos de portafolio
+PORTFOLIO_TRANSACTIONS = 100
+
+
+def measure(fn: Callable, repeat: int) -> Dict:
+    """
+    Best wall time over ``repeat`` runs, then peak memory of one traced run.
+
+    Args:
+        fn: Callable without arguments
+        repeat: Timed runs
+
+    Returns:
+        dict: 'seconds' and 'peak_mib'
+    """
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    # tracemalloc hace lento el código medido: corrida aparte, solo memoria
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': best, 'peak_mib': peak / 2 ** 20}
+
+
+def calibrate() -> float:
+    """
+    Seconds of a fixed Decimal workload, to compare timings across machines.
+
+    Los tiempos del baseline se guardan divididos por esta referencia.
+    """
+    def workload():
+        total = Decimal('0')
+        for i in range(200000):
+            total += Decimal(i) * Decimal('1.00000001') / Decimal(7)
+        return total
+
+    return measure(workload, 3)['seconds']
+
+
+def fifo_cases(sizes: List[int], seed: int) -> Dict[str, Callable]:
+    """FIFO calculations and validators on one instrument per size."""
+    cases = {}
+    for size in sizes:
+        for crypto in (False, True):
+            label = f"{'crypto' if crypto else 'stock'}/{size}"
+            history = generate_history(size, seed=seed + size, crypto=crypto)
+            records = FIFOService.to_records(history)
+            price = history[-1].price
+
+            # Una venta retroactiva a mitad del historial para el simulador
+            middle = sorted(tx.transaction_date for tx in history)[size // 2]
+            backdated_sell = {
+                'id': None, 'transaction_type': 'sell',
+                'quantity': history[0].quantity / 2, 'transaction_date': middle
+            }
+            backdated_buy = dict(backdated_sell, transaction_type='buy',
+                                 transaction_date=middle - timedelta(days=30))
+
+            cases.update({
+                f'to_records/{label}': lambda h=history: FIFOService.to_records(h),
+                f'realized/{label}': lambda r=records: FIFOService.calculate_realized_gain(r),
+                f'unrealized/{label}': lambda r=records, p=price: FIFOService.calculate_unrealized_gain(r, p),
+                f'totals/{label}': lambda r=records, p=price: FIFOService.calculate_instrument_totals(r, p),
+                f'validate_integrity/{label}': lambda r=records: FIFOService._validate_fifo_integrity(r),
+                f'simulate_sell/{label}': lambda r=records, t=backdated_sell:
+                    FIFOService._simulate_fifo_with_new(r, t),
+                f'simulate_buy/{label}': lambda r=records, t=backdated_buy:
+                    FIFOService._simulate_fifo_with_new(r, t),
+            })
+            for method in LotMatchingService.METHODS:
+                cases[f'lot_matching_{method}/{label}'] = lambda r=records, m=method: \
+                    LotMatchingService.calculate_realized_gain(r, m)
+    return cases
+
+
+def portfolio_cases(counts: List[int], seed: int) -> Dict[str, Callable]:
+    """
+    Portfolio views for users with ``counts`` instruments, on the benchmark
+    app (in-memory SQLite, synthetic prices).
+    """
+    from app import create_app, db
+    from app.models import User, Instrument, Transaction, Wallet
+    from app.services import MarketService, PortfolioService, PortfolioSnapshot, LedgerService
+
+    app = create_app('benchmark')
+    # create_app configura errores.log; el benchmark no escribe en él
+    logging.getLogger().setLevel(logging.CRITICAL)
+    context = app.app_context()
+    context.push()
+    db.create_all()
+
+    cases = {}
+    for count in counts:
+        user = User(username=f'bench{count}', password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Wallet(user_id=user.id, balance=0, commissions=0, dividend=0))
+
+        for (symbol, instrument_type), history in generate_portfolio(
+                count, PORTFOLIO_TRANSACTIONS, seed=seed + count, prefix=f'U{count}').items():
+            instrument = Instrument(user_id=user.id, symbol=symbol, instrument_type=instrument_type)
+            db.session.add(instrument)
+            db.session.flush()
+            db.session.execute(Transaction.__table__.insert(), [{
+                'user_id': user.id, 'instrument_id': instrument.id,
+                'transaction_type': tx.transaction_type, 'quantity': tx.quantity,
+                'price': tx.price, 'commission': tx.commission,
+                'base_amount': tx.quantity * tx.price, 'transaction_date': tx.transaction_date,
+            } for tx in history])
+            LedgerService.rebuild(instrument)
+        db.session.commit()
+
+        user_id = user.id
+
+        def dashboard(user_id=user_id):
+            # Lo que calcula la ruta '/' para el usuario
+            instruments = Instrument.query.filter_by(user_id=user_id).all()
+            snapshot = PortfolioSnapshot.build(instruments, user_id)
+            snapshot.portfolio_metrics
+            snapshot.instrument_rows
+            snapshot.distribution
+
+        def dashboard_cached(user_id=user_id):
+            # Carga repetida sin cambios: PortfolioCache + precios en caché
+            snapshot = PortfolioSnapshot.for_user(db.session.get(User, user_id))
+            snapshot.portfolio_metrics
+            snapshot.instrument_rows
+            snapshot.distribution
+
+        def portfolio_etag(user_id=user_id):
+            # Lo que hace /api/portfolio antes de responder 304
+            user = db.session.get(User, user_id)
+            quotes = PortfolioSnapshot.load_quotes(PortfolioSnapshot.load_base(user)['instruments'])
+            PortfolioSnapshot.etag(user, quotes, MarketService.get_usd_to_dop_rate())
+
+        def validate_sell(user_id=user_id):
+            instrument = Instrument.query.filter_by(user_id=user_id).first()
+            last = db.session.query(db.func.max(Transaction.transaction_date)).filter_by(
+                instrument_id=instrument.id).scalar()
+            LedgerService.validate_change(instrument, {
+                'transaction_type': 'sell', 'quantity': Decimal('0.5'),
+                'transaction_date': last - timedelta(days=365)
+            })
+
+        cases.update({
+            f'portfolio_metrics/{count}': lambda user_id=user_id: PortfolioService.calculate_portfolio_metrics(
+                Instrument.query.filter_by(user_id=user_id).all(), user_id),
+            f'dashboard/{count}': dashboard,
+            f'dashboard_cached/{count}': dashboard_cached,
+            f'portfolio_etag/{count}': portfolio_etag,
+            f'ledger_validate_sell/{count}': validate_sell,
+        })
+
+    return cases
+
+
+def bulk_cases(counts: List[int], seed: int) -> Dict[str, Callable]:
+    """
+    BulkFIFOService over users with ``counts`` instruments, next to the
+    per-instrument replay it replaces in reconcile.
+    """
+    from app.services.bulk_fifo import BulkFIFOService
+
+    cases = {}
+    for count in counts:
+        portfolio = generate_portfolio(count, PORTFOLIO_TRANSACTIONS, seed=seed + count)
+        rows = sorted((
+            (instrument_id, tx.id, tx.transaction_date, tx.transaction_type,
+             tx.quantity, tx.price, tx.commission)
+            for instrument_id, history in enumerate(portfolio.values(), start=1)
+            for tx in history
+        ), key=lambda r: (r[0], r[2], r[1]))
+        histories = [FIFOService.to_records(history) for history in portfolio.values()]
+
+        columns = BulkFIFOService.to_columns(rows)
+
+        cases.update({
+            f'bulk_to_columns/{count}': lambda r=rows: BulkFIFOService.to_columns(r),
+            f'bulk_positions/{count}': lambda c=columns: BulkFIFOService.compute_positions(c),
+            f'replay_positions/{count}': lambda h=histories: [
+                FIFOService.position_from_state(FIFOService._replay(records)) for records in h],
+        })
+    return cases
+
+
+def run(preset: str, repeat: int, seed: int, only: Optional[str] = None) -> Dict:
+    """Run every case of a preset and print a table."""
+    sizes = PRESETS[preset]
+    calibration = calibrate()
+    results = {}
+
+    print(f"{'case':<40} {'seconds':>10} {'peak MiB':>10}")
+    for builder, argument in ((fifo_cases, sizes['transactions']),
+                              (portfolio_cases, sizes['instruments']),
+                              (bulk_cases, sizes['instruments'])):
+        if only and only not in builder.__name__:
+            continue
+        for name, fn in builder(argument, seed).items():
+            result = measure(fn, repeat)
+            results[name] = result
+            print(f"{name:<40} {result['seconds']:>10.4f} {result['peak_mib']:>10.2f}")
+
+    return {'preset': preset, 'seed': seed, 'calibration': calibration, 'results': results}
+
+
+def compare(current: Dict, baseline: Dict, time_tolerance: float, memory_tolerance: float) -> List[str]:
+    """
+    Regressions of ``current`` against ``baseline``.
+
+    Los tiempos se comparan normalizados por la calibración de cada corrida;
+    casos muy cortos (menos de 1 ms) solo se comparan en memoria.
+
+    Returns:
+        list: One message per regression
+    """
+    regressions = []
+    for name, base in baseline['results'].items():
+        result = current['results'].get(name)
+        if result is None:
+            continue
+
+        base_time = base['seconds'] / baseline['calibration']
+        time_ratio = (result['seconds'] / current['calibration']) / base_time if base_time else 1
+        if base['seconds'] >= 0.001 and time_ratio > 1 + time_tolerance:
+            regressions.append(f"{name}: time {time_ratio:.2f}x baseline")
+
+        if base['peak_mib'] > 0.1 and result['peak_mib'] > base['peak_mib'] * (1 + memory_tolerance):
+            regressions.append(
+                f"{name}: peak memory {result['peak_mib']:.2f} MiB vs {base['peak_mib']:.2f} MiB"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', choices=['fifo', 'portfolio', 'bulk'], help='Run one group of cases.')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--check', action='store_true', help='Fail on regressions against the baseline.')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline.')
+    parser.add_argument('--time-tolerance', type=float, default=0.5)
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    current = run(args.preset, args.repeat, args.seed, args.only)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2, sort_keys=True) + '\n')
+        print(f"✓ Baseline saved to {args.baseline}")
+
+    if args.check:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(current, baseline, args.time_tolerance, args.memory_tolerance)
+        for message in regressions:
+            print(f"✗ {message}")
+        if regressions:
+            sys.exit(1)
+        print("✓ No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,49 @@ class Config:
     # Application Settings
     DEFAULT_COMMISSION_RATE = float(os.getenv('DEFAULT_COMMISSION_RATE', '0.01'))
     
+    # Market Data Provider
+    # 'yfinance' = Yahoo Finance; 'synthetic' = precios deterministas
+    # (random walk con semilla) para pruebas de carga sin red
+    MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'yfinance')
+    MARKET_DATA_SEED = int(os.getenv('MARKET_DATA_SEED', '0'))
+    MARKET_DATA_LATENCY_MS = int(os.getenv('MARKET_DATA_LATENCY_MS', '0'))
+    
+    # Market Data Cache
+    # 'memory' = un dict por proceso; 'sqlite' = archivo compartido por los
+    # workers del nodo que sobrevive reinicios (MARKET_CACHE_PATH)
+    MARKET_CACHE_BACKEND = os.getenv('MARKET_CACHE_BACKEND', 'memory')
+    MARKET_CACHE_PATH = os.getenv('MARKET_CACHE_PATH')
+    # Límites del caché: entradas (LRU en memoria; en SQLite, filas por
+    # orden de escritura) y bytes (solo memoria); 0 = sin límite
+    MARKET_CACHE_MAX_ENTRIES = int(os.getenv('MARKET_CACHE_MAX_ENTRIES', '5000'))
+    MARKET_CACHE_MAX_BYTES = int(os.getenv('MARKET_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    # TTL con el mercado abierto; con el mercado cerrado los stocks/ETFs
+    # quedan en caché hasta la próxima apertura. Crypto usa un TTL corto.
+    MARKET_CACHE_MINUTES = int(os.getenv('MARKET_CACHE_MINUTES', '5'))
+    MARKET_CRYPTO_CACHE_MINUTES = int(os.getenv('MARKET_CRYPTO_CACHE_MINUTES', '2'))
+    # Servir precios vencidos mientras se refrescan en segundo plano
+    # (máximo MARKET_MAX_STALENESS_MINUTES después del vencimiento)
+    MARKET_STALE_WHILE_REVALIDATE = os.getenv('MARKET_STALE_WHILE_REVALIDATE', 'true').lower() == 'true'
+    MARKET_MAX_STALENESS_MINUTES = int(os.getenv('MARKET_MAX_STALENESS_MINUTES', '30'))
+    # Vigencia de un símbolo verificado en la tabla symbol_metadata
+    SYMBOL_METADATA_TTL_DAYS = int(os.getenv('SYMBOL_METADATA_TTL_DAYS', '30'))
+    
+    # Portfolio Cache
+    # Parte del portafolio que no depende del precio, por usuario (LRU en
+    # memoria); se invalida con users.data_version. 0 = sin límite
+    PORTFOLIO_CACHE_MAX_ENTRIES = int(os.getenv('PORTFOLIO_CACHE_MAX_ENTRIES', '1000'))
+    
+    # Price Warmer
+    # Refresca en segundo plano los símbolos en cartera antes de que expiren
+    # (intervalos en segundos por tipo de instrumento; 'fx' = tasa USD/DOP)
+    PRICE_WARMER_ENABLED = os.getenv('PRICE_WARMER_ENABLED', 'false').lower() == 'true'
+    PRICE_REFRESH_INTERVALS = {
+        'stock': int(os.getenv('PRICE_REFRESH_STOCK', '240')),
+        'etf': int(os.getenv('PRICE_REFRESH_ETF', '240')),
+        'crypto': int(os.getenv('PRICE_REFRESH_CRYPTO', '90')),
+        'fx': int(os.getenv('PRICE_REFRESH_FX', '240')),
+    }
+    
     # JSON Configuration
     JSON_AS_ASCII = False
     JSON_SORT_KEYS = False
@@ -44,9 +87,20 @@ class ProductionConfig(Config):
     SQLALCHEMY_ECHO = False
 
 
+class BenchmarkConfig(Config):
+    """Benchmark configuration (benchmarks.suite): in-memory SQLite and synthetic prices."""
+    SECRET_KEY = os.getenv('SECRET_KEY', 'benchmark')
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCHMARK_DATABASE_URI', 'sqlite://')
+    MARKET_DATA_PROVIDER = 'synthetic'
+    PRICE_WARMER_ENABLED = False
+    DEBUG = False
+    SQLALCHEMY_ECHO = False
+
+
 # Configuration dictionary
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'benchmark': BenchmarkConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
@@ -8,6 +8,14 @@ COLLATE utf8mb4_unicode_ci;
 
 USE JuanDcs$sgp_db;
 
+-- Users table (first: position_snapshots references it)
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(50) NOT NULL UNIQUE,
+    password_hash VARCHAR(255) NOT NULL,
+    data_version INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Instruments table
 CREATE TABLE IF NOT EXISTS instruments (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -33,8 +41,10 @@ CREATE TABLE IF NOT EXISTS transactions (
     base_amount DECIMAL(20, 2) NOT NULL,
     transaction_date DATE NOT NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    running_quantity DECIMAL(32, 12) NULL,
     INDEX idx_instrument_id (instrument_id),
     INDEX idx_transaction_date (transaction_date),
+    INDEX idx_transactions_running (instrument_id, transaction_date, transaction_type, running_quantity),
     FOREIGN KEY (instrument_id) REFERENCES instruments(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -47,11 +57,109 @@ CREATE TABLE IF NOT EXISTS wallet (
     dividend DECIMAL(20, 2) NOT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
-CREATE TABLE IF NOT EXISTS users (
+-- Symbol metadata table (verified Yahoo Finance symbols)
+CREATE TABLE IF NOT EXISTS symbol_metadata (
+    symbol VARCHAR(30) PRIMARY KEY,
+    instrument_type ENUM('stock', 'etf', 'crypto') NOT NULL,
+    name VARCHAR(255),
+    currency VARCHAR(10),
+    exchange VARCHAR(20),
+    last_verified_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_last_verified_at (last_verified_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Persisted FIFO ledger: cumulative totals per instrument
+CREATE TABLE IF NOT EXISTS instrument_ledgers (
+    instrument_id INT PRIMARY KEY,
+    buy_count INT NOT NULL DEFAULT 0,
+    sell_count INT NOT NULL DEFAULT 0,
+    total_bought DECIMAL(32, 12) NOT NULL DEFAULT 0,
+    total_sold_qty DECIMAL(32, 12) NOT NULL DEFAULT 0,
+    buy_commissions DECIMAL(32, 2) NOT NULL DEFAULT 0,
+    total_sold DECIMAL(65, 30) NOT NULL DEFAULT 0,
+    cost_basis_sold DECIMAL(65, 30) NOT NULL DEFAULT 0,
+    commissions_paid DECIMAL(65, 30) NOT NULL DEFAULT 0,
+    last_buy_date DATE,
+    last_sell_date DATE,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (instrument_id) REFERENCES instruments(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Persisted FIFO ledger: buy lots with units not yet sold
+CREATE TABLE IF NOT EXISTS open_lots (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    username VARCHAR(50) NOT NULL UNIQUE,
-    password_hash VARCHAR(255) NOT NULL,
+    instrument_id INT NOT NULL,
+    transaction_id INT NOT NULL UNIQUE,
+    transaction_date DATE NOT NULL,
+    quantity DECIMAL(20, 12) NOT NULL,
+    price DECIMAL(20, 8) NOT NULL,
+    commission DECIMAL(65, 30) NOT NULL,
+    original_commission DECIMAL(20, 2) NOT NULL,
+    INDEX idx_open_lots_queue (instrument_id, transaction_date, transaction_id),
+    FOREIGN KEY (instrument_id) REFERENCES instruments(id) ON DELETE CASCADE,
+    FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Price-independent position metrics per instrument (read model)
+CREATE TABLE IF NOT EXISTS position_snapshots (
+    instrument_id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    buy_count INT NOT NULL DEFAULT 0,
+    sell_count INT NOT NULL DEFAULT 0,
+    current_quantity DECIMAL(32, 12) NOT NULL DEFAULT 0,
+    cost_basis DECIMAL(45, 20) NOT NULL DEFAULT 0,
+    open_commissions DECIMAL(32, 2) NOT NULL DEFAULT 0,
+    realized_gain DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    realized_gain_percentage DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    total_sold DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    cost_basis_sold DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    realized_commissions DECIMAL(32, 2) NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_position_snapshots_user (user_id),
+    FOREIGN KEY (instrument_id) REFERENCES instruments(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- ---------------------------------------------------------------------------
+-- Upgrades for databases created with an earlier version of this script.
+-- CREATE TABLE IF NOT EXISTS leaves existing tables untouched, so each new
+-- column or index is added here only if information_schema lacks it; the
+-- whole script can be re-run safely.
+-- ---------------------------------------------------------------------------
+
+-- users.data_version (PortfolioCache invalidation)
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'data_version') = 0,
+    'ALTER TABLE users ADD COLUMN data_version INT NOT NULL DEFAULT 0',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- transactions.running_quantity and its index (FIFO integrity checks).
+-- Existing rows stay NULL until `flask rebuild-ledgers` backfills them;
+-- until then the checks fall back to replaying the history.
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'transactions' AND COLUMN_NAME = 'running_quantity') = 0,
+    'ALTER TABLE transactions ADD COLUMN running_quantity DECIMAL(32, 12) NULL',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'transactions' AND INDEX_NAME = 'idx_transactions_running') = 0,
+    'CREATE INDEX idx_transactions_running ON transactions (instrument_id, transaction_date, transaction_type, running_quantity)',
+    'SELECT 1'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
 -- Display success message
 SELECT 'Database and tables created successfully!' AS Status;
\ No newline at end of file
@@ -6,6 +6,7 @@ Main entry point for running the Flask application
 
 import os
 import logging
+import click
 from app import create_app, db
 
 # Configure logging
@@ -67,6 +68,111 @@ def reset_db():
         print(f"✗ Error resetting database: {str(e)}")
 
 
+@app.cli.command()
+@click.option('--once', is_flag=True, help='Refresh all held symbols once and exit.')
+def warm_prices(once):
+    """Keep the quote cache warm for every held symbol."""
+    from app.services.price_warmer import PriceWarmer
+
+    warmer = PriceWarmer(app)
+    try:
+        if once:
+            refreshed = warmer.run_once(force=True)
+            print(f"✓ {refreshed} prices refreshed")
+        else:
+            print(f"✓ Price warmer running (intervals: {warmer.intervals}). Ctrl+C to stop.")
+            warmer.run_forever()
+    except KeyboardInterrupt:
+        warmer.stop()
+        print("Price warmer stopped")
+    except Exception as e:
+        logger.error(f"Error warming prices: {str(e)}")
+        print(f"✗ Error warming prices: {str(e)}")
+
+
+@app.cli.command()
+@click.option('--held', is_flag=True, help='Also verify every symbol held in instruments.')
+def refresh_symbols(held):
+    """Re-verify symbol metadata against Yahoo Finance."""
+    from app.models import Instrument, SymbolMetadata
+    from app.services import MarketService
+
+    try:
+        symbols_data = None
+        if held:
+            rows = SymbolMetadata.query.with_entities(
+                SymbolMetadata.symbol, SymbolMetadata.instrument_type
+            ).all()
+            rows += db.session.query(Instrument.symbol, Instrument.instrument_type).distinct().all()
+            symbols_data = [{'symbol': s, 'instrument_type': t} for s, t in rows]
+
+        refreshed = MarketService.refresh_symbol_metadata(symbols_data)
+        db.session.commit()
+        print(f"✓ {refreshed} symbols refreshed")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refreshing symbols: {str(e)}")
+        print(f"✗ Error refreshing symbols: {str(e)}")
+
+
+@app.cli.command()
+@click.option('--instrument-id', type=int, help='Rebuild a single instrument.')
+def rebuild_ledgers(instrument_id):
+    """Rebuild the persisted FIFO ledger, position snapshots and running quantities."""
+    from app.models import Instrument
+    from app.services import LedgerService
+
+    try:
+        query = Instrument.query
+        if instrument_id:
+            query = query.filter_by(id=instrument_id)
+
+        instruments = query.all()
+        histories = LedgerService.load_histories(
+            [instrument.id for instrument in instruments] if instrument_id else None
+        )
+        for instrument in instruments:
+            LedgerService.rebuild(instrument, histories.get(instrument.id, []))
+        db.session.commit()
+
+        print(f"✓ {len(instruments)} ledgers rebuilt")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebuilding ledgers: {str(e)}")
+        print(f"✗ Error rebuilding ledgers: {str(e)}")
+
+
+@app.cli.command()
+@click.option('--user-id', type=int, help='Reconcile a single user.')
+@click.option('--fix', is_flag=True, help='Rebuild instruments whose snapshot does not match.')
+def reconcile_positions(user_id, fix):
+    """Check bulk FIFO results and position snapshots against the Decimal path."""
+    from app.models import Instrument
+    from app.services import LedgerService
+    from app.services.bulk_fifo import BulkFIFOService
+
+    try:
+        mismatches = BulkFIFOService.reconcile(user_id)
+
+        for m in mismatches:
+            print(f"✗ instrument {m['instrument_id']} ({m['source']}) "
+                  f"{m['field']}: expected {m['expected']}, got {m['actual']}")
+
+        if fix:
+            stale = {m['instrument_id'] for m in mismatches if m['source'] == 'snapshot'}
+            for instrument in Instrument.query.filter(Instrument.id.in_(stale)).all() if stale else []:
+                LedgerService.rebuild(instrument)
+            db.session.commit()
+            print(f"✓ {len(stale)} ledgers rebuilt")
+
+        if not mismatches:
+            print("✓ All positions reconciled")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error reconciling positions: {str(e)}")
+        print(f"✗ Error reconciling positions: {str(e)}")
+
+
 if __name__ == '__main__':
     # Run the application
     app.run(
@@ -0,0 +1,58 @@
+"""
+Fixtures compartidos: la app con la configuración 'benchmark' (SQLite en
+memoria, precios sintéticos) y un usuario con un instrumento.
+"""
+
+import logging
+from decimal import Decimal
+
+import pytest
+
+from app import create_app, db
+from app.models import User, Instrument, Transaction
+
+
+@pytest.fixture
+def app():
+    app = create_app('benchmark')
+    # create_app configura errores.log; los errores esperados no se escriben
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def instrument(app):
+    user = User(username='tester', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+
+    instrument = Instrument(user_id=user.id, symbol='AAA', instrument_type='stock')
+    db.session.add(instrument)
+    db.session.commit()
+    return instrument
+
+
+@pytest.fixture
+def add_transaction(instrument):
+    """Add (without committing) a transaction to ``instrument`` and flush it."""
+    return lambda *args, **kwargs: new_transaction(instrument, *args, **kwargs)
+
+
+def new_transaction(instrument, transaction_type, quantity, transaction_date,
+                    price='10', commission='0') -> Transaction:
+    quantity = Decimal(str(quantity))
+    price = Decimal(str(price))
+    transaction = Transaction(
+        user_id=instrument.user_id, instrument_id=instrument.id,
+        transaction_type=transaction_type, quantity=quantity, price=price,
+        commission=Decimal(str(commission)), base_amount=quantity * price,
+        transaction_date=transaction_date
+    )
+    db.session.add(transaction)
+    db.session.flush()
+    return transaction
@@ -0,0 +1,97 @@
+"""
+BulkFIFOService contra FIFOService.calculate_instrument_totals sobre
+historias aleatorias de varios instrumentos, en int64 y en enteros de Python.
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from app.services.bulk_fifo import BulkFIFOService
+from app.services.fifo import FIFOService, TxRecord
+
+
+def _random_rows(rng, instruments, scale):
+    """
+    Rows (instrument_id, id, date, type, quantity, price, commission) of
+    histories that never sell more than they hold, with partial lots,
+    same-day trades and quantities up to 12 decimals.
+    """
+    rows = []
+    next_id = 1
+    for instrument_id in range(1, instruments + 1):
+        held = Decimal(0)
+        day = 0
+        for _ in range(rng.randint(1, 40)):
+            day += rng.randint(0, 3)
+            if held > 0 and rng.random() < 0.4:
+                tx_type = 'sell'
+                quantity = min(held, (held * Decimal(rng.uniform(0.05, 1.2))).quantize(Decimal('1e-12')))
+                quantity = max(quantity, min(held, Decimal('1e-12')))
+                held -= quantity
+            else:
+                tx_type = 'buy'
+                quantity = (Decimal(rng.randint(1, 10 ** 4)) * scale).scaleb(-rng.choice([0, 4, 8, 12]))
+                held += quantity
+            price = Decimal(rng.randint(1, 10 ** 12)).scaleb(-8) * scale
+            commission = Decimal(rng.randint(0, 999)).scaleb(-2)
+            rows.append((instrument_id, next_id, date(2024, 1, 1) + timedelta(days=day),
+                         tx_type, quantity, price, commission))
+            next_id += 1
+    rng.shuffle(rows)
+    return sorted(rows, key=lambda r: (r[0], r[2], r[1]))
+
+
+def _assert_matches_fifo(rows, prices):
+    columns = BulkFIFOService.to_columns(rows)
+    bulk = BulkFIFOService.compute_totals(columns, prices)
+
+    histories = {}
+    for r in rows:
+        histories.setdefault(r[0], []).append(TxRecord.from_row((r[1], r[3], r[2], r[4], r[5], r[6])))
+
+    assert set(bulk) == set(histories)
+    for instrument_id, history in histories.items():
+        expected = FIFOService.calculate_instrument_totals(history, prices.get(instrument_id, 0))
+        assert repr(bulk[instrument_id]) == repr(expected)
+    return columns
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_random_histories_match_fifo_in_int64(seed):
+    rng = random.Random(seed)
+    rows = _random_rows(rng, instruments=25, scale=1)
+    prices = {i: Decimal(rng.randint(0, 10 ** 7)).scaleb(-4) for i in range(1, 26)}
+
+    columns = _assert_matches_fifo(rows, prices)
+
+    # Cantidad × precio a escala 20 no cabe en int64; las columnas sí
+    assert columns['quantity'].dtype == np.int64
+    assert int(max(columns['quantity'])) * int(max(columns['price'])) > 2 ** 63
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_values_past_int64_fall_back_to_python_ints(seed):
+    rng = random.Random(seed)
+    rows = _random_rows(rng, instruments=5, scale=10 ** 8)
+
+    columns = _assert_matches_fifo(rows, {1: Decimal('12.5')})
+    assert columns['quantity'].dtype == object
+
+
+def test_sum_products_matches_python_ints():
+    rng = random.Random(0)
+    a = [rng.randrange(2 ** 63) for _ in range(300)]
+    b = [rng.randrange(2 ** 63) for _ in range(300)]
+    starts = np.array([0, 1, 50, 299])
+
+    expected = [
+        sum(x * y for x, y in zip(a[start:end], b[start:end]))
+        for start, end in zip(starts, list(starts[1:]) + [300])
+    ]
+    assert BulkFIFOService._sum_products(
+        np.array(a, dtype=np.int64), np.array(b, dtype=np.int64), starts
+    ) == expected
@@ -0,0 +1,122 @@
+"""
+Backends del caché de cotizaciones: orden de desalojo, presupuesto de bytes
+y limpieza de entradas vencidas.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.services.cache_backends import MemoryCacheBackend, SQLiteCacheBackend
+
+
+def _entry(minutes=5, rate='58.1'):
+    """Quote-cache entry expiring ``minutes`` from now (negative = already expired)."""
+    now = datetime.now()
+    return {'data': {'rate': Decimal(rate)}, 'timestamp': now,
+            'expires_at': now + timedelta(minutes=minutes)}
+
+
+def _keys(backend, candidates):
+    return [key for key in candidates if backend.get(key) is not None]
+
+
+def test_memory_evicts_least_recently_used():
+    cache = MemoryCacheBackend(max_entries=3)
+    for key in 'abc':
+        cache.set(key, _entry())
+
+    cache.get('a')
+    cache.set('d', _entry())
+
+    assert _keys(cache, 'abcd') == ['a', 'c', 'd']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_memory_evicts_expired_entries_before_lru():
+    cache = MemoryCacheBackend(max_entries=3)
+    cache.set('a', _entry())
+    cache.set('b', _entry(minutes=-1))
+    cache.set('c', _entry())
+
+    cache.set('d', _entry())
+
+    assert _keys(cache, 'abcd') == ['a', 'c', 'd']
+    assert cache.stats()['expired_evictions'] == 1
+    assert cache.stats()['evictions'] == 0
+
+
+def test_memory_keeps_expired_entries_within_stale_grace():
+    cache = MemoryCacheBackend(max_entries=10, stale_grace=timedelta(minutes=10))
+    cache.purge_interval = 0
+    cache.set('a', _entry(minutes=-5))
+    cache.set('b', _entry(minutes=-15))
+
+    assert _keys(cache, 'ab') == ['a']
+
+
+def test_memory_purges_expired_entries_below_the_limits():
+    cache = MemoryCacheBackend(max_entries=100)
+    cache.set('old', _entry(minutes=-1))
+
+    # Antes del intervalo la entrada vencida sigue ahí...
+    cache.set('a', _entry())
+    assert cache.get('old') is not None
+
+    # ...y la primera escritura después del intervalo la descarta
+    cache.purge_interval = 0
+    cache.set('b', _entry())
+    assert cache.get('old') is None
+    assert cache.stats()['expired_evictions'] == 1
+
+
+def test_memory_byte_budget():
+    size = MemoryCacheBackend._entry_size(_entry())
+    cache = MemoryCacheBackend(max_bytes=size * 3)
+    for key in 'abcde':
+        cache.set(key, _entry())
+
+    stats = cache.stats()
+    assert stats['bytes'] <= cache.max_bytes
+    assert _keys(cache, 'abcde') == ['c', 'd', 'e']
+    assert stats['evictions'] == 2
+
+    cache.delete('d')
+    assert cache.stats()['bytes'] == size * 2
+
+
+def test_memory_without_byte_budget_does_not_size_entries():
+    cache = MemoryCacheBackend(max_entries=10)
+    cache.set('a', _entry())
+    assert cache.stats()['bytes'] == 0
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    cache = SQLiteCacheBackend(str(tmp_path / 'quotes.db'), max_entries=2)
+    cache.purge_interval = 0
+    return cache
+
+
+def test_sqlite_trims_by_write_order(sqlite_cache):
+    sqlite_cache.set('a', _entry())
+    sqlite_cache.set('b', _entry())
+
+    # Leer no cuenta: el recorte es por la última escritura, no LRU
+    assert sqlite_cache.get('a')['data']['rate'] == Decimal('58.1')
+    sqlite_cache.set('c', _entry())
+    assert _keys(sqlite_cache, 'abc') == ['b', 'c']
+
+    # Reescribir sí la renueva
+    sqlite_cache.set('b', _entry(rate='59'))
+    sqlite_cache.set('d', _entry())
+    assert _keys(sqlite_cache, 'abcd') == ['b', 'd']
+
+
+def test_sqlite_purges_expired_rows(sqlite_cache):
+    sqlite_cache.set('old', _entry(minutes=-1))
+    sqlite_cache.set('a', _entry())
+
+    assert _keys(sqlite_cache, ['old', 'a']) == ['a']
+    assert sqlite_cache.stats()['expired_evictions'] == 1
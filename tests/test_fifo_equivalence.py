@@ -0,0 +1,327 @@
+"""
+Equivalencia del FIFO de una sola pasada con el cálculo original de dos pasadas.
+
+The reference functions below are a frozen copy of calculate_realized_gain,
+calculate_unrealized_gain and calculate_instrument_totals as they were before
+FIFOService replayed the history once. Each result of the current service
+must match them repr-for-repr (same types, same rounding, same keys).
+"""
+
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from app.services.fifo import FIFOService
+
+
+class Tx:
+    """Transacción mínima con los atributos que lee FIFOService."""
+
+    def __init__(self, id, transaction_type, quantity, price, commission, transaction_date):
+        self.id = id
+        self.transaction_type = transaction_type
+        self.quantity = quantity
+        self.price = price
+        self.commission = commission
+        self.transaction_date = transaction_date
+
+
+# ---------------------------------------------------------------------------
+# Referencia congelada (implementación de dos pasadas, sin cambios)
+# ---------------------------------------------------------------------------
+
+def _reference_realized(transactions):
+    def _to_date(d):
+        return d.date() if isinstance(d, datetime) else d
+
+    buys = sorted([t for t in transactions if t.transaction_type == 'buy'],
+                  key=lambda x: _to_date(x.transaction_date))
+    sells = sorted([t for t in transactions if t.transaction_type == 'sell'],
+                   key=lambda x: _to_date(x.transaction_date))
+
+    if not sells:
+        total_buy_commissions = sum(Decimal(t.commission) for t in buys) if buys else 0.0
+        return {
+            'realized_gain': 0.0,
+            'realized_gain_percentage': 0.0,
+            'total_sold': 0.0,
+            'cost_basis_sold': 0.0,
+            'commissions_paid': total_buy_commissions
+        }
+
+    buy_queue = []
+    for buy in buys:
+        buy_queue.append({
+            'quantity': Decimal(str(buy.quantity)),
+            'price': Decimal(str(buy.price)),
+            'commission': Decimal(str(buy.commission))
+        })
+
+    total_sold_neto = Decimal('0.0')
+    cost_basis_total = Decimal('0.0')
+    total_commissions = Decimal('0.0')
+
+    for sell in sells:
+        quantity_to_sell = Decimal(str(sell.quantity))
+        sell_price = Decimal(str(sell.price))
+        sell_commission = Decimal(str(sell.commission))
+
+        total_sold_neto += (quantity_to_sell * sell_price) - sell_commission
+        total_commissions += sell_commission
+
+        remaining_to_sell = quantity_to_sell
+
+        while remaining_to_sell > 0 and buy_queue:
+            oldest_buy = buy_queue[0]
+
+            if oldest_buy['quantity'] <= remaining_to_sell:
+                actual_qty = oldest_buy['quantity']
+                cost = (actual_qty * oldest_buy['price']) + oldest_buy['commission']
+
+                cost_basis_total += cost
+                total_commissions += oldest_buy['commission']
+                remaining_to_sell -= actual_qty
+                buy_queue.pop(0)
+            else:
+                actual_qty = remaining_to_sell
+                commission_portion = (actual_qty / oldest_buy['quantity']) * oldest_buy['commission']
+
+                cost = (actual_qty * oldest_buy['price']) + commission_portion
+
+                cost_basis_total += cost
+                total_commissions += commission_portion
+
+                oldest_buy['quantity'] -= actual_qty
+                oldest_buy['commission'] -= commission_portion
+                remaining_to_sell = Decimal('0')
+
+    realized_gain = total_sold_neto - cost_basis_total
+    gain_pct = (realized_gain / cost_basis_total * 100) if cost_basis_total > 0 else Decimal('0')
+
+    return {
+        'realized_gain': Decimal(realized_gain.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
+        'realized_gain_percentage': Decimal(gain_pct.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
+        'total_sold': Decimal(total_sold_neto.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
+        'cost_basis_sold': Decimal(cost_basis_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
+        'commissions_paid': Decimal(total_commissions.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+    }
+
+
+def _reference_unrealized(transactions, current_price):
+    buys = [t for t in transactions if t.transaction_type == 'buy']
+    sells = [t for t in transactions if t.transaction_type == 'sell']
+
+    total_bought = sum(Decimal(t.quantity) for t in buys)
+    total_sold = sum(Decimal(t.quantity) for t in sells)
+    current_quantity = total_bought - total_sold
+
+    if current_quantity <= 0:
+        return {
+            'unrealized_gain': 0.0,
+            'unrealized_gain_percentage': 0.0,
+            'current_quantity': 0.0,
+            'cost_basis': 0.0,
+            'current_value': 0.0,
+            'average_price': 0.0,
+            'commissions_paid': 0.0
+        }
+
+    def _to_date(d):
+        return d.date() if isinstance(d, datetime) else d
+
+    buys_sorted = sorted(buys, key=lambda x: _to_date(x.transaction_date))
+
+    buy_queue = []
+    for buy in buys_sorted:
+        buy_queue.append({
+            'quantity': Decimal(buy.quantity),
+            'price': Decimal(buy.price),
+            'commission': Decimal(buy.commission)
+        })
+
+    quantity_to_remove = total_sold
+    while quantity_to_remove > 0 and buy_queue:
+        oldest_buy = buy_queue[0]
+
+        if oldest_buy['quantity'] <= quantity_to_remove:
+            quantity_to_remove -= oldest_buy['quantity']
+            buy_queue.pop(0)
+        else:
+            oldest_buy['quantity'] -= quantity_to_remove
+            quantity_to_remove = 0
+
+    cost_basis = Decimal('0.0')
+    total_commissions = Decimal('0.0')
+
+    for buy in buy_queue:
+        cost_basis += buy['quantity'] * buy['price']
+        total_commissions += buy['commission']
+
+    average_price = cost_basis / current_quantity if current_quantity > 0 else 0.0
+    current_value = current_quantity * Decimal(current_price)
+    unrealized_gain = current_value - cost_basis
+    unrealized_gain_percentage = (
+        (unrealized_gain / cost_basis * 100) if cost_basis > 0 else 0.0
+    )
+
+    return {
+        'unrealized_gain': round(unrealized_gain, 2),
+        'unrealized_gain_percentage': round(unrealized_gain_percentage, 2),
+        'current_quantity': round(current_quantity, 12),
+        'cost_basis': round(cost_basis, 2),
+        'current_value': round(current_value, 2),
+        'average_price': round(average_price, 2),
+        'commissions_paid': round(total_commissions, 2)
+    }
+
+
+def _reference_totals(transactions, current_price):
+    realized = _reference_realized(transactions)
+    unrealized = _reference_unrealized(transactions, current_price)
+
+    total_gain = Decimal(realized['realized_gain']) + Decimal(unrealized['unrealized_gain'])
+    total_investment = Decimal(unrealized['cost_basis']) + Decimal(realized['cost_basis_sold'])
+    total_gain_percentage = (
+        (total_gain / total_investment * 100)
+        if total_investment > 0 else 0.0
+    )
+    total_commissions = Decimal(realized['commissions_paid']) + Decimal(unrealized['commissions_paid'])
+
+    return {
+        'realized_gain': realized['realized_gain'],
+        'realized_gain_percentage': realized['realized_gain_percentage'],
+        'unrealized_gain': unrealized['unrealized_gain'],
+        'unrealized_gain_percentage': unrealized['unrealized_gain_percentage'],
+        'total_gain': round(total_gain, 2),
+        'total_gain_percentage': round(total_gain_percentage, 2),
+        'current_quantity': unrealized['current_quantity'],
+        'average_price': unrealized['average_price'],
+        'current_value': unrealized['current_value'],
+        'cost_basis': unrealized['cost_basis'],
+        'total_sold': realized['total_sold'],
+        'cost_basis_sold': realized['cost_basis_sold'],
+        'total_investment': round(total_investment, 2),
+        'total_commissions': round(total_commissions, 2)
+    }
+
+
+# ---------------------------------------------------------------------------
+# Historias de prueba
+# ---------------------------------------------------------------------------
+
+def _random_history(rng):
+    """
+    Historia aleatoria: fechas dentro de un mes (varias operaciones el mismo
+    día), cantidades con hasta 12 decimales, ventas que consumen lotes
+    parcialmente y, a veces, ventas mayores a lo que se tiene.
+    """
+    transactions = []
+    held = Decimal(0)
+    for i in range(rng.randint(0, 15)):
+        tx_date = date(2024, 1, 1) + timedelta(days=rng.randint(0, 30))
+        quantity = (Decimal(rng.randint(1, 10**8)) / Decimal(10**rng.choice([0, 4, 8, 12]))).quantize(Decimal('1e-12'))
+        tx_type = 'buy' if rng.random() < 0.6 else 'sell'
+        if tx_type == 'sell' and rng.random() < 0.8 and held > 0:
+            quantity = min(quantity, held)
+        held += quantity if tx_type == 'buy' else -quantity
+        price = Decimal(rng.randint(1, 10**7)).scaleb(-4).quantize(Decimal('1e-8'))
+        commission = Decimal(rng.randint(0, 999)).scaleb(-2)
+        transactions.append(Tx(i + 1, tx_type, quantity, price, commission, tx_date))
+    current_price = rng.choice([0.0, 123.45, Decimal('99.1234'), rng.random() * 1000])
+    return transactions, current_price
+
+
+def _tx(id, tx_type, quantity, price, commission, day):
+    return Tx(id, tx_type, Decimal(quantity), Decimal(price), Decimal(commission), date(2024, 1, day))
+
+
+EXPLICIT_CASES = {
+    'partial_lots': [
+        _tx(1, 'buy', '10', '100', '1.00', 1),
+        _tx(2, 'buy', '5', '110', '0.50', 2),
+        _tx(3, 'sell', '3', '120', '0.30', 3),
+        _tx(4, 'sell', '8.5', '125', '0.99', 4),
+    ],
+    'oversell': [
+        _tx(1, 'buy', '2', '50', '0.10', 1),
+        _tx(2, 'sell', '5', '60', '0.20', 2),
+    ],
+    'same_day_trades': [
+        _tx(1, 'buy', '1.333333333333', '10.12345678', '0.07', 5),
+        _tx(2, 'sell', '0.333333333333', '11', '0.01', 5),
+        _tx(3, 'buy', '3', '9.5', '0.03', 5),
+        _tx(4, 'sell', '2', '12', '0.02', 5),
+    ],
+    'sell_before_buy': [
+        _tx(1, 'sell', '1', '20', '0.00', 1),
+        _tx(2, 'buy', '4', '15', '0.40', 2),
+    ],
+    'no_sells': [
+        _tx(1, 'buy', '0.000000000001', '0.00000001', '0.01', 1),
+    ],
+    'empty': [],
+    # Cerca del límite de 28 dígitos: cantidad × precio con 28 dígitos significativos
+    'large_position': [
+        _tx(1, 'buy', '9999.999999999999', '9999.99999999', '999.99', 1),
+        _tx(2, 'buy', '1234.567890123456', '9876.54321098', '0.01', 1),
+        _tx(3, 'sell', '3333.333333333333', '9999.99999997', '0.03', 2),
+        _tx(4, 'sell', '7777.777777777777', '9999.99999999', '7.77', 3),
+    ],
+    # Un lote vendido en muchas partes: la comisión proporcional se redondea cada vez
+    'repeated_partial_lots': [
+        _tx(1, 'buy', '7', '3.33333333', '9.99', 1),
+        _tx(2, 'buy', '0.000000000003', '99999.99999999', '0.07', 1),
+    ] + [
+        _tx(i + 3, 'sell', '0.333333333333' if i % 3 else '0.000000000001', '7.77777777', '0.01', 2 + i % 25)
+        for i in range(60)
+    ],
+}
+
+
+def _assert_equivalent(transactions, current_price):
+    assert repr(FIFOService.calculate_instrument_totals(transactions, current_price)) == \
+        repr(_reference_totals(transactions, current_price))
+    assert repr(FIFOService.calculate_realized_gain(transactions)) == \
+        repr(_reference_realized(transactions))
+    assert repr(FIFOService.calculate_unrealized_gain(transactions, current_price)) == \
+        repr(_reference_unrealized(transactions, current_price))
+
+
+@pytest.mark.parametrize('case', sorted(EXPLICIT_CASES))
+@pytest.mark.parametrize('current_price', [0.0, 123.45, Decimal('99.1234')])
+def test_explicit_histories_match_reference(case, current_price):
+    _assert_equivalent(EXPLICIT_CASES[case], current_price)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_histories_match_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        transactions, current_price = _random_history(rng)
+        _assert_equivalent(transactions, current_price)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_positions_past_28_digits_match_to_the_cent(seed):
+    """
+    Más allá de 28 dígitos la referencia redondeaba y el cálculo entero no:
+    mismos valores al centavo, aunque un cero puede cambiar de signo.
+    """
+    rng = random.Random(seed)
+    for _ in range(200):
+        price = Decimal(rng.randint(1, 10 ** 13)).scaleb(-8)
+        transactions = [
+            Tx(i + 1, 'buy', Decimal(rng.randint(1, 10 ** 20)).scaleb(-12),
+               price if rng.random() < 0.7 else Decimal(rng.randint(1, 10 ** 13)).scaleb(-8),
+               Decimal(rng.randint(0, 99999)).scaleb(-2), date(2024, 1, 1 + i))
+            for i in range(rng.randint(1, 6))
+        ]
+        sold = (transactions[0].quantity / 3).quantize(Decimal('1e-12'))
+        transactions.append(Tx(9, 'sell', sold, price, Decimal('0.50'), date(2024, 1, 20)))
+
+        current = FIFOService.calculate_instrument_totals(transactions, price)
+        reference = _reference_totals(transactions, price)
+        for field, value in reference.items():
+            assert Decimal(str(current[field])) == Decimal(str(value)), field
@@ -0,0 +1,152 @@
+"""
+Ledger persistido (open_lots, instrument_ledgers, position_snapshots) contra
+un replay completo del historial, después de altas, altas con fecha
+anterior, ediciones y bajas.
+
+SQLite guarda NUMERIC como REAL (unos 15 dígitos significativos), así que
+las columnas de 30 decimales se comparan con tolerancia; el resto, y las
+métricas públicas, deben coincidir exactamente.
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import InstrumentLedger, OpenLot, PositionSnapshot, Transaction
+from app.services import FIFOService, LedgerService
+from app.utils.fixed_point import QTY_PLACES, PRICE_PLACES, MONEY_PLACES, ACCUM_PLACES, to_decimal
+
+# Error admitido en las columnas de ACCUM_PLACES leídas de SQLite
+_ACCUM_TOLERANCE = Decimal('1e-9')
+
+_PRICES = [Decimal('55.5'), Decimal('0'), Decimal('123.4567')]
+
+
+def _random_data(rng, transaction_date):
+    return {
+        'transaction_type': rng.choice(['buy', 'buy', 'sell']),
+        'quantity': Decimal(rng.choice([rng.randint(1, 50), rng.randint(1, 10**5) / Decimal(1000)])),
+        'price': Decimal(rng.randint(100, 20000)) / 100,
+        'commission': Decimal(rng.randint(0, 999)) / 100,
+        'transaction_date': transaction_date,
+    }
+
+
+def _history(instrument):
+    db.session.expire_all()
+    return Transaction.query.filter_by(instrument_id=instrument.id).all()
+
+
+def _assert_close(value, expected):
+    assert abs(Decimal(str(value)) - expected) <= _ACCUM_TOLERANCE
+
+
+def _assert_matches_replay(instrument):
+    """The persisted rows equal a replay of the whole history."""
+    history = _history(instrument)
+    state = FIFOService._replay(LedgerService._ordered_records(instrument.id))
+
+    lots = OpenLot.query.filter_by(instrument_id=instrument.id).order_by(
+        OpenLot.transaction_date, OpenLot.transaction_id
+    ).all()
+    assert [lot.transaction_id for lot in lots] == [lot.transaction_id for lot in state['open_lots']]
+    for row, lot in zip(lots, state['open_lots']):
+        assert row.transaction_date == lot.transaction_date
+        assert Decimal(str(row.quantity)) == to_decimal(lot.quantity, QTY_PLACES)
+        assert Decimal(str(row.price)) == to_decimal(lot.price, PRICE_PLACES)
+        assert Decimal(str(row.original_commission)) == to_decimal(lot.original_commission, MONEY_PLACES)
+        _assert_close(row.commission, to_decimal(lot.commission, ACCUM_PLACES))
+
+    ledger = db.session.get(InstrumentLedger, instrument.id)
+    for field in LedgerService._LEDGER_FIELDS:
+        assert getattr(ledger, field) == state[field]
+    for field, places in LedgerService._SCALED_FIELDS:
+        if places == ACCUM_PLACES:
+            _assert_close(getattr(ledger, field), to_decimal(state[field], places))
+        else:
+            assert Decimal(str(getattr(ledger, field))) == to_decimal(state[field], places)
+
+    # Métricas públicas: exactas, tipos y redondeo incluidos
+    snapshot = db.session.get(PositionSnapshot, instrument.id)
+    loaded = LedgerService.load_state(instrument.id)
+    for price in _PRICES:
+        expected = repr(FIFOService.calculate_instrument_totals(history, price))
+        assert repr(FIFOService.totals_from_position(snapshot.to_position(), price)) == expected
+        assert repr(FIFOService.totals_from_state(loaded, price)) == expected
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_ledger_matches_replay_after_each_write(instrument, add_transaction, seed):
+    rng = random.Random(seed)
+
+    for step in range(60):
+        history = _history(instrument)
+        today = date(2024, 1, 1) + timedelta(days=step // 2)
+
+        roll = rng.random()
+        if roll < 0.1 and history:
+            transaction = rng.choice(history)
+            if LedgerService.validate_removal(transaction)[0]:
+                db.session.delete(transaction)
+                LedgerService.rebuild(instrument)
+        elif roll < 0.25 and history:
+            transaction = rng.choice(history)
+            data = _random_data(rng, today - timedelta(days=rng.randint(0, step // 2)))
+            if LedgerService.validate_change(instrument, data, replace=transaction)[0]:
+                for field, value in data.items():
+                    setattr(transaction, field, value)
+                transaction.calculate_base_amount()
+                LedgerService.rebuild(instrument)
+        else:
+            # Alta en orden (camino incremental) o con fecha anterior (rebuild)
+            backdate = rng.randint(1, 10) if rng.random() < 0.3 else 0
+            data = _random_data(rng, today - timedelta(days=backdate))
+            if LedgerService.validate_change(instrument, data)[0]:
+                transaction = add_transaction(
+                    data['transaction_type'], data['quantity'], data['transaction_date'],
+                    price=data['price'], commission=data['commission']
+                )
+                LedgerService.record_transaction(transaction)
+        db.session.commit()
+
+        if _history(instrument):
+            _assert_matches_replay(instrument)
+
+
+def test_incremental_sells_consume_partial_lots(instrument, add_transaction):
+    for day, (tx_type, quantity, price, commission) in enumerate([
+        ('buy', '10', '100', '1.00'),
+        ('buy', '5', '110', '0.50'),
+        ('sell', '3', '120', '0.30'),
+        ('sell', '8.5', '125', '0.99'),
+        ('buy', '1.333', '99.99', '0.07'),
+        ('sell', '0.333', '101', '0.01'),
+    ]):
+        transaction = add_transaction(tx_type, quantity, date(2024, 1, day + 1),
+                                      price=price, commission=commission)
+        LedgerService.record_transaction(transaction)
+        db.session.commit()
+        _assert_matches_replay(instrument)
+
+    lots = OpenLot.query.filter_by(instrument_id=instrument.id).all()
+    assert [Decimal(str(lot.quantity)) for lot in lots] == [Decimal('3.167'), Decimal('1.333')]
+
+
+def test_backdated_buy_rebuilds_queue_order(instrument, add_transaction):
+    for day in (5, 6):
+        LedgerService.record_transaction(add_transaction('buy', 4, date(2024, 1, day), price='20'))
+    LedgerService.record_transaction(add_transaction('sell', 3, date(2024, 1, 7), price='25'))
+    db.session.commit()
+
+    # Compra anterior a las demás: pasa a ser el primer lote de la cola
+    early = add_transaction('buy', 2, date(2024, 1, 1), price='10', commission='0.50')
+    LedgerService.record_transaction(early)
+    db.session.commit()
+    _assert_matches_replay(instrument)
+
+    lots = OpenLot.query.filter_by(instrument_id=instrument.id).order_by(OpenLot.transaction_date).all()
+    assert [(lot.transaction_date.day, Decimal(str(lot.quantity))) for lot in lots] == \
+        [(5, Decimal('3')), (6, Decimal('4'))]
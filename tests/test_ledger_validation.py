@@ -0,0 +1,138 @@
+"""
+LedgerService.validate_change / validate_removal (running_quantity) contra
+las simulaciones completas de FIFOService que reemplazan.
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import Transaction
+from app.services import FIFOService, LedgerService
+
+
+def _random_quantity(rng):
+    return Decimal(rng.choice([rng.randint(1, 50), rng.randint(1, 10**5) / Decimal(1000)]))
+
+
+def _random_date(rng, days):
+    return date(2024, 1, 1) + timedelta(days=rng.randint(0, days))
+
+
+def _history(instrument):
+    db.session.expire_all()
+    return Transaction.query.filter_by(instrument_id=instrument.id).all()
+
+
+def _assert_checks_match(rng, instrument, history, days):
+    """Random candidate inserts, edits and removals give the same answer as the replays."""
+    for _ in range(4):
+        data = {
+            'transaction_type': rng.choice(['buy', 'sell', 'sell']),
+            'quantity': _random_quantity(rng),
+            'transaction_date': _random_date(rng, days),
+        }
+        replace = rng.choice(history) if history and rng.random() < 0.4 else None
+        assert LedgerService.validate_change(instrument, data, replace=replace) == \
+            FIFOService._simulate_fifo_with_new(
+                history, dict(data, id=None), replace_id=replace.id if replace else None
+            )
+
+        if history:
+            removed = rng.choice(history)
+            assert LedgerService.validate_removal(removed) == \
+                FIFOService._validate_fifo_integrity(history, exclude_id=removed.id)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_checks_match_replay_while_history_grows(instrument, add_transaction, seed):
+    rng = random.Random(seed)
+
+    for step in range(80):
+        days = step // 3 + 3
+        history = _history(instrument)
+        _assert_checks_match(rng, instrument, history, days)
+
+        # Aplicar una escritura válida: alta (a veces con fecha anterior), edición o baja
+        roll = rng.random()
+        if roll < 0.1 and history:
+            transaction = rng.choice(history)
+            if LedgerService.validate_removal(transaction)[0]:
+                db.session.delete(transaction)
+                LedgerService.rebuild(instrument)
+        elif roll < 0.2 and history:
+            transaction = rng.choice(history)
+            data = {
+                'transaction_type': rng.choice(['buy', 'sell']),
+                'quantity': _random_quantity(rng),
+                'transaction_date': _random_date(rng, days),
+            }
+            if LedgerService.validate_change(instrument, data, replace=transaction)[0]:
+                for field, value in data.items():
+                    setattr(transaction, field, value)
+                LedgerService.rebuild(instrument)
+        else:
+            backdate = rng.randint(0, 20) if rng.random() < 0.3 else 0
+            data = {
+                'transaction_type': rng.choice(['buy', 'sell']),
+                'quantity': _random_quantity(rng),
+                'transaction_date': date(2024, 1, 1) + timedelta(days=step // 3 - backdate),
+            }
+            if LedgerService.validate_change(instrument, data)[0]:
+                transaction = add_transaction(
+                    data['transaction_type'], data['quantity'], data['transaction_date']
+                )
+                LedgerService.record_transaction(transaction)
+        db.session.commit()
+
+        # La columna persistida sigue siendo la suma acumulada en orden de validación
+        running = Decimal(0)
+        for transaction in sorted(_history(instrument), key=LedgerService._key):
+            quantity = Decimal(str(transaction.quantity))
+            running += quantity if transaction.transaction_type == 'buy' else -quantity
+            assert Decimal(str(transaction.running_quantity)) == running
+
+
+def test_rows_without_running_quantity_fall_back_to_replay(instrument, add_transaction):
+    rng = random.Random(7)
+    for day in range(30):
+        add_transaction('buy', 5, date(2024, 1, 1) + timedelta(days=day))
+        add_transaction('sell', 3, date(2024, 1, 1) + timedelta(days=day))
+    LedgerService.rebuild(instrument)
+    db.session.commit()
+
+    # Filas anteriores a la columna (o sin reconstruir todavía)
+    db.session.execute(db.text('UPDATE transactions SET running_quantity = NULL WHERE id % 3 = 0'))
+    db.session.commit()
+
+    history = _history(instrument)
+    unknown = [t for t in history if t.running_quantity is None]
+    assert unknown
+    assert LedgerService._first_broken_sell(
+        instrument.id, [(LedgerService._key(unknown[0]), Decimal('-1'))]
+    ) is LedgerService._UNKNOWN
+
+    for _ in range(25):
+        _assert_checks_match(rng, instrument, history, 30)
+
+
+def test_backdated_sell_reports_first_broken_date(instrument, add_transaction):
+    add_transaction('buy', 10, date(2024, 1, 1))
+    add_transaction('sell', 6, date(2024, 1, 5))
+    add_transaction('sell', 4, date(2024, 1, 9))
+    LedgerService.rebuild(instrument)
+    db.session.commit()
+
+    valid, message = LedgerService.validate_change(instrument, {
+        'transaction_type': 'sell', 'quantity': Decimal('1'), 'transaction_date': date(2024, 1, 3)
+    })
+    assert not valid
+    assert '09/01/2024' in message
+
+    buy = Transaction.query.filter_by(transaction_type='buy').one()
+    valid, message = LedgerService.validate_removal(buy)
+    assert not valid
+    assert '05/01/2024' in message
@@ -0,0 +1,117 @@
+"""
+LotMatchingService: 'fifo' idéntico a FIFOService.calculate_realized_gain y
+casos calculados a mano para LIFO, HIFO y costo promedio.
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.services.fifo import FIFOService, TxRecord, _LotStore
+from app.services.lot_matching import LotMatchingService
+
+
+def _tx(id, tx_type, quantity, price, commission, day):
+    return TxRecord.from_row((id, tx_type, date(2024, 1, day), Decimal(quantity), Decimal(price), Decimal(commission)))
+
+
+def _random_history(rng):
+    """Partial lots, same-day trades, sells before any buy and oversells."""
+    history = []
+    for i in range(rng.randint(0, 20)):
+        quantity = Decimal(rng.randint(1, 10 ** 6)).scaleb(-rng.choice([0, 3, 12]))
+        history.append(TxRecord.from_row((
+            i + 1, 'buy' if rng.random() < 0.55 else 'sell',
+            date(2024, 1, 1) + timedelta(days=rng.randint(0, 20)), quantity,
+            Decimal(rng.randint(1, 10 ** 7)).scaleb(-4), Decimal(rng.randint(0, 999)).scaleb(-2)
+        )))
+    return history
+
+
+def _expected(realized_gain, percentage, total_sold, cost_basis_sold, commissions):
+    return {
+        'realized_gain': Decimal(realized_gain),
+        'realized_gain_percentage': Decimal(percentage),
+        'total_sold': Decimal(total_sold),
+        'cost_basis_sold': Decimal(cost_basis_sold),
+        'commissions_paid': Decimal(commissions),
+    }
+
+
+# Tres compras (la última más barata que la segunda) y una venta de 12
+HISTORY = [
+    _tx(1, 'buy', '10', '100', '1.00', 1),
+    _tx(2, 'buy', '10', '120', '2.00', 2),
+    _tx(3, 'buy', '5', '110', '0.50', 3),
+    _tx(4, 'sell', '12', '130', '1.20', 4),
+]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_fifo_matches_fifo_service(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        history = _random_history(rng)
+        assert repr(LotMatchingService.calculate_realized_gain(history, 'fifo')) == \
+            repr(FIFOService.calculate_realized_gain(history))
+
+
+def test_fifo_oversell_matches_fifo_service():
+    history = [_tx(1, 'buy', '2', '50', '0.10', 1), _tx(2, 'sell', '5', '60', '0.20', 2)]
+    assert repr(LotMatchingService.calculate_realized_gain(history, 'fifo')) == \
+        repr(FIFOService.calculate_realized_gain(history))
+
+
+def test_hand_computed_methods():
+    results = LotMatchingService.compare_methods(HISTORY)
+
+    # Ingreso neto: 12 × 130 − 1.20 = 1558.80
+    # FIFO: lote 1 entero (1001.00) + 2 del lote 2 (240 + 0.40)
+    assert results['fifo'] == _expected('317.40', '25.57', '1558.80', '1241.40', '2.60')
+    # LIFO: lote 3 entero (550.50) + 7 del lote 2 (840 + 1.40)
+    assert results['lifo'] == _expected('166.90', '11.99', '1558.80', '1391.90', '3.10')
+    # HIFO: 10 del lote 2 (1202.00) + 2 del lote 3 (220 + 0.20)
+    assert results['hifo'] == _expected('136.60', '9.60', '1558.80', '1422.20', '3.40')
+    # Promedio: 12/25 de 2750 en valor y de 3.50 en comisiones
+    assert results['average'] == _expected('237.12', '17.94', '1558.80', '1321.68', '2.88')
+
+
+def test_hifo_price_ties_sell_the_oldest_lot_first():
+    history = [
+        _tx(1, 'buy', '10', '100', '1.00', 1),
+        _tx(2, 'buy', '4', '120', '0.40', 2),
+        _tx(3, 'buy', '5', '120', '2.50', 3),
+        _tx(4, 'sell', '6', '130', '0.60', 4),
+    ]
+    # Lote 2 entero (480.40) + 2 del lote 3 (240 + 1.00)
+    assert LotMatchingService.calculate_realized_gain(history, 'hifo') == \
+        _expected('58.00', '8.04', '779.40', '721.40', '2.00')
+
+
+def test_average_cost_after_partial_sells():
+    history = HISTORY + [_tx(5, 'sell', '13', '90', '0.00', 5)]
+    # Segunda venta: el resto del conjunto (1430 + 1.82)
+    assert LotMatchingService.calculate_realized_gain(history, 'average') == \
+        _expected('-24.70', '-0.90', '2728.80', '2753.50', '4.70')
+
+
+def test_non_fifo_methods_only_use_lots_bought_before_the_sell():
+    history = [
+        _tx(1, 'buy', '10', '100', '0.00', 1),
+        _tx(2, 'sell', '5', '150', '0.00', 2),
+        _tx(3, 'buy', '10', '200', '0.00', 3),
+    ]
+    for method in ('lifo', 'hifo', 'average'):
+        assert LotMatchingService.calculate_realized_gain(history, method)['cost_basis_sold'] == \
+            Decimal('500.00')
+
+
+def test_unknown_method_and_abstract_store():
+    with pytest.raises(ValueError):
+        LotMatchingService.calculate_realized_gain(HISTORY, 'random')
+    with pytest.raises(TypeError):
+        _LotStore()
+    # Costo promedio no expone lotes individuales
+    assert not hasattr(LotMatchingService.STORES['average'](), 'peek')
@@ -0,0 +1,36 @@
+"""
+MarketService: el vencimiento del caché usa el tipo de instrumento que pide
+el llamador, no uno deducido del símbolo.
+"""
+
+from app.services import MarketService
+
+
+def _entry(formatted_symbol):
+    return MarketService._cache.get(formatted_symbol)
+
+
+def test_cache_ttl_follows_the_requested_instrument_type(app):
+    policy = MarketService._ttl_policy
+
+    # Un stock cuyo ticker termina en -USD sigue la sesión de su bolsa
+    snapshot = MarketService.get_quote('TTLSTOCK-USD', 'stock')
+    entry = _entry('TTLSTOCK-USD')
+    assert entry['expires_at'] == policy.expires_at('stock', snapshot.exchange, entry['timestamp'])
+
+    MarketService.get_current_price('TTLCOIN', 'crypto')
+    entry = _entry('TTLCOIN-USD')
+    assert entry['expires_at'] == entry['timestamp'] + policy.crypto_ttl
+
+
+def test_batch_quotes_cache_each_symbol_with_its_type(app):
+    policy = MarketService._ttl_policy
+    MarketService.get_batch_quotes([
+        {'symbol': 'TTLBATCH', 'instrument_type': 'crypto'},
+        {'symbol': 'TTLETF', 'instrument_type': 'etf'},
+    ])
+
+    entry = _entry('TTLBATCH-USD')
+    assert entry['expires_at'] == entry['timestamp'] + policy.crypto_ttl
+    entry = _entry('TTLETF')
+    assert entry['expires_at'] == policy.expires_at('etf', entry['data'].exchange, entry['timestamp'])
@@ -0,0 +1,61 @@
+"""
+YFinanceProvider.get_quote sin red: yf.Ticker reemplazado por un doble con
+``info`` y ``history`` fijos.
+"""
+
+import pandas as pd
+import pytest
+
+from app.services import MarketService
+from app.services.providers import yfinance_provider
+from app.services.providers.yfinance_provider import YFinanceProvider
+
+
+class FakeTicker:
+    """yf.Ticker with a fixed info payload and daily closes."""
+
+    def __init__(self, info, closes):
+        self.info = info
+        self._closes = closes
+
+    def history(self, period):
+        return pd.DataFrame({'Close': self._closes})
+
+
+@pytest.fixture
+def ticker(monkeypatch):
+    """Set the payload returned by yf.Ticker: ticker(info, closes)."""
+    def configure(info, closes):
+        monkeypatch.setattr(yfinance_provider.yf, 'Ticker', lambda symbol: FakeTicker(info, closes))
+    return configure
+
+
+def test_info_without_symbol_falls_back_to_history(ticker):
+    ticker({'regularMarketVolume': 0}, [10.0, 11.0])
+
+    snapshot = YFinanceProvider().get_quote('ABC')
+    assert snapshot.price == 11.0
+    assert snapshot.previous_close == 10.0
+    assert not snapshot.has_metadata
+
+
+def test_info_without_symbol_or_history_is_missing(ticker):
+    ticker({}, [])
+    assert YFinanceProvider().get_quote('ABC') is None
+
+
+def test_known_symbol_keeps_metadata(ticker):
+    ticker({'symbol': 'ABC', 'longName': 'ABC Corp', 'currency': 'USD'}, [10.0, 11.0])
+
+    snapshot = YFinanceProvider().get_quote('ABC')
+    assert snapshot.price == 11.0
+    assert snapshot.has_metadata
+    assert snapshot.name == 'ABC Corp'
+
+
+def test_only_verify_symbol_rejects_info_without_symbol(app, ticker, monkeypatch):
+    ticker({'regularMarketVolume': 0}, [10.0, 11.0])
+    monkeypatch.setattr(MarketService, '_provider', YFinanceProvider())
+
+    assert MarketService.get_current_price('NOSYM', 'stock') == 11.0
+    assert not MarketService.verify_symbol('NOSYM', 'stock')